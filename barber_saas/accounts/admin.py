@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User
+from .models import User, ApiToken
 
 @admin.register(User)
 class UserAdmin(DjangoUserAdmin):
@@ -20,3 +20,12 @@ class UserAdmin(DjangoUserAdmin):
     list_display = ("email", "first_name", "last_name", "is_staff")
     search_fields = ("email", "first_name", "last_name")
     ordering = ("email",)
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "prefix", "is_active", "created_at", "last_used_at")
+    list_filter = ("is_active",)
+    search_fields = ("name", "user__email", "prefix")
+    readonly_fields = ("prefix", "created_at", "last_used_at")
+    fields = ("user", "name", "is_active", "prefix", "created_at", "last_used_at")
@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = "Gera um token de API para um usuário (o valor só é exibido agora)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="E-mail do usuário (tenant).")
+        parser.add_argument("--name", default="PDV", help="Identificação do token (ex.: PDV Centro).")
+
+    def handle(self, *args, **opts):
+        user = get_user_model().objects.filter(email=opts["email"]).first()
+        if user is None:
+            raise CommandError(f"Usuário não encontrado: {opts['email']}")
+        token, raw = ApiToken.issue(user, opts["name"])
+        self.stdout.write(f"Token '{token.name}' criado: {raw}")
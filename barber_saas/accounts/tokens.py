@@ -0,0 +1,48 @@
+"""
+Autenticação por token para as APIs JSON (header ``Authorization: Token <chave>``
+ou ``Bearer <chave>``). Sem sessão e sem CSRF.
+"""
+from datetime import timedelta
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+
+from core import sharding
+from .models import ApiToken
+
+# last_used_at só é regravado se estiver mais velho que isso (evita 1 UPDATE por request)
+LAST_USED_RESOLUTION = timedelta(minutes=5)
+
+
+def authenticate_token(request):
+    """Usuário dono do token do header, ou None."""
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    scheme, _, raw = header.partition(" ")
+    if scheme.lower() not in ("token", "bearer") or not raw.strip():
+        return None
+    token = (
+        ApiToken.objects.select_related("user")
+        .filter(key_hash=ApiToken.hash_key(raw.strip()), is_active=True, user__is_active=True)
+        .first()
+    )
+    if token is None:
+        return None
+    now = timezone.now()
+    if token.last_used_at is None or now - token.last_used_at > LAST_USED_RESOLUTION:
+        ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+    return token.user
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TokenRequiredMixin:
+    """Equivalente ao LoginRequiredMixin para as APIs: define request.user pelo token."""
+
+    def dispatch(self, request, *args, **kwargs):
+        user = authenticate_token(request)
+        if user is None:
+            return JsonResponse({"detail": "Token inválido ou ausente."}, status=401)
+        request.user = user
+        sharding.activate(user)
+        return super().dispatch(request, *args, **kwargs)
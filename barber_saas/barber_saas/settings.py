@@ -21,7 +21,9 @@ INSTALLED_APPS = [
     'accounts',
     'cadastros',
     'core',
-    'servicos'
+    'servicos',
+    'relatorios',
+    'financeiro',
 ]
 
 MIDDLEWARE = [
@@ -30,6 +32,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.TenantShardMiddleware',
+    'core.middleware.IdentityMapMiddleware',
+    'core.middleware.BoostedMiddleware',
+    'cadastros.middleware.AccessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,6 +67,17 @@ DATABASES = {
     }
 }
 
+# Sharding por tenant (core.sharding): BARBER_SHARDS="shard_1,shard_2" cria um
+# SQLite por shard e os habilita para novos/movidos tenants. O default continua
+# guardando usuários, sessões e o mapa tenant -> shard. Os shards da suíte de
+# testes ficam em barber_saas.settings_test.
+_extra_shards = [a.strip() for a in os.environ.get("BARBER_SHARDS", "").split(",") if a.strip()]
+for _alias in _extra_shards:
+    DATABASES[_alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f"{_alias}.sqlite3"}
+TENANT_SHARDS = ['default', *_extra_shards]
+TENANT_DEFAULT_SHARD = os.environ.get("BARBER_DEFAULT_SHARD", 'default')
+DATABASE_ROUTERS = ['core.routers.TenantRouter']
+
 AUTH_USER_MODEL = 'accounts.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -79,7 +96,92 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = Path(os.getenv("STATIC_ROOT", BASE_DIR / "staticfiles"))
+
+# Estáticos locais (sem CDN): o collectstatic grava nomes com hash e as
+# variantes .gz/.br (core.storage); com DEBUG=False o core.views.StaticView os
+# serve com cache de um ano.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# "default" guarda versões lidas por todos os processos (core.localcache,
+# agenda, catálogo do agendamento): em produção, REDIS_URL. Sem ele, LocMem
+# (um processo só; o LRU de core.localcache fica desligado).
+# "fragments": linhas de tabela já renderizadas (core.fragments). LocMem é LRU;
+# MAX_ENTRIES limita a memória por processo.
+_redis_url = os.getenv("REDIS_URL")
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": _redis_url}
+        if _redis_url else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 4},
+    },
+}
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Uploads privados (planilhas de importação); não são servidos publicamente.
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "media"))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Agenda: duração padrão de um atendimento sem duração definida e limite
+# superior usado para delimitar a busca de conflitos no índice (staff, scheduled_for).
+AGENDA_DEFAULT_DURATION_MINUTES = 30
+AGENDA_MAX_DURATION_MINUTES = 240
+AGENDA_DAY_START_HOUR = 8
+AGENDA_DAY_END_HOUR = 20
+
+# Agendamento online (público): tentativas de confirmação por IP na janela.
+BOOKING_RATE_LIMIT = 10
+BOOKING_RATE_WINDOW_SECONDS = 60 * 10
+
+# Sync incremental (core.sync): modelos expostos, atraso de segurança do
+# cursor e por quanto tempo exclusões ficam registradas.
+SYNC_MODELS = [
+    "cadastros.Shop",
+    "cadastros.Product",
+    "cadastros.ProductPrice",
+    "cadastros.Client",
+    "cadastros.StaffMembership",
+    "servicos.ServiceOrder",
+    "servicos.ServiceItem",
+]
+SYNC_LAG_SECONDS = 2
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Arquivamento (servicos.archive): comandas fechadas há mais de N dias saem
+# das tabelas quentes, em lotes deste tamanho.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Exclusão em segundo plano (core.purge): ids apagados por lote/transação.
+PURGE_BATCH_SIZE = 500
+
+# Importações (cadastros.imports): linhas por bloco/transação.
+IMPORT_CHUNK = 1000
+IMPORT_MAX_UPLOAD_MB = 50
+
+# Fila de tarefas em banco (core.queue / manage.py run_worker).
+TASK_CONCURRENCY = int(os.getenv("TASK_CONCURRENCY", "4"))
+TASK_POLL_SECONDS = 2
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF_SECONDS = 30      # 30s, 60s, 120s... (dobra a cada tentativa)
+TASK_RETRY_BACKOFF_MAX_SECONDS = 60 * 60
+TASK_HEARTBEAT_SECONDS = 60           # o worker renova locked_at das tarefas em execução
+TASK_LOCK_TIMEOUT_SECONDS = 15 * 60  # sem heartbeat há mais que isso = worker morreu
+
+# Cache local por processo (core.localcache): lojas, equipe e catálogo por
+# tenant. A coerência entre workers vem da versão do tenant no cache "default",
+# que precisa ser compartilhado; TENANT_LRU_SINGLE_PROCESS liga o LRU mesmo com
+# LocMem quando web e tarefas rodam num processo só.
+TENANT_LRU_SIZE = 1024
+TENANT_LRU_SINGLE_PROCESS = False
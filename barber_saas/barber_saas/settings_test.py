@@ -0,0 +1,14 @@
+"""
+Settings da suíte de testes. ``manage.py test`` usa este módulo por padrão;
+outros runners: ``DJANGO_SETTINGS_MODULE=barber_saas.settings_test``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, STORAGES
+
+# os dois shards locais sempre existem (desabilitados: TENANT_SHARDS continua
+# só com o default; os testes de roteamento os ativam com override_settings)
+for _alias in ("shard_1", "shard_2"):
+    DATABASES.setdefault(_alias, {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"{_alias}.sqlite3"})
+
+# sem collectstatic na suíte: o {% static %} não tem manifest para consultar
+STORAGES = {**STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}}
@@ -14,12 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from core.views import StaticView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('cadastros/', include('cadastros.urls')),
     path('servicos/', include('servicos.urls')),
+    path('relatorios/', include('relatorios.urls')),
+    path('financeiro/', include('financeiro.urls')),
+    path('api/', include('core.urls')),
 ]
+
+if not settings.DEBUG:
+    # com DEBUG o runserver serve direto dos STATICFILES_DIRS
+    urlpatterns += [re_path(r"^%s(?P<path>.+)$" % settings.STATIC_URL.lstrip("/"), StaticView.as_view())]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Shop, StaffMembership, Product, ProductPrice, Staff, Client
+from .models import Shop, StaffMembership, Product, ProductPrice, Staff, Client, ImportJob
 
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
@@ -65,3 +65,11 @@ class ClientAdmin(admin.ModelAdmin):
     list_display = ("name", "phone", "owner", "is_active")
     list_filter = ("is_active",)
     search_fields = ("name", "phone", "owner__email")
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "filename", "owner", "status", "processed", "created", "updated", "failed", "created_at")
+    list_filter = ("kind", "status")
+    search_fields = ("filename", "owner__email")
+    readonly_fields = ("processed", "created", "updated", "failed", "errors", "message", "finished_at")
@@ -0,0 +1,70 @@
+"""
+Ações em massa das listagens (ativar, desativar, excluir).
+
+Ativar/desativar é um único ``UPDATE ... WHERE owner = ... AND id IN (...)``.
+Excluir produto apaga em lotes de PURGE_BATCH_SIZE, cada lote numa transação
+curta; produto já usado em comanda (FK PROTECT) não pode sumir e fica só
+desativado. Excluir cliente vai para core.purge, como na exclusão individual.
+"""
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from core import purge, sharding
+from core.models import PurgeJob
+from .models import Client, Product
+from .signals import catalog_bulk_changed
+
+
+def _owned_ids(model, owner_id, ids):
+    return list(model.objects.filter(owner_id=owner_id, pk__in=ids).values_list("pk", flat=True))
+
+
+def _notify(model, owner_id):
+    if model is Product:  # UPDATE/DELETE em lote não disparam post_save do catálogo
+        sharding.on_commit(lambda: catalog_bulk_changed.send(sender=Product, owner_id=owner_id))
+
+
+def set_active(model, owner_id, ids, active):
+    """Devolve os ids alterados."""
+    ids = _owned_ids(model, owner_id, ids)
+    with sharding.tenant_atomic():
+        model.objects.filter(owner_id=owner_id, pk__in=ids).update(is_active=active, updated_at=timezone.now())
+        _notify(model, owner_id)
+    return ids
+
+
+def protected_ids(model, ids):
+    """Ids de ``model`` referenciados por FK PROTECT/RESTRICT (não podem ser apagados)."""
+    found = set()
+    for rel in model._meta.get_fields(include_hidden=True):  # inclui related_name="+"
+        if not (rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one)):
+            continue
+        if rel.on_delete not in (models.PROTECT, models.RESTRICT) or not sharding.is_tenant_model(rel.related_model):
+            continue
+        found.update(
+            rel.related_model._base_manager.filter(**{f"{rel.field.name}__in": ids})
+            .values_list(rel.field.attname, flat=True).distinct()
+        )
+    return found
+
+
+def delete_products(owner_id, ids, batch_size=None):
+    """(apagados, desativados): em uso fica só inativo."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    ids = _owned_ids(Product, owner_id, ids)
+    in_use = protected_ids(Product, ids)
+    deactivated = set_active(Product, owner_id, in_use, False) if in_use else []
+    free = [pk for pk in ids if pk not in in_use]
+    for i in range(0, len(free), batch_size):
+        with sharding.tenant_atomic():
+            # collector: leva os preços por loja junto e grava os tombstones do sync
+            Product.objects.filter(owner_id=owner_id, pk__in=free[i:i + batch_size]).delete()
+    return free, deactivated
+
+
+def delete_clients(owner_id, ids):
+    """(apagados, []): saem das listagens na hora; o histórico é desvinculado em segundo plano."""
+    ids = _owned_ids(Client, owner_id, ids)
+    purge.schedule_many(owner_id, PurgeJob.KIND_CLIENT, ids)
+    return ids, []
@@ -4,7 +4,10 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from collections import OrderedDict
 
+from core import identity
+from . import lookups
 from .models import Shop, StaffMembership, Product, ProductPrice, Staff, Client
+from .utils import normalize_phone
 
 # ====== Base: aplica Bootstrap e marca campos inválidos ======
 class BootstrapModelForm(forms.ModelForm):
@@ -18,8 +21,11 @@ class BootstrapModelForm(forms.ModelForm):
             if isinstance(f.widget, (forms.CheckboxInput,)):
                 f.widget.attrs["class"] = "form-check-input"
 
-        # marca campos com erro
-        for name in self.errors:
+    def full_clean(self):
+        super().full_clean()
+        # marca campos com erro (aqui, e não no __init__: lá a validação rodaria
+        # antes de o form filtrar os querysets e definir o owner)
+        for name in self._errors or ():
             if name in self.fields and not isinstance(self.fields[name].widget, forms.CheckboxInput):
                 cls = self.fields[name].widget.attrs.get("class", "")
                 self.fields[name].widget.attrs["class"] = (cls + " is-invalid").strip()
@@ -46,6 +52,40 @@ class TenantOwnedForm(BootstrapModelForm):
         if owner and getattr(self.instance, "owner_id", None) is None:
             self.instance.owner = owner
 
+# Escolhas via identity map (core.identity)
+class TenantChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in identity.warm(self.queryset):
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(identity.warm(self.queryset)) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(identity.warm(self.queryset))
+
+
+class TenantModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField que lê as escolhas pelo identity map do request: o
+    queryset é avaliado uma vez (renderização e validação de todas as linhas
+    do formset) e a validação não faz ``.get()`` por valor.
+    """
+    iterator = TenantChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values or not identity.active():
+            return super().to_python(value)
+        key = self.to_field_name or "pk"
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, key)
+        obj = identity.pick(self.queryset, value, key)
+        if obj is None:
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+        return obj
+
 # Formatações
 class ProductPriceForm(TenantOwnedForm):
     """
@@ -56,11 +96,12 @@ class ProductPriceForm(TenantOwnedForm):
         super().__init__(*args, **kwargs)
         if owner:
             self.fields["product"].queryset = Product.objects.for_user(owner)
-            self.fields["shop"].queryset = Shop.objects.for_user(owner)
+            self.fields["shop"].queryset = lookups.shop_choices(owner.pk)
 
     class Meta:
         model = ProductPrice
         fields = ["product", "shop", "price"]
+        field_classes = {"product": TenantModelChoiceField, "shop": TenantModelChoiceField}
 
     def clean_price(self):
         v = self.cleaned_data["price"]
@@ -111,12 +152,13 @@ class StaffMembershipForm(TenantOwnedForm):
     class Meta:
         model = StaffMembership
         fields = ["shop", "role", "is_active"]  # sem 'staff' explícito
+        field_classes = {"shop": TenantModelChoiceField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         owner = getattr(self.instance, "owner", None)
         if owner:
-            self.fields["shop"].queryset = Shop.objects.for_user(owner)
+            self.fields["shop"].queryset = lookups.shop_choices(owner.pk)
 
     def clean(self):
         data = super().clean()
@@ -148,7 +190,7 @@ class ProductForm(TenantOwnedForm):
 
     class Meta:
         model = Product
-        fields = ["name", "type", "description", "default_price", "share_across_shops", "is_active"]
+        fields = ["name", "type", "description", "default_price", "duration_minutes", "share_across_shops", "is_active"]
 
     def clean_default_price(self):
         v = self.cleaned_data["default_price"]
@@ -171,12 +213,13 @@ class StaffAndMembershipForm(TenantOwnedForm):
         model = StaffMembership
         # >>> importante: mapear estes campos no instance ANTES da validação
         fields = ["shop", "role", "is_active"]
+        field_classes = {"shop": TenantModelChoiceField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)  # injeta owner/current_user e instance.owner
         owner = getattr(self.instance, "owner", None)
         if owner:
-            self.fields["shop"].queryset = Shop.objects.for_user(owner)
+            self.fields["shop"].queryset = lookups.shop_choices(owner.pk)
 
     def clean_email(self):
         return self.cleaned_data["email"].strip().lower()
@@ -252,12 +295,13 @@ class StaffAndMembershipUpdateForm(TenantOwnedForm):
     class Meta:
         model = StaffMembership
         fields = ["shop", "role", "is_active"]  # campos do vínculo
+        field_classes = {"shop": TenantModelChoiceField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)  # injeta owner e instance.owner
         owner = getattr(self.instance, "owner", None)
         if owner:
-            self.fields["shop"].queryset = Shop.objects.for_user(owner)
+            self.fields["shop"].queryset = lookups.shop_choices(owner.pk)
 
         # Preenche iniciais a partir do Staff vinculado
         staff = getattr(self.instance, "staff", None)
@@ -297,10 +341,8 @@ class ClientForm(TenantOwnedForm):
         fields = ["name", "phone", "is_active", "notes"]
 
     def clean_phone(self):
-        phone = (self.cleaned_data.get("phone") or "").strip()
-        # opcional: normalizar só dígitos
-        # phone = re.sub(r"\D+", "", phone)
-        return phone
+        # mesmo formato do agendamento online e da importação (só dígitos, sem DDI)
+        return normalize_phone(self.cleaned_data.get("phone"))
 
     def clean(self):
         data = super().clean()
@@ -314,3 +356,61 @@ class ClientForm(TenantOwnedForm):
             if qs.exists():
                 self.add_error("phone", "Já existe um cliente com este telefone.")
         return data
+
+
+# ====== Importação ======
+class ImportUploadForm(forms.Form):
+    file = forms.FileField(label="Planilha")
+
+    def __init__(self, *args, extensions=(".csv",), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extensions = extensions
+        self.fields["file"].label = f"Planilha ({', '.join(e.lstrip('.').upper() for e in extensions)})"
+        self.fields["file"].widget.attrs.update({"class": "form-control", "accept": ",".join(extensions)})
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith(self.extensions):
+            if self.extensions == (".csv",):
+                raise ValidationError("Envie um arquivo .csv (no Excel: Salvar como > CSV).")
+            raise ValidationError(f"Formatos aceitos: {', '.join(self.extensions)}.")
+        if upload.size > settings.IMPORT_MAX_UPLOAD_MB * 1024 * 1024:
+            raise ValidationError(f"Arquivo maior que {settings.IMPORT_MAX_UPLOAD_MB} MB.")
+        return upload
+
+
+class StaffOnboardingForm(forms.Form):
+    """Equipe em lote: planilha OU lista colada, com loja/papel padrão para linhas sem essas colunas."""
+    file = forms.FileField(label="Planilha (CSV, XLSX)", required=False)
+    roster = forms.CharField(
+        label="Ou cole a lista", required=False,
+        widget=forms.Textarea(attrs={"rows": 6, "placeholder": "email;nome;telefone;loja;papel\nana@exemplo.com;Ana;85999990000;Centro;gerente"}),
+    )
+    shops = forms.ModelMultipleChoiceField(label="Lojas padrão", queryset=Shop.objects.none(), required=False)
+    role = forms.ChoiceField(label="Papel padrão", choices=StaffMembership.ROLE_CHOICES, initial=StaffMembership.ROLE_STAFF)
+    invite = forms.BooleanField(label="Enviar convite por e-mail a quem ainda não tem senha", required=False, initial=True)
+
+    extensions = (".csv", ".xlsx")
+
+    def __init__(self, *args, owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["shops"].queryset = Shop.objects.for_user(owner).filter(is_active=True).order_by("name")
+        for name, f in self.fields.items():
+            f.widget.attrs["class"] = "form-check-input" if name == "invite" else "form-control"
+        self.fields["role"].widget.attrs["class"] = "form-select"
+        self.fields["file"].widget.attrs["accept"] = ",".join(self.extensions)
+
+    def clean_file(self):
+        upload = self.cleaned_data.get("file")
+        if upload:
+            if not upload.name.lower().endswith(self.extensions):
+                raise ValidationError(f"Formatos aceitos: {', '.join(self.extensions)}.")
+            if upload.size > settings.IMPORT_MAX_UPLOAD_MB * 1024 * 1024:
+                raise ValidationError(f"Arquivo maior que {settings.IMPORT_MAX_UPLOAD_MB} MB.")
+        return upload
+
+    def clean(self):
+        data = super().clean()
+        if not data.get("file") and not (data.get("roster") or "").strip():
+            raise ValidationError("Envie uma planilha ou cole a lista.")
+        return data
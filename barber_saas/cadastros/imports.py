@@ -0,0 +1,458 @@
+"""
+Importações em lote: clientes (CSV) e catálogo de produtos/preços (CSV/XLSX).
+
+Clientes (migração de outro sistema, dezenas de milhares de linhas):
+O arquivo é lido em streaming (csv sobre o arquivo salvo, sem carregar tudo)
+em blocos de IMPORT_CHUNK linhas. Por bloco: telefones normalizados,
+duplicatas dentro do arquivo descartadas por um set em memória, uma query
+IN para achar os clientes já existentes e um ``bulk_create`` com
+``update_conflicts`` em (owner, phone) — um INSERT ... ON CONFLICT DO
+UPDATE por bloco, numa transação curta. O progresso e os erros por linha
+vão para o ImportJob a cada bloco.
+
+Catálogo (centenas de produtos x dezenas de lojas): uma linha por produto
+e uma coluna de preço por loja. ``plan_catalog`` é o dry-run (diff contra
+o banco, exibido como prévia); depois da confirmação a tarefa refaz o
+plano e ``apply_catalog`` grava tudo numa única transação.
+"""
+import csv
+import io
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from core import sharding
+from core.sharding import tenant_atomic
+from .models import Client, ImportJob, Product, ProductPrice, Shop
+from .signals import catalog_bulk_changed
+from .utils import normalize_phone
+
+# cabeçalhos aceitos (minúsculos, sem acento) -> campo
+CLIENT_COLUMNS = {
+    "nome": "name", "name": "name", "cliente": "name",
+    "telefone": "phone", "phone": "phone", "celular": "phone", "whatsapp": "phone",
+    "observacoes": "notes", "obs": "notes", "notes": "notes",
+}
+_ACCENTS = str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc")
+
+
+class ImportFileError(ValueError):
+    """Arquivo inutilizável como um todo (cabeçalho, codificação)."""
+
+
+# erros que invalidam o arquivo inteiro (mensagem vai para o usuário)
+FILE_ERRORS = (ImportFileError, ImproperlyConfigured, UnicodeDecodeError, csv.Error)
+
+
+def _key(header):
+    return (header or "").strip().lower().translate(_ACCENTS)
+
+
+def open_csv(fileobj):
+    """
+    csv.reader em streaming sobre um arquivo binário. Aceita UTF-8 (com ou
+    sem BOM) e Latin-1 (exportações do Excel), separador ``;`` ou ``,``.
+    """
+    head = fileobj.read(4096)
+    fileobj.seek(0)
+    try:
+        head.decode("utf-8-sig")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    sample = head.decode(encoding, errors="ignore")
+    delimiter = ";" if sample.split("\n", 1)[0].count(";") > sample.split("\n", 1)[0].count(",") else ","
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline="")
+    return csv.reader(text, delimiter=delimiter)
+
+
+def count_rows(fileobj):
+    """Linhas de dados (aproximado: quebra de linha dentro de aspas conta a mais)."""
+    total = sum(chunk.count(b"\n") for chunk in iter(lambda: fileobj.read(1 << 20), b""))
+    fileobj.seek(0)
+    return max(total - 1, 0)
+
+
+def _header(reader, columns):
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError("Arquivo vazio.")
+    index = {}
+    for i, name in enumerate(header):
+        field = columns.get(_key(name))
+        if field and field not in index:
+            index[field] = i
+    return index
+
+
+def _chunks(reader, size):
+    chunk = []
+    for line, row in enumerate(reader, start=2):  # linha 1 é o cabeçalho
+        chunk.append((line, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cell(row, index, field):
+    i = index.get(field)
+    return row[i].strip() if i is not None and i < len(row) else ""
+
+
+class _Report:
+    def __init__(self, job):
+        self.job = job
+        self.errors = []
+
+    def error(self, line, message, row):
+        self.job.failed += 1
+        if len(self.job.errors) + len(self.errors) < ImportJob.MAX_ERRORS:
+            self.errors.append({"line": line, "error": message, "row": row})
+
+    def flush(self, processed):
+        self.job.processed += processed
+        self.job.errors = self.job.errors + self.errors
+        self.errors = []
+        ImportJob.objects.filter(pk=self.job.pk).update(
+            processed=self.job.processed, created=self.job.created, updated=self.job.updated,
+            failed=self.job.failed, errors=self.job.errors,
+        )
+
+
+# ===== clientes =====
+def _upsert_clients(owner_id, rows, report):
+    """rows: [(linha, nome, telefone, obs)] já sem duplicatas do arquivo."""
+    existing = dict(
+        Client.objects.filter(owner_id=owner_id, phone__in=[r[2] for r in rows]).values_list("phone", "notes")
+    )
+    objs = []
+    for _line, name, phone, notes in rows:
+        if phone in existing:
+            report.job.updated += 1
+            notes = notes or existing[phone]  # coluna vazia não apaga a observação atual
+        else:
+            report.job.created += 1
+        objs.append(Client(owner_id=owner_id, name=name, phone=phone, notes=notes, is_active=True))
+    with tenant_atomic():
+        Client.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=["owner", "phone"],
+            update_fields=["name", "notes", "is_active", "updated_at"],
+        )
+
+
+def import_clients(job, fileobj, chunk_size=None):
+    """Processa o CSV de clientes do job (arquivo binário já aberto)."""
+    chunk_size = chunk_size or settings.IMPORT_CHUNK
+    reader = open_csv(fileobj)
+    index = _header(reader, CLIENT_COLUMNS)
+    if "phone" not in index or "name" not in index:
+        raise ImportFileError("O arquivo precisa das colunas 'nome' e 'telefone'.")
+
+    report = _Report(job)
+    seen = set()  # telefones já vistos no arquivo
+    for chunk in _chunks(reader, chunk_size):
+        rows = []
+        for line, row in chunk:
+            if not any(cell.strip() for cell in row):
+                continue
+            name = _cell(row, index, "name")[:150]
+            phone = normalize_phone(_cell(row, index, "phone"))
+            if len(phone) < 10:
+                report.error(line, "Telefone inválido (informe DDD + número).", row)
+            elif not name:
+                report.error(line, "Nome vazio.", row)
+            elif phone in seen:
+                report.error(line, "Telefone repetido no arquivo (mantida a primeira ocorrência).", row)
+            else:
+                seen.add(phone)
+                rows.append((line, name, phone, _cell(row, index, "notes")))
+        if rows:
+            _upsert_clients(job.owner_id, rows, report)
+        report.flush(len(chunk))
+
+
+# ===== catálogo =====
+CATALOG_COLUMNS = {
+    "nome": "name", "produto": "name", "servico": "name", "name": "name",
+    "tipo": "type", "type": "type",
+    "descricao": "description", "description": "description",
+    "duracao": "duration_minutes", "duracao (min)": "duration_minutes", "minutos": "duration_minutes",
+    "preco": "default_price", "preco padrao": "default_price", "price": "default_price",
+    "compartilhado": "share_across_shops", "todas as lojas": "share_across_shops",
+    "ativo": "is_active", "active": "is_active",
+}
+PRODUCT_FIELDS = ("type", "description", "duration_minutes", "default_price", "share_across_shops", "is_active")
+_TYPES = {
+    "servico": Product.TYPE_SERVICE, "service": Product.TYPE_SERVICE,
+    "produto": Product.TYPE_RETAIL, "revenda": Product.TYPE_RETAIL, "retail": Product.TYPE_RETAIL,
+}
+_TRUE = {"sim", "s", "true", "1", "x", "yes"}
+_FALSE = {"nao", "n", "false", "0", "no"}
+_REMOVE = {"-", "remover"}  # célula de loja: apaga o override
+_SHOP_PREFIXES = ("preco:", "preco ", "price:")
+
+
+def _xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ImproperlyConfigured("Importação XLSX requer o pacote 'openpyxl'.") from exc
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield ["" if v is None else str(v) for v in row]
+    finally:
+        wb.close()
+
+
+def open_rows(fileobj, filename):
+    """Linhas (listas de str) de um CSV ou da primeira aba de um XLSX."""
+    if filename.lower().endswith(".xlsx"):
+        return _xlsx_rows(fileobj)
+    return open_csv(fileobj)
+
+
+def _price(raw):
+    text = raw.replace("R$", "").strip()
+    if "," in text:  # formato brasileiro: 1.234,50
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or value < 0:
+        return None
+    return value.quantize(Decimal("0.01"))
+
+
+def _parse_field(field, raw):
+    """(valor, erro) de uma célula de produto."""
+    key = _key(raw)
+    if field == "type":
+        return (_TYPES[key], None) if key in _TYPES else (None, "tipo: use serviço ou produto")
+    if field in ("share_across_shops", "is_active"):
+        if key in _TRUE:
+            return True, None
+        if key in _FALSE:
+            return False, None
+        return None, f"{field}: use sim ou não"
+    if field == "duration_minutes":
+        try:
+            minutes = int(Decimal(raw.replace(",", ".")))
+        except (InvalidOperation, ValueError):
+            minutes = -1
+        return (minutes, None) if 0 <= minutes <= 32767 else (None, "duração: minutos inválidos")
+    if field == "default_price":
+        price = _price(raw)
+        return (price, None) if price is not None else (None, "preço: valor inválido")
+    return raw, None
+
+
+def _brl(value):
+    return "—" if value is None else f"{value:.2f}".replace(".", ",")
+
+
+class CatalogPlan:
+    """Resultado do dry-run: o que a importação criaria, alteraria e removeria."""
+
+    def __init__(self):
+        self.rows = 0
+        self.create = []            # [Product]
+        self.update = []            # [(Product, [campos])]
+        self.prices_upsert = []     # [ProductPrice]
+        self.prices_delete = []     # [pk]
+        self.changes = []           # [{"line", "product", "action", "details"}] para a prévia
+        self.errors = []            # [{"line", "error", "row"}]
+        self.shop_columns = []      # nomes das lojas reconhecidas
+        self.ignored_columns = []
+
+    @property
+    def has_changes(self):
+        return bool(self.create or self.update or self.prices_upsert or self.prices_delete)
+
+
+def _catalog_header(reader, shops):
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError("Arquivo vazio.")
+    index, shop_cols, ignored = {}, {}, []
+    for i, name in enumerate(header):
+        key = _key(name)
+        if key in CATALOG_COLUMNS:
+            index.setdefault(CATALOG_COLUMNS[key], i)
+            continue
+        for prefix in _SHOP_PREFIXES:
+            if key.startswith(prefix):
+                key = key[len(prefix):].strip()
+                break
+        if key in shops:
+            shop_cols[i] = shops[key]
+        elif key:
+            ignored.append(name)
+    if "name" not in index:
+        raise ImportFileError("O arquivo precisa da coluna 'nome'.")
+    return index, shop_cols, ignored
+
+
+def plan_catalog(owner_id, rows):
+    """
+    Dry-run: lê a planilha inteira e compara com o banco (3 queries:
+    produtos, lojas, overrides). Célula vazia = mantém o valor atual.
+    """
+    shops = {_key(name): (pk, name) for pk, name in Shop.objects.filter(owner_id=owner_id).values_list("pk", "name")}
+    index, shop_cols, ignored = _catalog_header(rows, shops)
+    products = {p.name.casefold(): p for p in Product.objects.filter(owner_id=owner_id)}
+    prices = {
+        (product_id, shop_id): (pk, price)
+        for pk, product_id, shop_id, price in ProductPrice.objects.filter(owner_id=owner_id)
+        .values_list("pk", "product_id", "shop_id", "price")
+    }
+    plan = CatalogPlan()
+    plan.shop_columns = [name for _pk, name in shop_cols.values()]
+    plan.ignored_columns = ignored
+    seen = set()
+
+    for line, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        plan.rows += 1
+        name = _cell(row, index, "name")[:140]
+        errors, values, cells = [], {}, {}
+        if not name:
+            errors.append("nome vazio")
+        elif name.casefold() in seen:
+            errors.append("produto repetido no arquivo")
+        for field in PRODUCT_FIELDS:
+            raw = _cell(row, index, field)
+            if not raw:
+                continue
+            value, error = _parse_field(field, raw)
+            if error:
+                errors.append(error)
+            else:
+                values[field] = value
+        for col, (shop_id, shop_name) in shop_cols.items():
+            raw = row[col].strip() if col < len(row) else ""
+            if not raw:
+                continue
+            value = None if raw.lower() in _REMOVE else _price(raw)
+            if value is None and raw.lower() not in _REMOVE:
+                errors.append(f"{shop_name}: preço inválido")
+            cells[shop_id] = (shop_name, value)
+        if errors:
+            plan.errors.append({"line": line, "error": "; ".join(errors), "row": row})
+            continue
+        seen.add(name.casefold())
+
+        product = products.get(name.casefold())
+        details = []
+        if product is None:
+            product = Product(owner_id=owner_id, name=name, **values)
+            plan.create.append(product)
+            action = "novo"
+        else:
+            changed = []
+            for field, value in values.items():
+                old = getattr(product, field)
+                if old != value:
+                    details.append(f"{Product._meta.get_field(field).verbose_name}: {old} → {value}")
+                    setattr(product, field, value)
+                    changed.append(field)
+            if changed:
+                plan.update.append((product, changed))
+            action = "alterado"
+
+        for shop_id, (shop_name, value) in cells.items():
+            current = prices.get((product.pk, shop_id))
+            if value is None:
+                if current:
+                    plan.prices_delete.append(current[0])
+                    details.append(f"{shop_name}: {_brl(current[1])} → padrão")
+            elif current is None or current[1] != value:
+                plan.prices_upsert.append(ProductPrice(owner_id=owner_id, product=product, shop_id=shop_id, price=value))
+                details.append(f"{shop_name}: {_brl(current[1] if current else None)} → {_brl(value)}")
+
+        if action == "novo" or details:
+            plan.changes.append({"line": line, "product": name, "action": action, "details": "; ".join(details)})
+    return plan
+
+
+@tenant_atomic()
+def apply_catalog(owner_id, plan):
+    """Grava o plano numa transação: bulk_create/bulk_update de produtos e upsert de overrides."""
+    now = timezone.now()
+    Product.objects.bulk_create(plan.create, batch_size=500)
+    if plan.update:
+        fields = sorted({f for _p, changed in plan.update for f in changed})
+        for product, _changed in plan.update:
+            product.updated_at = now  # bulk_update não aplica auto_now
+        Product.objects.bulk_update([p for p, _c in plan.update], [*fields, "updated_at"], batch_size=500)
+    ProductPrice.objects.bulk_create(
+        plan.prices_upsert, batch_size=500,
+        update_conflicts=True, unique_fields=["product", "shop"], update_fields=["price", "updated_at"],
+    )
+    if plan.prices_delete:
+        ProductPrice.objects.filter(owner_id=owner_id, pk__in=plan.prices_delete).delete()
+    sharding.on_commit(lambda: catalog_bulk_changed.send(sender=Product, owner_id=owner_id))
+
+
+def import_catalog(job, fileobj):
+    """Reexecuta o dry-run contra o banco atual e grava (tarefa da fila, após a confirmação)."""
+    plan = plan_catalog(job.owner_id, open_rows(fileobj, job.filename))
+    apply_catalog(job.owner_id, plan)
+    job.processed, job.created, job.updated = plan.rows, len(plan.create), len(plan.update)
+    job.failed, job.errors = len(plan.errors), plan.errors[:ImportJob.MAX_ERRORS]
+    ImportJob.objects.filter(pk=job.pk).update(
+        processed=job.processed, created=job.created, updated=job.updated, failed=job.failed, errors=job.errors,
+    )
+
+
+IMPORTERS = {ImportJob.KIND_CLIENTS: import_clients, ImportJob.KIND_CATALOG: import_catalog}
+
+
+def run(job):
+    """Executa o job (chamado pela tarefa da fila) e registra o resultado."""
+    job.status = ImportJob.STATUS_RUNNING
+    ImportJob.objects.filter(pk=job.pk).update(status=job.status)
+    try:
+        with job.file.open("rb") as fh:
+            if not job.total_rows:  # o catálogo já contou na prévia
+                job.total_rows = count_rows(fh)
+                ImportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows)
+            IMPORTERS[job.kind](job, fh.file)
+    except FILE_ERRORS as e:
+        _finish(job, ImportJob.STATUS_FAILED, str(e))
+    except Exception:
+        _finish(job, ImportJob.STATUS_FAILED, "Erro inesperado ao importar; as linhas já gravadas foram mantidas.")
+        raise
+    else:
+        _finish(job, ImportJob.STATUS_DONE)
+
+
+def abort(job):
+    """Job que ficou "running" com o worker morto: marca como falho para o usuário reenviar."""
+    _finish(job, ImportJob.STATUS_FAILED,
+            "A importação foi interrompida; envie a planilha novamente. As linhas já gravadas foram mantidas.")
+
+
+def _finish(job, status, message=""):
+    job.status, job.message, job.finished_at = status, message, timezone.now()
+    job.file.delete(save=False)  # planilha com dados pessoais não fica guardada
+    ImportJob.objects.filter(pk=job.pk).update(status=status, message=message, finished_at=job.finished_at, file="")
+
+
+def error_report(job, out):
+    """Relatório de erros em CSV: linha, erro e as colunas originais."""
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(["linha", "erro", "conteudo"])
+    for err in job.errors:
+        writer.writerow([err["line"], err["error"], *err["row"]])
+    return out
+
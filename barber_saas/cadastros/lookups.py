@@ -0,0 +1,68 @@
+"""
+Leituras quentes por tenant servidas pelo core.localcache: lojas, equipe
+ativa e catálogo ativo. Quase todo request monta essas listas (loja atual,
+seletor de loja, form de comanda); aqui elas saem do LRU do processo.
+
+``*_choices`` devolvem o queryset para o campo do form já entregue ao
+identity map do request (core.identity.prime): renderizar e validar as
+escolhas não volta ao banco. A versão do tenant sobe pelos sinais em
+cadastros.signals. Com o LRU desligado (cache ``default`` por processo, ver
+core.localcache) a lista sai do identity map: uma leitura por request.
+"""
+from core import identity, localcache
+from .models import Product, Shop, Staff
+
+
+def _shops(owner_id):
+    return Shop.objects.filter(owner_id=owner_id).order_by("name")
+
+
+def _staff(owner_id):
+    return Staff.objects.filter(owner_id=owner_id, is_active=True).order_by("full_name")
+
+
+def _catalog(owner_id):
+    return Product.objects.filter(owner_id=owner_id, is_active=True).order_by("name")
+
+
+# ===== listas =====
+def shops(owner_id):
+    """Todas as lojas do tenant (ativas e inativas), por nome."""
+    return localcache.cached(owner_id, "shops", lambda: identity.warm(_shops(owner_id)))
+
+
+def active_staff(owner_id):
+    return localcache.cached(owner_id, "staff", lambda: identity.warm(_staff(owner_id)))
+
+
+def catalog(owner_id):
+    return localcache.cached(owner_id, "catalog", lambda: identity.warm(_catalog(owner_id)))
+
+
+def shop(owner_id, shop_id):
+    if not shop_id:
+        return None
+    return next((s for s in shops(owner_id) if str(s.pk) == str(shop_id)), None)
+
+
+# ===== querysets de forms =====
+def _choices(qs, load, owner_id):
+    if identity.active():  # fora de request o form consulta o banco normalmente
+        identity.prime(qs, load(owner_id))
+    return qs
+
+
+def shop_choices(owner_id):
+    return _choices(_shops(owner_id), shops, owner_id)
+
+
+def staff_choices(owner_id):
+    return _choices(_staff(owner_id), active_staff, owner_id)
+
+
+def catalog_choices(owner_id):
+    return _choices(_catalog(owner_id), catalog, owner_id)
+
+
+def invalidate(owner_id):
+    localcache.bump(owner_id)
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+from . import permissions
+
+
+def _tenant_user(request):
+    if request.access.owner_id == request.user.pk:
+        return request.user
+    return get_user_model().objects.using(DEFAULT_DB_ALIAS).get(pk=request.access.owner_id)
+
+
+class AccessMiddleware:
+    """
+    request.access (papel no tenant ativo) e request.tenant (owner desse
+    tenant), resolvidos só quando usados e só para usuários autenticados.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.access = SimpleLazyObject(
+            lambda: permissions.resolve(request.user, request.session.get(permissions.SESSION_KEY))
+        )
+        request.tenant = SimpleLazyObject(lambda: _tenant_user(request))
+        return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_client'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='duration_minutes',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0004_product_duration_minutes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='cadastros_c_owner_i_175339_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='cadastros_p_owner_i_3789be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productprice',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='cadastros_p_owner_i_4beafd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='cadastros_s_owner_i_1e67ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffmembership',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='cadastros_s_owner_i_1495e2_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0006_import_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('clients', 'Clientes'), ('catalog', 'Catálogo')], max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='status',
+            field=models.CharField(choices=[('preview', 'Aguardando confirmação'), ('pending', 'Na fila'), ('running', 'Importando'), ('done', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=16),
+        ),
+    ]
@@ -6,6 +6,9 @@ from django.shortcuts import render
 from django.template.loader import render_to_string  # <- precisa deste import
 from django.http import HttpResponse
 
+from core import identity, sharding
+from . import lookups
+
 def is_htmx(request):
     """Return True if the request comes from HTMX."""
     return (
@@ -13,44 +16,81 @@ def is_htmx(request):
         or request.META.get("HTTP_HX_REQUEST") == "true"
     )
 
-class OwnerQuerysetMixin(LoginRequiredMixin):
+class TenantShardMixin(LoginRequiredMixin):
+    """
+    Ativa o tenant do request (request.access, ver cadastros.permissions) para
+    o router de shards e confere se o papel permite a ação da view.
+    ``permission_action`` fixa a ação; sem ela, GET/HEAD = "view" e o resto = ``write_action``.
+    """
+    permission_action = None
+    write_action = "change"
+
+    def get_permission_action(self):
+        if self.permission_action:
+            return self.permission_action
+        return "view" if self.request.method in ("GET", "HEAD", "OPTIONS") else self.write_action
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            sharding.activate(request.access.owner_id)  # a TenantShardMiddleware limpa ao fim do request
+            if not request.access.can(self.get_permission_action()):
+                raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+class OwnerQuerysetMixin(TenantShardMixin):
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(owner=self.request.user)
+        return self.request.access.scope(qs)
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        if obj.owner_id != self.request.user.id:
+        # papel da loja do objeto, não o maior do usuário (cadastros.permissions)
+        if not self.request.access.allows(obj, self.get_permission_action()):
             raise PermissionDenied
         return obj
 
-class OwnerCreateMixin(LoginRequiredMixin):
+class ShopScopedFormMixin:
+    """Campo ``shop`` do form só oferece as lojas do papel (filtro em memória, sem query)."""
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        field = form.fields.get("shop")
+        shop_ids = self.request.access.shop_ids
+        if field is not None and shop_ids is not None:
+            allowed = field.queryset.filter(pk__in=shop_ids)
+            if identity.active():
+                identity.prime(allowed, [s for s in identity.warm(field.queryset) if str(s.pk) in shop_ids])
+            field.queryset = allowed
+        return form
+
+class OwnerCreateMixin(ShopScopedFormMixin, TenantShardMixin):
     """
     Para CreateView: garante que a instância inicial já tenha owner
     antes da validação do ModelForm (que chama model.clean()).
     Além disso, passa `owner` pro Form (TenantOwnedForm) filtrar FKs.
     """
+    permission_action = "add"
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         # passa para o Form (ex.: TenantOwnedForm)
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
 
         # instancia com owner ANTES da validação
         inst = kwargs.get("instance")
         if inst is None:
             # CreateView normalmente passa instance=None; criamos uma já com owner
-            kwargs["instance"] = self.model(owner=self.request.user)
+            kwargs["instance"] = self.model(owner=self.request.tenant)
         else:
             # fallback para qualquer caso atípico
             if getattr(inst, "owner_id", None) is None:
-                inst.owner = self.request.user
+                inst.owner = self.request.tenant
 
         return kwargs
 
-class OwnerUpdateMixin(LoginRequiredMixin):
+class OwnerUpdateMixin(ShopScopedFormMixin, TenantShardMixin):
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         return kwargs
 
 class CurrentShopMixin:
@@ -62,11 +102,20 @@ class CurrentShopMixin:
 
     def dispatch(self, request, *args, **kwargs):
         shop_id = request.GET.get("shop") or request.session.get(self.session_key)
+        access = request.access if request.user.is_authenticated else None
+        if access is not None and access.shop_ids is not None and not (shop_id and access.allows_shop(shop_id)):
+            # papel restrito a algumas lojas: nunca "todas", nem loja fora do papel
+            shop_id = min(access.shop_ids)
         if shop_id:
             request.session[self.session_key] = str(shop_id)
         self.current_shop_id = request.session.get(self.session_key)
         return super().dispatch(request, *args, **kwargs)
 
+    @property
+    def current_shop(self):
+        """Loja atual, lida da lista de lojas em cache local (cadastros.lookups)."""
+        return lookups.shop(self.request.access.owner_id, self.current_shop_id)
+
 class HtmxCrudMixin:
     list_partial_template = None
     list_context_name = None
@@ -85,7 +134,7 @@ class HtmxCrudMixin:
     def form_valid(self, form):
         obj = form.save()
         if self.request.headers.get("HX-Request") == "true":
-            queryset = self.model.objects.filter(owner=self.request.user)
+            queryset = self.request.access.scope(self.model.objects.all())
             if hasattr(self, "filter_queryset_for_list"):
                 queryset = self.filter_queryset_for_list(queryset)
 
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+from core import identity
 from core.models import TenantOwnedModel, UUIDModel, TimeStampedModel, TenantQuerySet
 
 # ===== Domínio =====
@@ -16,7 +17,10 @@ class Shop(TenantOwnedModel):
 
     class Meta:
         unique_together = [("owner", "name")]
-        indexes = [models.Index(fields=["owner", "is_active"])]
+        indexes = [
+            models.Index(fields=["owner", "is_active"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -68,19 +72,22 @@ class StaffMembership(TenantOwnedModel):
 
     class Meta:
         unique_together = [("staff", "shop")]
-        indexes = [models.Index(fields=["shop", "role", "is_active"])]
+        indexes = [
+            models.Index(fields=["shop", "role", "is_active"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
+        ]
 
     def clean(self):
         super().clean()
         # compare por *_id para não disparar a carga do related quando None
         if self.shop_id and self.owner_id:
             # self.shop é seguro aqui (shop_id existe), mas guardamos mesmo assim
-            if getattr(self.shop, "owner_id", None) != self.owner_id:
+            if getattr(identity.related(self, "shop"), "owner_id", None) != self.owner_id:
                 raise ValidationError("Membership.owner deve ser o mesmo owner da Shop.")
 
         if self.staff_id and self.owner_id:
             # idem: só acessa staff se staff_id existir
-            if getattr(self.staff, "owner_id", None) != self.owner_id:
+            if getattr(identity.related(self, "staff"), "owner_id", None) != self.owner_id:
                 raise ValidationError("Membership.owner deve ser o mesmo owner do Staff.")
 
     def __str__(self):
@@ -112,6 +119,8 @@ class Product(TenantOwnedModel):
     type = models.CharField(max_length=16, choices=TYPE_CHOICES, default=TYPE_SERVICE)
     description = models.TextField(blank=True)
     default_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    # tempo de cadeira usado pela agenda/disponibilidade (0 = não ocupa agenda, ex.: revenda)
+    duration_minutes = models.PositiveSmallIntegerField(default=30)
     # se False, espera-se override por loja em ProductPrice
     share_across_shops = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
@@ -121,6 +130,7 @@ class Product(TenantOwnedModel):
         indexes = [
             models.Index(fields=["owner", "is_active"]),
             models.Index(fields=["owner", "type"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
         ]
 
     def __str__(self):
@@ -138,13 +148,17 @@ class ProductPrice(TenantOwnedModel):
 
     class Meta:
         unique_together = [("product", "shop")]
-        indexes = [models.Index(fields=["shop"]), models.Index(fields=["product"])]
+        indexes = [
+            models.Index(fields=["shop"]),
+            models.Index(fields=["product"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
+        ]
 
     def clean(self):
         super().clean()
-        if self.product and self.owner_id and self.product.owner_id != self.owner_id:
+        if self.product_id and self.owner_id and identity.related(self, "product").owner_id != self.owner_id:
             raise ValidationError("ProductPrice.owner deve ser o mesmo owner do Product.")
-        if self.shop and self.owner_id and self.shop.owner_id != self.owner_id:
+        if self.shop_id and self.owner_id and identity.related(self, "shop").owner_id != self.owner_id:
             raise ValidationError("ProductPrice.owner deve ser o mesmo owner da Shop.")
 
     def __str__(self):
@@ -163,7 +177,67 @@ class Client(TenantOwnedModel):
         indexes = [
             models.Index(fields=["owner", "name"]),
             models.Index(fields=["owner", "phone"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
         ]
 
     def __str__(self):
         return self.name
+
+
+class ImportJob(TenantOwnedModel):
+    """
+    Importação em lote (planilha enviada pelo tenant), processada pela fila.
+    O arquivo fica em MEDIA_ROOT só até o fim do processamento; os erros por
+    linha ficam em ``errors`` ([{"line", "error", "row"}]) para o relatório.
+    """
+    KIND_CLIENTS = "clients"
+    KIND_CATALOG = "catalog"
+    KIND_CHOICES = [
+        (KIND_CLIENTS, "Clientes"),
+        (KIND_CATALOG, "Catálogo"),
+    ]
+
+    STATUS_PREVIEW = "preview"  # prévia (dry-run) exibida, aguardando confirmação
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PREVIEW, "Aguardando confirmação"),
+        (STATUS_PENDING, "Na fila"),
+        (STATUS_RUNNING, "Importando"),
+        (STATUS_DONE, "Concluída"),
+        (STATUS_FAILED, "Falhou"),
+    ]
+
+    MAX_ERRORS = 5000  # o relatório para de crescer depois disso (contagem continua)
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    file = models.FileField(upload_to="imports/%Y/%m/", blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [models.Index(fields=["owner", "kind", "created_at"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.filename} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        return min(int(self.processed * 100 / self.total_rows), 99) if self.total_rows else 0
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
@@ -0,0 +1,197 @@
+"""
+Cadastro de equipe em lote (CSV/XLSX ou lista colada).
+
+StaffAndMembershipForm resolve um funcionário por vez (User, Staff e vínculo
+com get_or_create). Aqui a lista inteira é resolvida com poucas queries
+``IN``: usuários por e-mail, perfis por user, vínculos por (staff, loja); o
+que falta entra com bulk_create. Usuários sem senha recebem o convite (link
+de definir senha) pela fila, em ``cadastros.send_staff_invites``.
+"""
+import io
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from core import sharding
+from core.queue import enqueue
+from core.sharding import tenant_atomic
+from .imports import ImportFileError, _cell, _header, _key, open_csv
+from .models import Shop, Staff, StaffMembership
+from .signals import staff_bulk_changed
+
+STAFF_COLUMNS = {
+    "email": "email", "e-mail": "email",
+    "nome": "full_name", "nome completo": "full_name", "name": "full_name",
+    "telefone": "phone", "celular": "phone", "phone": "phone", "whatsapp": "phone",
+    "loja": "shops", "lojas": "shops", "shop": "shops", "unidade": "shops",
+    "papel": "role", "funcao": "role", "cargo": "role", "role": "role",
+}
+# lista colada sem cabeçalho: e-mail; nome; telefone; loja; papel
+PLAIN_ORDER = ("email", "full_name", "phone", "shops", "role")
+ROLES = {
+    "staff": StaffMembership.ROLE_STAFF, "funcionario": StaffMembership.ROLE_STAFF, "barbeiro": StaffMembership.ROLE_STAFF,
+    "manager": StaffMembership.ROLE_MANAGER, "gerente": StaffMembership.ROLE_MANAGER,
+    "owner": StaffMembership.ROLE_OWNER, "dono": StaffMembership.ROLE_OWNER,
+}
+
+
+@dataclass
+class Roster:
+    # email -> {"full_name", "phone", "shops": {shop_id: role}}
+    people: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)  # (linha, mensagem)
+
+
+@dataclass
+class OnboardResult:
+    users_created: int = 0
+    staff_created: int = 0
+    staff_updated: int = 0
+    memberships_created: int = 0
+    memberships_existing: int = 0
+    invited: int = 0
+
+
+def text_rows(text):
+    return open_csv(io.BytesIO((text or "").encode("utf-8")))
+
+
+def parse_roster(owner_id, rows, default_shops=(), default_role=StaffMembership.ROLE_STAFF):
+    """
+    Lê as linhas (a primeira pode ser cabeçalho). A mesma pessoa pode vir em
+    várias linhas (uma por loja) ou com várias lojas separadas por "|".
+    Sem coluna de loja valem ``default_shops``.
+    """
+    shops = {_key(name): pk for pk, name in Shop.objects.filter(owner_id=owner_id).values_list("pk", "name")}
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        raise ImportFileError("Lista vazia.")
+    if any("@" in cell for cell in first):
+        index = {name: i for i, name in enumerate(PLAIN_ORDER)}
+        rows, line = _prepend(first, rows), 1
+    else:
+        index = _header(_prepend(first, iter(())), STAFF_COLUMNS)
+        line = 2
+        if "email" not in index:
+            raise ImportFileError("A lista precisa da coluna 'email'.")
+
+    roster = Roster()
+    for line, row in enumerate(rows, start=line):
+        if not any(cell.strip() for cell in row):
+            continue
+        email = _cell(row, index, "email").lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            roster.errors.append((line, f"E-mail inválido: {email or '(vazio)'}"))
+            continue
+        raw_role = _key(_cell(row, index, "role"))
+        role = ROLES.get(raw_role, default_role if not raw_role else None)
+        if role is None:
+            roster.errors.append((line, f"Papel desconhecido: {_cell(row, index, 'role')}"))
+            continue
+        names = [n for n in (_key(n) for n in _cell(row, index, "shops").split("|")) if n]
+        unknown = [n for n in names if n not in shops]
+        if unknown:
+            roster.errors.append((line, f"Loja não encontrada: {', '.join(unknown)}"))
+            continue
+        shop_ids = [shops[n] for n in names] or list(default_shops)
+        if not shop_ids:
+            roster.errors.append((line, "Informe a loja (coluna ou padrão do formulário)."))
+            continue
+
+        person = roster.people.setdefault(email, {"full_name": "", "phone": "", "shops": {}})
+        person["full_name"] = _cell(row, index, "full_name")[:150] or person["full_name"]
+        person["phone"] = _cell(row, index, "phone")[:32] or person["phone"]
+        for shop_id in shop_ids:
+            person["shops"][shop_id] = role
+    return roster
+
+
+def _prepend(first, rows):
+    yield first
+    yield from rows
+
+
+# ===== gravação =====
+def _resolve_users(emails):
+    """{email: user}; cria (bulk) quem ainda não tem conta. Devolve (mapa, criados)."""
+    User = get_user_model()
+    users = {u.email.lower(): u for u in User.objects.using(DEFAULT_DB_ALIAS).filter(email__in=emails)}
+    missing = [e for e in emails if e not in users]
+    if missing:
+        new = []
+        for email in missing:
+            user = User(email=email, is_active=True)
+            user.set_unusable_password()
+            new.append(user)
+        User.objects.using(DEFAULT_DB_ALIAS).bulk_create(new, batch_size=500)
+        if not connections[DEFAULT_DB_ALIAS].features.can_return_rows_from_bulk_insert:
+            new = list(User.objects.using(DEFAULT_DB_ALIAS).filter(email__in=missing))  # sem ids no INSERT
+        if sharding.is_sharded():
+            sharding.mirror_users(new)  # bulk_create não passa pelo post_save do espelho
+        users.update((u.email.lower(), u) for u in new)
+    return users, len(missing)
+
+
+def onboard(owner_id, roster, invite_url=None):
+    """
+    Grava a lista. Com ``invite_url`` (raiz do site), quem ainda não tem
+    senha recebe o convite pela fila.
+    """
+    result = OnboardResult()
+    if not roster.people:
+        return result
+    users, result.users_created = _resolve_users(list(roster.people))
+    user_ids = {email: users[email].pk for email in roster.people}
+
+    with tenant_atomic():
+        staff = {s.user_id: s for s in Staff.objects.filter(owner_id=owner_id, user_id__in=user_ids.values())}
+        create, update = [], []
+        for email, person in roster.people.items():
+            profile = staff.get(user_ids[email])
+            if profile is None:
+                profile = Staff(owner_id=owner_id, user_id=user_ids[email], full_name=person["full_name"],
+                                phone=person["phone"], is_active=True)
+                staff[profile.user_id] = profile
+                create.append(profile)
+            elif (person["full_name"] and person["full_name"] != profile.full_name) or \
+                    (person["phone"] and person["phone"] != profile.phone):
+                profile.full_name = person["full_name"] or profile.full_name
+                profile.phone = person["phone"] or profile.phone
+                profile.updated_at = timezone.now()  # bulk_update não aplica auto_now
+                update.append(profile)
+        Staff.objects.bulk_create(create, batch_size=500)
+        Staff.objects.bulk_update(update, ["full_name", "phone", "updated_at"], batch_size=500)
+        result.staff_created, result.staff_updated = len(create), len(update)
+
+        wanted = {
+            (staff[user_ids[email]].pk, shop_id): role
+            for email, person in roster.people.items()
+            for shop_id, role in person["shops"].items()
+        }
+        existing = set(StaffMembership.objects.filter(
+            owner_id=owner_id,
+            staff_id__in={staff_id for staff_id, _ in wanted},
+            shop_id__in={shop_id for _, shop_id in wanted},
+        ).values_list("staff_id", "shop_id"))
+        StaffMembership.objects.bulk_create([
+            StaffMembership(owner_id=owner_id, staff_id=staff_id, shop_id=shop_id, role=role, is_active=True)
+            for (staff_id, shop_id), role in wanted.items() if (staff_id, shop_id) not in existing
+        ], batch_size=500)
+        result.memberships_existing = len(existing & wanted.keys())
+        result.memberships_created = len(wanted) - result.memberships_existing
+        changed_users = list(user_ids.values())
+        sharding.on_commit(lambda: staff_bulk_changed.send(sender=Staff, owner_id=owner_id, user_ids=changed_users))
+
+    if invite_url:
+        pending = [u.pk for u in users.values() if not u.has_usable_password()]
+        if pending:
+            enqueue("cadastros.send_staff_invites", owner_id, pending, invite_url)
+        result.invited = len(pending)
+    return result
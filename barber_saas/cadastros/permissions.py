@@ -0,0 +1,151 @@
+"""
+Papéis (StaffMembership.role) aplicados aos requests.
+
+Por usuário, um mapa {tenant: {loja: papel}} com todos os vínculos ativos
+sai de uma query por shard e fica em cache até um vínculo/perfil dele mudar
+(sinais abaixo). O próprio usuário é sempre dono do seu tenant.
+
+No request (cadastros.middleware.AccessMiddleware) ``request.access`` diz
+em qual tenant ele está agindo e o papel em cada loja; ``request.tenant`` é
+o owner desse tenant (o próprio request.user quando é o dono). A view é
+liberada se o papel de alguma loja permite a ação (``can``); o objeto, pelo
+papel na loja dele (``allows``), então gerente numa loja e barbeiro em outra
+não ganha direitos de gerente na segunda. Tudo sem query por objeto.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core import sharding
+from .models import Shop, StaffMembership
+
+SESSION_KEY = "tenant_id"
+CACHE_TIMEOUT = 60 * 60
+
+ROLE_RANK = {StaffMembership.ROLE_STAFF: 1, StaffMembership.ROLE_MANAGER: 2, StaffMembership.ROLE_OWNER: 3}
+# "manage": configuração do tenant (lojas, catálogo, equipe, importações, fechamentos)
+ACTIONS = {
+    StaffMembership.ROLE_OWNER: frozenset({"view", "add", "change", "delete", "manage"}),
+    StaffMembership.ROLE_MANAGER: frozenset({"view", "add", "change", "delete"}),
+    StaffMembership.ROLE_STAFF: frozenset({"view", "add", "change"}),
+}
+
+
+# ===== mapa de vínculos =====
+def _key(user_id):
+    return f"perm:memberships:{user_id}"
+
+
+def build_map(user_id):
+    """{owner_id: {"shops": {shop_id: papel}, "owns": bool}} — vínculos ativos do usuário."""
+    result = {}
+    for alias in sharding.shard_aliases():
+        rows = StaffMembership.objects.using(alias).filter(
+            staff__user_id=user_id, is_active=True, staff__is_active=True, shop__is_active=True,
+        ).values_list("owner_id", "shop_id", "role")
+        for owner_id, shop_id, role in rows:
+            result.setdefault(owner_id, {"shops": {}, "owns": False})["shops"][str(shop_id)] = role
+    own = result.setdefault(user_id, {"shops": {}, "owns": False})
+    with sharding.tenant(user_id):
+        own["owns"] = Shop.objects.filter(owner_id=user_id).exists()
+    return result
+
+
+def memberships(user_id):
+    data = cache.get(_key(user_id))
+    if data is None:
+        data = build_map(user_id)
+        cache.set(_key(user_id), data, CACHE_TIMEOUT)
+    return data
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(pk) for pk in user_ids if pk is not None])
+
+
+# ===== acesso no request =====
+class Access:
+    """
+    Papel do usuário no tenant ativo. ``shop_roles`` {loja: papel}; None = dono
+    (todas as lojas). ``role`` é o maior papel (o que a view pode oferecer).
+    """
+
+    def __init__(self, user_id, owner_id, shop_roles, tenants):
+        self.user_id = user_id
+        self.owner_id = owner_id
+        self.shop_roles = shop_roles
+        self.shop_ids = None if shop_roles is None else frozenset(shop_roles)
+        self.role = StaffMembership.ROLE_OWNER if shop_roles is None else \
+            max(shop_roles.values(), key=ROLE_RANK.__getitem__)
+        self.tenants = tenants
+
+    def __repr__(self):
+        return f"<Access user={self.user_id} tenant={self.owner_id} role={self.role}>"
+
+    @property
+    def is_owner(self):
+        return self.role == StaffMembership.ROLE_OWNER
+
+    def can(self, action):
+        """A ação é permitida em alguma loja? (checagem da view, antes do objeto)"""
+        return action in ACTIONS[self.role]
+
+    def role_in(self, shop_id):
+        """
+        Papel na loja (None = fora do escopo). Sem loja (cliente, catálogo:
+        servem a todas) vale o menor papel do usuário no tenant.
+        """
+        if self.shop_roles is None:
+            return StaffMembership.ROLE_OWNER
+        if shop_id is None:
+            return min(self.shop_roles.values(), key=ROLE_RANK.__getitem__)
+        return self.shop_roles.get(str(shop_id))
+
+    def can_in(self, action, shop_id):
+        role = self.role_in(shop_id)
+        return role is not None and action in ACTIONS[role]
+
+    def tenant_choices(self):
+        """[(owner_id, e-mail)] dos tenants em que o usuário pode agir (troca de tenant)."""
+        return list(get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(pk__in=self.tenants)
+                    .order_by("email").values_list("pk", "email"))
+
+    def allows_shop(self, shop_id):
+        return self.shop_ids is None or shop_id is None or str(shop_id) in self.shop_ids
+
+    def allows(self, obj, action=None):
+        """Objeto já carregado pertence ao escopo (e o papel na loja dele permite ``action``)? Sem query."""
+        if obj.owner_id != self.owner_id:
+            return False
+        shop_id = obj.pk if isinstance(obj, Shop) else getattr(obj, "shop_id", None)
+        if not self.allows_shop(shop_id):
+            return False
+        return action is None or self.can_in(action, shop_id)
+
+    def scope(self, qs):
+        qs = qs.filter(owner_id=self.owner_id)
+        if self.shop_ids is None:
+            return qs
+        model = qs.model
+        if model is Shop:
+            return qs.filter(pk__in=self.shop_ids)
+        if any(f.name == "shop" for f in model._meta.concrete_fields):
+            return qs.filter(shop_id__in=self.shop_ids)
+        return qs
+
+
+def resolve(user, tenant_id=None):
+    """Access do usuário no tenant pedido (ou no padrão)."""
+    data = memberships(user.pk)
+    tenants = [pk for pk, entry in data.items() if pk == user.pk or entry["shops"]]
+    if tenant_id not in tenants:
+        # padrão: o próprio tenant, salvo funcionário que não tem loja própria
+        others = [pk for pk in tenants if pk != user.pk]
+        tenant_id = user.pk if data[user.pk]["owns"] or not others else others[0]
+    if tenant_id == user.pk:
+        return Access(user.pk, user.pk, None, tenants)
+    shops = data[tenant_id]["shops"]
+    # só o papel "owner" enxerga (e administra) todas as lojas do tenant
+    if StaffMembership.ROLE_OWNER in shops.values():
+        return Access(user.pk, tenant_id, None, tenants)
+    return Access(user.pk, tenant_id, dict(shops), tenants)
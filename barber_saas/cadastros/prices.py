@@ -0,0 +1,177 @@
+"""
+Matriz produto x loja de preços.
+
+Leitura: três queries (produtos, lojas ativas, overrides) montam a grade
+com o preço efetivo de cada célula. Escrita: a grade manda só as células
+alteradas; ``save_matrix`` grava tudo numa transação (upsert dos overrides
+preenchidos, exclusão dos esvaziados). Reajustes em massa ("+10% nos
+serviços da loja X") são um único UPDATE.
+"""
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from core import sharding
+from core.sharding import tenant_atomic
+from .models import Product, ProductPrice, Shop
+from .signals import catalog_bulk_changed
+
+
+class PriceError(ValueError):
+    pass
+
+
+def parse_price(raw):
+    text = (raw or "").replace("R$", "").strip()
+    if "," in text:  # 1.234,50
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise PriceError(f"Preço inválido: {raw}")
+    if not value.is_finite() or value < 0 or value >= Decimal("100000000"):
+        raise PriceError(f"Preço inválido: {raw}")
+    return value.quantize(Decimal("0.01"))
+
+
+def parse_percent(raw):
+    """ "+10", "-5,5", "10%" -> Decimal."""
+    text = (raw or "").replace("%", "").replace(",", ".").strip()
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise PriceError("Percentual inválido.")
+    if not value.is_finite() or not Decimal(-100) <= value <= Decimal(1000):
+        raise PriceError("Percentual inválido.")
+    return value
+
+
+def parse_cells(data, prefix="cell:"):
+    """Campos "cell:<produto>:<loja>" do POST -> {(product_id, shop_id): texto}."""
+    changes = {}
+    for key, value in data.items():
+        if not key.startswith(prefix):
+            continue
+        try:
+            product_id, shop_id = (uuid.UUID(part) for part in key[len(prefix):].split(":"))
+        except ValueError:
+            raise PriceError("Célula inválida.")
+        changes[(product_id, shop_id)] = value
+    return changes
+
+
+# ===== leitura =====
+def price_matrix(owner_id, product_type=None):
+    """{"shops": [...], "rows": [{"product", "cells": [{"shop_id", "price", "effective", "override"}]}]}"""
+    shops = list(Shop.objects.filter(owner_id=owner_id, is_active=True).order_by("name").values("id", "name"))
+    products = Product.objects.filter(owner_id=owner_id, is_active=True).order_by("name")
+    if product_type:
+        products = products.filter(type=product_type)
+    products = list(products.values("id", "name", "type", "default_price"))
+    overrides = dict(
+        ((product_id, shop_id), price)
+        for product_id, shop_id, price in ProductPrice.objects.filter(
+            owner_id=owner_id, shop_id__in=[s["id"] for s in shops], product_id__in=[p["id"] for p in products],
+        ).values_list("product_id", "shop_id", "price")
+    )
+    rows = []
+    for p in products:
+        cells = []
+        for s in shops:
+            price = overrides.get((p["id"], s["id"]))
+            cells.append({
+                "shop_id": s["id"], "price": price, "override": price is not None,
+                "effective": price if price is not None else p["default_price"],
+            })
+        rows.append({"product": p, "cells": cells})
+    return {"shops": shops, "rows": rows}
+
+
+# ===== gravação =====
+def _notify(owner_id):
+    sharding.on_commit(lambda: catalog_bulk_changed.send(sender=ProductPrice, owner_id=owner_id))
+
+
+@tenant_atomic()
+def save_matrix(owner_id, changes):
+    """
+    ``changes``: {(product_id, shop_id): "45,00" ou "" (volta ao preço padrão)}.
+    Ids de outro tenant são rejeitados. Devolve (gravados, removidos).
+    """
+    product_ids = {str(p) for p, _s in changes}
+    shop_ids = {str(s) for _p, s in changes}
+    valid_products = {str(pk) for pk in Product.objects.filter(owner_id=owner_id, pk__in=product_ids).values_list("pk", flat=True)}
+    valid_shops = {str(pk) for pk in Shop.objects.filter(owner_id=owner_id, pk__in=shop_ids).values_list("pk", flat=True)}
+    if product_ids - valid_products or shop_ids - valid_shops:
+        raise PriceError("Produto ou loja inexistente.")
+
+    upserts, removals = [], []
+    for (product_id, shop_id), raw in changes.items():
+        if (raw or "").strip():
+            upserts.append(ProductPrice(owner_id=owner_id, product_id=product_id, shop_id=shop_id, price=parse_price(raw)))
+        else:
+            removals.append((product_id, shop_id))
+
+    ProductPrice.objects.bulk_create(
+        upserts, batch_size=500,
+        update_conflicts=True, unique_fields=["product", "shop"], update_fields=["price", "updated_at"],
+    )
+    removed = 0
+    if removals:
+        by_shop = {}
+        for product_id, shop_id in removals:
+            by_shop.setdefault(shop_id, []).append(product_id)
+        cond = Q()
+        for shop_id, product_ids in by_shop.items():
+            cond |= Q(shop_id=shop_id, product_id__in=product_ids)
+        # .delete() do queryset passa pelo post_delete (tombstone do sync)
+        removed = ProductPrice.objects.filter(cond, owner_id=owner_id).delete()[0]
+    _notify(owner_id)
+    return len(upserts), removed
+
+
+@tenant_atomic()
+def bulk_adjust(owner_id, percent, shop_id=None, product_type=None):
+    """
+    Reajusta preços em ``percent`` % com um único UPDATE.
+    Com loja: os produtos sem override ganham um (preço padrão) antes, para
+    que o reajuste valha para todos os preços efetivos da loja.
+    Sem loja: reajusta o preço padrão dos produtos.
+    """
+    factor = (Decimal(100) + Decimal(percent)) / Decimal(100)
+    if factor < 0:
+        raise PriceError("Reajuste deixaria preços negativos.")
+    if shop_id:
+        try:
+            shop_id = uuid.UUID(str(shop_id))
+        except ValueError:
+            raise PriceError("Loja inexistente.")
+    products = Product.objects.filter(owner_id=owner_id, is_active=True)
+    if product_type:
+        products = products.filter(type=product_type)
+    now = timezone.now()
+
+    if not shop_id:
+        adjusted = products.update(
+            default_price=ExpressionWrapper(Round(F("default_price") * Value(factor), 2), output_field=DecimalField()),
+            updated_at=now,
+        )
+        _notify(owner_id)
+        return adjusted
+
+    if not Shop.objects.filter(owner_id=owner_id, pk=shop_id).exists():
+        raise PriceError("Loja inexistente.")
+    missing = products.exclude(shop_prices__shop_id=shop_id).values_list("pk", "default_price")
+    ProductPrice.objects.bulk_create(
+        [ProductPrice(owner_id=owner_id, product_id=pk, shop_id=shop_id, price=price) for pk, price in missing],
+        batch_size=500,
+    )
+    adjusted = ProductPrice.objects.filter(owner_id=owner_id, shop_id=shop_id, product__in=products).update(
+        price=ExpressionWrapper(Round(F("price") * Value(factor), 2), output_field=DecimalField()),
+        updated_at=now,
+    )
+    _notify(owner_id)
+    return adjusted
@@ -0,0 +1,44 @@
+"""Linhas leves (core.rows) das tabelas de cadastros."""
+from core.rows import Row
+from .models import Client, Product, StaffMembership
+
+
+class UserRef(Row):
+    __slots__ = ("pk", "email")
+
+
+class ShopRef(Row):
+    __slots__ = ("pk", "updated_at", "name")
+
+
+class StaffRef(Row):
+    related = {"user": UserRef}
+    __slots__ = ("pk", "updated_at", "full_name", "user")
+
+    def __str__(self):
+        return self.full_name or self.user.email
+
+
+class ClientRow(Row):
+    model = Client
+    __slots__ = ("pk", "updated_at", "name", "phone", "is_active")
+
+    def __str__(self):
+        return self.name
+
+
+class ProductRow(Row):
+    model = Product
+    __slots__ = ("pk", "updated_at", "name", "type", "default_price", "share_across_shops", "is_active")
+
+    def get_type_display(self):
+        return self.display("type")
+
+
+class MembershipRow(Row):
+    model = StaffMembership
+    related = {"staff": StaffRef, "shop": ShopRef}
+    __slots__ = ("pk", "updated_at", "role", "is_active", "staff", "shop")
+
+    def get_role_display(self):
+        return self.display("role")
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from core import sharding
+from . import lookups, permissions
+from .models import Product, Shop, Staff, StaffMembership
+
+# enviado após gravações em lote no catálogo (importação, matriz de preços),
+# que não passam por post_save; kwargs: owner_id
+catalog_bulk_changed = Signal()
+
+# enviado após cadastro de equipe em lote (onboarding); kwargs: owner_id, user_ids
+staff_bulk_changed = Signal()
+
+
+# ===== mapa de permissões (cadastros.permissions) =====
+@receiver(post_save, sender=StaffMembership)
+@receiver(post_delete, sender=StaffMembership)
+def membership_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        permissions.invalidate(instance.staff.user_id)
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def staff_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        permissions.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def shop_changed(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    members = [] if created else StaffMembership.objects.filter(shop_id=instance.pk).values_list("staff__user_id", flat=True)
+    permissions.invalidate(instance.owner_id, *members)
+
+
+@receiver(staff_bulk_changed)
+def staff_bulk_changed_receiver(sender, user_ids=(), **kwargs):
+    permissions.invalidate(*user_ids)
+
+
+# ===== listas quentes no cache local (cadastros.lookups) =====
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def tenant_lookups_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # no commit: antes dele, um leitor concorrente guardaria as linhas antigas sob a versão nova
+        owner_id = instance.owner_id
+        sharding.on_commit(lambda: lookups.invalidate(owner_id))
+
+
+@receiver(catalog_bulk_changed)
+@receiver(staff_bulk_changed)
+def tenant_lookups_bulk_changed(sender, owner_id, **kwargs):
+    lookups.invalidate(owner_id)
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core import sharding
+from core.queue import task
+from . import imports
+from .models import ImportJob
+
+
+@task(max_attempts=1)  # reprocessar pela metade confundiria as contagens; o usuário reenvia
+def run_import(owner_id, job_id):
+    with sharding.tenant(owner_id):
+        job = ImportJob.objects.filter(
+            owner_id=owner_id, pk=job_id, status__in=[ImportJob.STATUS_PENDING, ImportJob.STATUS_RUNNING],
+        ).first()
+        if job is None:
+            return
+        if job.status == ImportJob.STATUS_RUNNING:
+            # devolvida pelo requeue_stale: o worker anterior morreu no meio
+            imports.abort(job)
+        else:
+            imports.run(job)
+
+
+@task
+def send_staff_invites(owner_id, user_ids, base_url):
+    """Convite com link de definir senha (o mesmo fluxo do "esqueci a senha"), numa conexão SMTP só."""
+    User = get_user_model()
+    owner = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=owner_id).first()
+    messages = []
+    for user in User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids, is_active=True):
+        if user.has_usable_password():
+            continue  # já definiu a senha (convite repetido)
+        path = reverse("password_reset_confirm", kwargs={
+            "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+            "token": default_token_generator.make_token(user),
+        })
+        body = render_to_string("cadastros/emails/staff_invite.txt", {
+            "user": user, "owner": owner, "link": base_url.rstrip("/") + path,
+        })
+        messages.append(EmailMessage("Convite para a equipe", body, settings.DEFAULT_FROM_EMAIL, [user.email]))
+    if messages:
+        get_connection().send_messages(messages)
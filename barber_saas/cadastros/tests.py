@@ -1,3 +1,376 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core import queue
+from . import prices
+from .models import Client, ImportJob, Product, ProductPrice, Shop
+
+MEDIA = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA, IMPORT_CHUNK=2)
+class ClientImportTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA, ignore_errors=True)
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        Client.objects.create(owner=self.owner, name="Antigo", phone="85999990000", notes="VIP")
+        self.client.force_login(self.owner)
+
+    def _upload(self, content, encoding="utf-8"):
+        upload = SimpleUploadedFile("clientes.csv", content.encode(encoding), content_type="text/csv")
+        return self.client.post("/cadastros/clients/import/", {"file": upload}, HTTP_HX_REQUEST="true")
+
+    def test_import_upserts_by_phone_in_chunks(self):
+        resp = self._upload(
+            "Nome;Telefone;Observações\n"
+            "Maria;(85) 98888-1111;\n"
+            "João Novo;+55 85 99999-0000;\n"     # já existe: atualiza, mantém obs
+            "Sem fone;123;\n"
+            "Maria 2;85988881111;\n"             # repetido no arquivo
+            "Pedro;11 97777-2222;cliente antigo\n"
+        )
+        self.assertContains(resp, "Na fila")
+        self.assertEqual(Client.objects.count(), 1)  # nada gravado no request
+        self.assertEqual(queue.work(), 1)
+
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.processed, job.created, job.updated, job.failed),
+                         (ImportJob.STATUS_DONE, 5, 2, 1, 2))
+        self.assertFalse(job.file)  # arquivo apagado ao fim
+        updated = Client.objects.get(phone="85999990000")
+        self.assertEqual((updated.name, updated.notes), ("João Novo", "VIP"))
+        self.assertEqual(Client.objects.get(phone="11977772222").notes, "cliente antigo")
+
+        report = self.client.get(f"/cadastros/imports/{job.pk}/errors.csv").content.decode("utf-8-sig")
+        self.assertIn("4;Telefone inválido", report)
+        self.assertIn("5;Telefone repetido", report)
+        self.assertContains(self.client.get(f"/cadastros/imports/{job.pk}/"), "Com erro: 2")
+
+    def test_latin1_with_comma_and_missing_columns(self):
+        self._upload("nome,celular\nJosé,85 98888-3333\n", encoding="latin-1")
+        self._upload("cliente;email\nAna;a@b.c\n")
+        queue.work()
+        ok, bad = ImportJob.objects.order_by("created_at")
+        self.assertEqual(ok.status, ImportJob.STATUS_DONE)
+        self.assertTrue(Client.objects.filter(name="José", phone="85988883333").exists())
+        self.assertEqual(bad.status, ImportJob.STATUS_FAILED)
+        self.assertIn("telefone", bad.message)
+
+    def test_job_of_a_dead_worker_is_failed_when_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from core.models import Task
+
+        self._upload("nome;telefone\nMaria;85988881111\n")
+        job = ImportJob.objects.get()
+        # o worker pegou a tarefa, começou o job e morreu sem terminar
+        queue.claim("morto", 1)
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.STATUS_RUNNING)
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.requeue_stale(), 1)
+        queue.work()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertIn("envie a planilha novamente", job.message)
+        self.assertFalse(job.file)
+        self.assertFalse(Client.objects.filter(name="Maria").exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA)
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        from .models import Product, ProductPrice, Shop
+
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        self.centro = Shop.objects.create(owner=self.owner, name="Centro")
+        self.bairro = Shop.objects.create(owner=self.owner, name="Bairro")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        ProductPrice.objects.create(owner=self.owner, product=self.cut, shop=self.bairro, price=Decimal("35.00"))
+        self.client.force_login(self.owner)
+
+    def _upload(self, name, content):
+        upload = SimpleUploadedFile(name, content, content_type="application/octet-stream")
+        return self.client.post("/cadastros/products/import/", {"file": upload}, HTTP_HX_REQUEST="true")
+
+    def test_preview_does_not_write_and_confirm_applies(self):
+        from decimal import Decimal
+        from .models import Product, ProductPrice
+
+        resp = self._upload("catalogo.csv", (
+            "nome;preço;duração;Preço Centro;Bairro;Fornecedor\n"
+            "corte;45,00;;50,00;-;x\n"        # nome sem diferenciar maiúsculas
+            "Barba;30;20;;32,50;\n"
+            "Hidratação;abc;;;;\n"
+        ).encode())
+        self.assertContains(resp, "Produtos novos: 1 · alterados: 1")
+        self.assertContains(resp, "Linha 4: preço: valor inválido")
+        self.assertContains(resp, "Colunas ignoradas: Fornecedor")
+        self.assertEqual(Product.objects.count(), 1)  # dry-run
+
+        job = ImportJob.objects.get()
+        self.client.post(f"/cadastros/imports/{job.pk}/confirm/", HTTP_HX_REQUEST="true")
+        self.assertEqual(queue.work(), 1)
+
+        self.cut.refresh_from_db()
+        self.assertEqual(self.cut.default_price, Decimal("45.00"))
+        barba = Product.objects.get(name="Barba")
+        self.assertEqual((barba.default_price, barba.duration_minutes), (Decimal("30.00"), 20))
+        prices = {(p.product.name, p.shop.name): p.price for p in ProductPrice.objects.select_related("product", "shop")}
+        self.assertEqual(prices, {("Corte", "Centro"): Decimal("50.00"), ("Barba", "Bairro"): Decimal("32.50")})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created, job.updated, job.failed), (ImportJob.STATUS_DONE, 1, 1, 1))
+
+    def test_xlsx_and_cancel(self):
+        from io import BytesIO
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.active.append(["Nome", "Tipo", "Preço", "Centro"])
+        wb.active.append(["Pomada", "produto", 25.9, 27])
+        buf = BytesIO()
+        wb.save(buf)
+        self.assertContains(self._upload("catalogo.xlsx", buf.getvalue()), "Pomada")
+        job = ImportJob.objects.get()
+        self.client.post(f"/cadastros/imports/{job.pk}/cancel/", HTTP_HX_REQUEST="true")
+        self.assertFalse(ImportJob.objects.exists())
+
+
+class PriceMatrixTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        self.shop_a = Shop.objects.create(owner=self.owner, name="Centro")
+        self.shop_b = Shop.objects.create(owner=self.owner, name="Aldeota")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.beard = Product.objects.create(owner=self.owner, name="Barba", default_price=Decimal("25.00"))
+        self.pomade = Product.objects.create(
+            owner=self.owner, name="Pomada", type=Product.TYPE_RETAIL, default_price=Decimal("30.00"),
+        )
+        ProductPrice.objects.create(owner=self.owner, product=self.cut, shop=self.shop_a, price=Decimal("45.00"))
+        ProductPrice.objects.create(owner=self.owner, product=self.beard, shop=self.shop_a, price=Decimal("20.00"))
+        self.client.force_login(self.owner)
+
+    def _prices(self, shop):
+        return dict(ProductPrice.objects.filter(shop=shop).values_list("product__name", "price"))
+
+    def test_grid_shows_effective_prices(self):
+        resp = self.client.get("/cadastros/product-prices/matrix/")
+        self.assertContains(resp, f'name="cell:{self.cut.pk}:{self.shop_b.pk}"')
+        self.assertContains(resp, "table-warning", count=2)
+
+    def test_save_only_changed_cells_in_one_post(self):
+        resp = self.client.post("/cadastros/product-prices/matrix/", {
+            f"cell:{self.cut.pk}:{self.shop_a.pk}": "50,00",    # altera override
+            f"cell:{self.beard.pk}:{self.shop_a.pk}": "",       # volta ao padrão
+            f"cell:{self.pomade.pk}:{self.shop_b.pk}": "35",    # novo override
+        }, HTTP_HX_REQUEST="true")
+        self.assertIn("2 preço(s) salvo(s), 1 voltaram ao padrão", json.loads(resp["HX-Trigger"])["toast"])
+        self.assertEqual(self._prices(self.shop_a), {"Corte": Decimal("50.00")})
+        self.assertEqual(self._prices(self.shop_b), {"Pomada": Decimal("35.00")})
+
+        other = get_user_model().objects.create_user("other@example.com", "pass")
+        foreign = Shop.objects.create(owner=other, name="Outra")
+        resp = self.client.post("/cadastros/product-prices/matrix/", {
+            f"cell:{self.cut.pk}:{foreign.pk}": "1",
+            f"cell:{self.cut.pk}:{self.shop_a.pk}": "2",
+        })
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self._prices(self.shop_a), {"Corte": Decimal("50.00")})  # nada gravado
+
+    def test_bulk_adjust_services_at_shop(self):
+        resp = self.client.post("/cadastros/product-prices/matrix/adjust/", {
+            "percent": "+10", "shop": str(self.shop_a.pk), "type": Product.TYPE_SERVICE,
+        })
+        self.assertIn("2 preço(s) reajustado(s)", json.loads(resp["HX-Trigger"])["toast"])
+        self.assertEqual(self._prices(self.shop_a), {"Corte": Decimal("49.50"), "Barba": Decimal("22.00")})
+
+        # loja sem overrides: serviços ganham o padrão reajustado; o produto de varejo fica de fora
+        prices.bulk_adjust(self.owner.pk, Decimal("-10"), self.shop_b.pk, Product.TYPE_SERVICE)
+        self.assertEqual(self._prices(self.shop_b), {"Corte": Decimal("36.00"), "Barba": Decimal("22.50")})
+
+        prices.bulk_adjust(self.owner.pk, Decimal("5"))  # sem loja: preço padrão
+        self.assertEqual(Product.objects.get(pk=self.pomade.pk).default_price, Decimal("31.50"))
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        from servicos.models import ServiceItem, ServiceOrder
+
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        self.other = get_user_model().objects.create_user("other@example.com", "pass")
+        shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.products = [Product.objects.create(owner=self.owner, name=f"P{i}") for i in range(3)]
+        self.foreign = Product.objects.create(owner=self.other, name="Alheio")
+        order = ServiceOrder.objects.create(owner=self.owner, shop=shop)
+        ServiceItem.objects.create(owner=self.owner, order=order, product=self.products[0], unit_price=Decimal("1"))
+        self.client.force_login(self.owner)
+
+    def _post(self, url, action, objs):
+        return self.client.post(url, {"action": action, "ids": [str(o.pk) for o in objs]}, HTTP_HX_REQUEST="true")
+
+    def test_deactivate_returns_only_affected_rows(self):
+        self.assertContains(self.client.get("/cadastros/products/"), 'form="products-bulk"', count=3)
+        resp = self._post("/cadastros/products/bulk/", "deactivate", self.products[1:] + [self.foreign])
+        self.assertEqual(resp.content.decode().count('hx-swap-oob="true"'), 2)
+        self.assertContains(resp, f'id="product-{self.products[1].pk}"')
+        self.assertEqual(set(Product.objects.filter(is_active=False).values_list("name", flat=True)), {"P1", "P2"})
+
+    def test_delete_products_keeps_used_ones_inactive(self):
+        with self.settings(PURGE_BATCH_SIZE=1):
+            resp = self._post("/cadastros/products/bulk/", "delete", self.products + [self.foreign])
+        self.assertEqual(resp.content.decode().count('hx-swap-oob="delete"'), 2)
+        self.assertIn("1 em uso", json.loads(resp["HX-Trigger"])["toast"])
+        self.assertEqual(list(Product.objects.filter(owner=self.owner).values_list("name", "is_active")), [("P0", False)])
+        self.assertTrue(Product.objects.filter(pk=self.foreign.pk, is_active=True).exists())
+
+    def test_delete_clients_goes_to_purge_queue(self):
+        from core.models import PurgeJob, Task
+
+        clients = [Client.objects.create(owner=self.owner, name=f"C{i}", phone=f"8599999000{i}") for i in range(3)]
+        resp = self._post("/cadastros/clients/bulk/", "delete", clients[:2])
+        self.assertEqual(resp.content.decode().count('hx-swap-oob="delete"'), 2)
+        self.assertEqual(PurgeJob.objects.count(), 2)
+        self.assertEqual(Task.objects.filter(name="core.run_purge").count(), 2)
+        self.assertEqual(queue.work(), 2)
+        self.assertEqual(list(Client.objects.values_list("name", flat=True)), ["C2"])
+
+    def test_bulk_view_without_delete_func_is_a_definition_error(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from .views import BulkActionView
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "delete_func"):
+            type("ShopBulkView", (BulkActionView,), {"model": Shop})
+
+
+class StaffOnboardingTests(TestCase):
+    def setUp(self):
+        from .models import Staff, StaffMembership
+
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.centro = Shop.objects.create(owner=self.owner, name="Centro")
+        self.bairro = Shop.objects.create(owner=self.owner, name="Bairro")
+        veteran = User.objects.create_user("veterano@example.com", "pass")
+        staff = Staff.objects.create(owner=self.owner, user=veteran, full_name="Veterano")
+        StaffMembership.objects.create(owner=self.owner, staff=staff, shop=self.centro)
+        self.client.force_login(self.owner)
+        self.client.get("/cadastros/memberships/")  # mapa de vínculos já em cache
+
+    def test_bulk_onboarding_from_pasted_list(self):
+        from django.core import mail
+        from .models import Staff, StaffMembership
+
+        lines = ["email;nome;telefone;loja;papel"]
+        lines += [f"barbeiro{i}@example.com;Barbeiro {i};;Centro|Bairro;" for i in range(20)]
+        lines += [
+            "veterano@example.com;Veterano Silva;;Centro;",   # já vinculado: só atualiza o nome
+            "veterano@example.com;;;Bairro;gerente",          # mesma pessoa, outra loja
+            "sem-arroba;Fulano;;Centro;",
+            "x@example.com;X;;Matriz;",
+        ]
+        with self.assertNumQueries(13):  # independe do tamanho da lista
+            resp = self.client.post("/cadastros/memberships/onboard/", {
+                "roster": "\n".join(lines), "role": StaffMembership.ROLE_STAFF, "invite": "on",
+            }, HTTP_HX_REQUEST="true")
+        self.assertContains(resp, "Novos funcionários: 20")
+        self.assertContains(resp, "Vínculos criados: 41")
+        self.assertContains(resp, "Linha 24: E-mail inválido")
+        self.assertContains(resp, "Linha 25: Loja não encontrada: matriz")
+        self.assertEqual(Staff.objects.count(), 21)
+        self.assertEqual(Staff.objects.get(user__email="veterano@example.com").full_name, "Veterano Silva")
+        self.assertEqual(
+            StaffMembership.objects.get(staff__user__email="veterano@example.com", shop=self.bairro).role,
+            StaffMembership.ROLE_MANAGER,
+        )
+
+        self.assertEqual(queue.work(), 1)  # um convite por conta nova, numa tarefa só
+        self.assertEqual(len(mail.outbox), 20)
+        self.assertIn("/accounts/reset/", mail.outbox[0].body)
+
+    def test_rejects_list_without_valid_rows(self):
+        resp = self.client.post("/cadastros/memberships/onboard/", {"roster": "nome\nAna", "role": "staff"})
+        self.assertContains(resp, "coluna")
+
+
+class RolePermissionTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import Staff, StaffMembership
+
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.centro = Shop.objects.create(owner=self.owner, name="Centro")
+        self.bairro = Shop.objects.create(owner=self.owner, name="Bairro")
+        self.barber = User.objects.create_user("barbeiro@example.com", "pass")
+        staff = Staff.objects.create(owner=self.owner, user=self.barber, full_name="Barbeiro")
+        self.membership = StaffMembership.objects.create(
+            owner=self.owner, staff=staff, shop=self.centro, role=StaffMembership.ROLE_STAFF,
+        )
+        Client.objects.create(owner=self.owner, name="Cliente", phone="85999990000")
+        self.client.force_login(self.barber)
+
+    def test_staff_acts_in_employer_tenant_scoped_to_own_shops(self):
+        resp = self.client.get("/cadastros/shops/")
+        self.assertContains(resp, "Centro")
+        self.assertNotContains(resp, "Bairro")
+        self.assertContains(self.client.get("/cadastros/clients/"), "Cliente")
+
+    def test_staff_cannot_manage_or_delete(self):
+        self.assertEqual(self.client.get("/cadastros/shops/new/").status_code, 403)
+        self.assertEqual(self.client.get(f"/cadastros/shops/{self.bairro.pk}/edit/").status_code, 403)
+        resp = self.client.post("/cadastros/clients/bulk/", {"action": "delete", "ids": []}, HTTP_HX_REQUEST="true")
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(self.client.get("/relatorios/faturamento/").status_code, 403)
+
+    def test_membership_map_is_cached_and_invalidated(self):
+        from . import permissions
+        from .models import StaffMembership
+
+        access = permissions.resolve(self.barber)
+        self.assertEqual((access.owner_id, access.role), (self.owner.pk, StaffMembership.ROLE_STAFF))
+        with self.assertNumQueries(0):
+            permissions.resolve(self.barber)
+
+        self.membership.role = StaffMembership.ROLE_MANAGER
+        self.membership.save()
+        self.assertTrue(permissions.resolve(self.barber).can("delete"))
+
+        self.membership.delete()
+        self.assertEqual(permissions.resolve(self.barber).owner_id, self.barber.pk)
+
+    def test_mixed_roles_are_checked_per_shop(self):
+        from servicos.models import ServiceOrder
+        from . import permissions
+        from .models import StaffMembership
+
+        StaffMembership.objects.create(owner=self.owner, staff=self.membership.staff, shop=self.bairro,
+                                       role=StaffMembership.ROLE_MANAGER)
+        access = permissions.resolve(self.barber)
+        self.assertEqual(access.role, StaffMembership.ROLE_MANAGER)
+        self.assertTrue(access.can("delete"))  # a view abre: é gerente em alguma loja
+        in_bairro = ServiceOrder(owner=self.owner, shop=self.bairro)
+        in_centro = ServiceOrder(owner=self.owner, shop=self.centro)
+        self.assertTrue(access.allows(in_bairro, "delete"))
+        self.assertFalse(access.allows(in_centro, "delete"))  # no Centro continua barbeiro
+        self.assertTrue(access.allows(in_centro, "change"))
+        # cliente não tem loja: vale o menor papel
+        client = Client.objects.get()
+        self.assertEqual(self.client.get(f"/cadastros/clients/{client.pk}/delete/").status_code, 403)
+        resp = self.client.post("/cadastros/clients/bulk/", {"action": "delete", "ids": [client.pk]}, HTTP_HX_REQUEST="true")
+        self.assertEqual(resp.status_code, 403)
+
+        self.membership.role = StaffMembership.ROLE_MANAGER
+        self.membership.save()
+        self.assertEqual(self.client.get(f"/cadastros/clients/{client.pk}/delete/").status_code, 200)
@@ -4,6 +4,8 @@ from . import views
 app_name = "cadastros"
 
 urlpatterns = [
+    path("tenant/switch/", views.TenantSwitchView.as_view(), name="tenant_switch"),
+
     # Shops
     path("shops/", views.ShopListView.as_view(), name="shop_list"),
     path("shops/new/", views.ShopCreateView.as_view(), name="shop_create"),
@@ -15,24 +17,37 @@ urlpatterns = [
     path("memberships/new/", views.MembershipCreateView.as_view(), name="membership_create"),
     path("memberships/<uuid:pk>/edit/", views.MembershipUpdateView.as_view(), name="membership_update"),
     path("memberships/<uuid:pk>/delete/", views.MembershipDeleteView.as_view(), name="membership_delete"),
+    path("memberships/onboard/", views.StaffOnboardView.as_view(), name="staff_onboard"),
 
     # Preços por loja
     path("product-prices/", views.ProductPriceListView.as_view(), name="product_price_list"),
     path("product-prices/new/", views.ProductPriceCreateView.as_view(), name="product_price_create"),
     path("product-prices/<uuid:pk>/edit/", views.ProductPriceUpdateView.as_view(), name="product_price_update"),
     path("product-prices/<uuid:pk>/delete/", views.ProductPriceDeleteView.as_view(), name="product_price_delete"),
+    path("product-prices/matrix/", views.PriceMatrixView.as_view(), name="price_matrix"),
+    path("product-prices/matrix/adjust/", views.PriceAdjustView.as_view(), name="price_adjust"),
 
     # Products
     path("products/", views.ProductListView.as_view(), name="product_list"),
     path("products/new/", views.ProductCreateView.as_view(), name="product_create"),
     path("products/<uuid:pk>/edit/", views.ProductUpdateView.as_view(), name="product_update"),
     path("products/<uuid:pk>/delete/", views.ProductDeleteView.as_view(), name="product_delete"),
+    path("products/import/", views.CatalogImportView.as_view(), name="catalog_import"),
+    path("products/bulk/", views.ProductBulkView.as_view(), name="product_bulk"),
 
     # Clientes
     path("clients/", views.ClientListView.as_view(), name="client_list"),
     path("clients/new/", views.ClientCreateView.as_view(), name="client_create"),
     path("clients/<uuid:pk>/edit/", views.ClientUpdateView.as_view(), name="client_update"),
     path("clients/<uuid:pk>/delete/", views.ClientDeleteView.as_view(), name="client_delete"),
+    path("clients/import/", views.ClientImportView.as_view(), name="client_import"),
+    path("clients/bulk/", views.ClientBulkView.as_view(), name="client_bulk"),
+
+    # Importações
+    path("imports/<uuid:pk>/", views.ImportJobView.as_view(), name="import_detail"),
+    path("imports/<uuid:pk>/errors.csv", views.ImportErrorsView.as_view(), name="import_errors"),
+    path("imports/<uuid:pk>/confirm/", views.ImportConfirmView.as_view(), name="import_confirm"),
+    path("imports/<uuid:pk>/cancel/", views.ImportCancelView.as_view(), name="import_cancel"),
 
 
 ]
@@ -0,0 +1,14 @@
+import re
+
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def normalize_phone(value):
+    """
+    Mantém só os dígitos e remove o DDI 55 quando o número vier completo
+    (ex.: "+55 (11) 98888-7777" -> "11988887777").
+    """
+    digits = _NON_DIGITS.sub("", value or "")
+    if len(digits) in (12, 13) and digits.startswith("55"):
+        digits = digits[2:]
+    return digits
@@ -1,18 +1,43 @@
 import json
+import uuid
 from decimal import Decimal, InvalidOperation
 
 from django.urls import reverse, reverse_lazy
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView
+from django.views import View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.template.response import TemplateResponse
 from django.template.loader import render_to_string
 from django.db.models import Q
 from django.http import HttpResponse
 
-from .mixins import OwnerQuerysetMixin, OwnerCreateMixin, HtmxCrudMixin, is_htmx, OwnerUpdateMixin, CurrentShopMixin
-from .models import Shop, Product, StaffMembership, ProductPrice, Staff, Client
-from .forms import ShopForm, ProductForm, StaffMembershipForm, ProductPriceForm, StaffForm, StaffAndMembershipForm, StaffAndMembershipUpdateForm, ClientForm
+from .mixins import OwnerQuerysetMixin, OwnerCreateMixin, HtmxCrudMixin, is_htmx, OwnerUpdateMixin, CurrentShopMixin, TenantShardMixin
+from core import purge
+from core.models import PurgeJob
+from core.queue import enqueue
+from . import bulk, imports, onboarding, permissions, prices
+from .rows import ClientRow, MembershipRow, ProductRow
+from .models import Shop, Product, StaffMembership, ProductPrice, Staff, Client, ImportJob
+from .forms import ShopForm, ProductForm, StaffMembershipForm, ProductPriceForm, StaffForm, StaffAndMembershipForm, StaffAndMembershipUpdateForm, ClientForm, ImportUploadForm, StaffOnboardingForm
+from .tasks import run_import
+
+# =============== TENANT ATIVO ===============
+class TenantSwitchView(LoginRequiredMixin, View):
+    """Troca o tenant em que o usuário age (dono ou funcionário de outro owner)."""
+
+    def post(self, request):
+        try:
+            tenant_id = int(request.POST.get("tenant", ""))
+        except ValueError:
+            tenant_id = None
+        if tenant_id in request.access.tenants:
+            request.session[permissions.SESSION_KEY] = tenant_id
+            request.session.pop(CurrentShopMixin.session_key, None)
+        return redirect("servicos:home")
+
 
 # =============== SHOPS ===============
 class ShopListView(OwnerQuerysetMixin, ListView):
@@ -20,6 +45,10 @@ class ShopListView(OwnerQuerysetMixin, ListView):
     template_name = "cadastros/shops/list.html"
     context_object_name = "shops"
 
+    def get_queryset(self):
+        # lojas com exclusão agendada somem da lista na hora
+        return super().get_queryset().exclude(pk__in=purge.pending_ids(self.request.access.owner_id, PurgeJob.KIND_SHOP))
+
     def get(self, request, *args, **kwargs):
         """
         Se for HTMX e pedir apenas a tabela, devolve só o fragmento.
@@ -32,6 +61,7 @@ class ShopListView(OwnerQuerysetMixin, ListView):
 
 
 class ShopCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, CreateView):
+    permission_action = "manage"
     model = Shop
     form_class = ShopForm
     template_name = "shared/_modal_form.html"   # <<<<<<<<<<
@@ -43,7 +73,7 @@ class ShopCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Create
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user        # <<<<<< importante
+        kwargs["owner"] = self.request.tenant        # <<<<<< importante
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -58,6 +88,7 @@ class ShopCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Create
 
 
 class ShopUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
+    permission_action = "manage"
     model = Shop
     form_class = ShopForm
     template_name = "shared/_modal_form.html"   # <<<<<<<<<<
@@ -69,7 +100,7 @@ class ShopUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Update
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user        # opcional, mas ok
+        kwargs["owner"] = self.request.tenant        # opcional, mas ok
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -84,6 +115,7 @@ class ShopUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Update
 
 
 class ShopDeleteView(OwnerQuerysetMixin, DeleteView):
+    permission_action = "manage"
     model = Shop
     success_url = reverse_lazy("cadastros:shop_list")
 
@@ -96,10 +128,13 @@ class ShopDeleteView(OwnerQuerysetMixin, DeleteView):
         })
 
     def post(self, request, *args, **kwargs):
-        obj = self.get_object()
-        obj.delete()
+        # comandas, itens, caixas e fatos da loja saem em segundo plano (core.purge)
+        purge.schedule(request.access.owner_id, PurgeJob.KIND_SHOP, self.get_object())
         resp = HttpResponse("")
-        resp["HX-Trigger"] = json.dumps({"closeModal": True, "refreshShopsTable": True})
+        resp["HX-Trigger"] = json.dumps({
+            "closeModal": True, "refreshShopsTable": True,
+            "toast": "Exclusão da loja agendada. Os dados serão removidos em segundo plano.",
+        })
         return resp
 
 
@@ -121,7 +156,7 @@ class ProductListView(OwnerQuerysetMixin, ListView):
             return None
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(owner=self.request.user)
+        qs = super().get_queryset().filter(owner=self.request.tenant)
 
         q = self.request.GET.get("q", "").strip()
         type_ = self.request.GET.get("type", "").strip()
@@ -143,7 +178,7 @@ class ProductListView(OwnerQuerysetMixin, ListView):
         if pmax is not None:
             qs = qs.filter(default_price__lte=pmax)
 
-        return qs
+        return qs.rows(ProductRow)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -168,6 +203,7 @@ class ProductListView(OwnerQuerysetMixin, ListView):
 
 
 class ProductCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, CreateView):
+    permission_action = "manage"
     model = Product
     form_class = ProductForm
     template_name = "shared/_modal_form.html"   # <<<<<<<<<<
@@ -179,7 +215,7 @@ class ProductCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Cre
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -194,6 +230,7 @@ class ProductCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Cre
 
 
 class ProductUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
+    permission_action = "manage"
     model = Product
     form_class = ProductForm
     template_name = "shared/_modal_form.html"   # <<<<<<<<<<
@@ -205,7 +242,7 @@ class ProductUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -220,6 +257,7 @@ class ProductUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
 
 
 class ProductDeleteView(OwnerQuerysetMixin, DeleteView):
+    permission_action = "manage"
     model = Product
     template_name = "shared/_confirm_delete.html"
     modal_title = "Excluir produto"
@@ -239,7 +277,7 @@ class ProductDeleteView(OwnerQuerysetMixin, DeleteView):
 
         is_htmx = request.headers.get("HX-Request") or request.META.get("HTTP_HX_REQUEST")
         if is_htmx:
-            queryset = self.model.objects.filter(owner=request.user)
+            queryset = self.model.objects.filter(owner=request.tenant)
 
             table_html = render_to_string(
                 self.list_partial_template,
@@ -263,11 +301,10 @@ class MembershipListView(OwnerQuerysetMixin, CurrentShopMixin, ListView):
     context_object_name = "memberships"
 
     def get_queryset(self):
-        qs = super().get_queryset()\
-            .select_related("staff", "staff__user", "shop")  # << aqui
+        qs = super().get_queryset()
         if self.current_shop_id:
             qs = qs.filter(shop_id=self.current_shop_id)
-        return qs
+        return qs.rows(MembershipRow)  # staff, user e loja no mesmo SELECT
 
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
@@ -277,6 +314,7 @@ class MembershipListView(OwnerQuerysetMixin, CurrentShopMixin, ListView):
 
 
 class MembershipCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, CreateView):
+    permission_action = "manage"
     model = StaffMembership
     form_class = StaffAndMembershipForm      # <<< combinado
     template_name = "shared/_modal_form.html"
@@ -302,6 +340,7 @@ class MembershipCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin,
 
 
 class MembershipUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
+    permission_action = "manage"
     model = StaffMembership
     form_class = StaffAndMembershipUpdateForm   # <<< trocar aqui
     template_name = "shared/_modal_form.html"
@@ -313,7 +352,7 @@ class MembershipUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         # mantém o user já vinculado ao registro (não troca para o request.user à força)
         # kwargs["current_user"] = self.get_object().user
         return kwargs
@@ -330,6 +369,7 @@ class MembershipUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
 
 
 class MembershipDeleteView(OwnerQuerysetMixin, CurrentShopMixin, DeleteView):
+    permission_action = "manage"
     model = StaffMembership
     template_name = "shared/_confirm_delete.html"
 
@@ -354,6 +394,47 @@ class MembershipDeleteView(OwnerQuerysetMixin, CurrentShopMixin, DeleteView):
             return resp
         return redirect(self.get_success_url())
 
+class StaffOnboardView(TenantShardMixin, View):
+    """Equipe em lote (planilha ou lista colada): resolve tudo com poucas queries IN."""
+    permission_action = "manage"
+    template_name = "cadastros/memberships/_onboard.html"
+    max_errors = 200
+
+    def get(self, request, *args, **kwargs):
+        return render(request, self.template_name, {"form": StaffOnboardingForm(owner=request.tenant)})
+
+    def post(self, request, *args, **kwargs):
+        form = StaffOnboardingForm(request.POST, request.FILES, owner=request.tenant)
+        if not form.is_valid():
+            return render(request, self.template_name, {"form": form})
+        data = form.cleaned_data
+        try:
+            if data["file"]:
+                rows = imports.open_rows(data["file"].file, data["file"].name)
+            else:
+                rows = onboarding.text_rows(data["roster"])
+            roster = onboarding.parse_roster(
+                request.access.owner_id, rows, [s.pk for s in data["shops"]], data["role"],
+            )
+        except imports.FILE_ERRORS as e:
+            form.add_error(None, str(e))
+            return render(request, self.template_name, {"form": form})
+        if not roster.people:
+            form.add_error(None, "Nenhuma linha válida. " + "; ".join(
+                f"linha {line}: {msg}" for line, msg in roster.errors[:5]
+            ))
+            return render(request, self.template_name, {"form": form})
+
+        result = onboarding.onboard(
+            request.access.owner_id, roster, invite_url=request.build_absolute_uri("/") if data["invite"] else None,
+        )
+        resp = render(request, "cadastros/memberships/_onboard_result.html", {
+            "result": result, "errors": roster.errors[:self.max_errors],
+        })
+        resp["HX-Trigger"] = json.dumps({"refreshMembershipsTable": True})
+        return resp
+
+
 # ============= STAFFS =========
 
 class StaffListView(OwnerQuerysetMixin, ListView):
@@ -363,6 +444,7 @@ class StaffListView(OwnerQuerysetMixin, ListView):
 
 
 class StaffCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, CreateView):
+    permission_action = "manage"
     model = Staff
     form_class = StaffForm
     template_name = "shared/_modal_form.html"
@@ -377,6 +459,7 @@ class StaffCreateView(OwnerCreateMixin, OwnerQuerysetMixin, HtmxCrudMixin, Creat
 
 
 class StaffUpdateView(OwnerQuerysetMixin, HtmxCrudMixin, UpdateView):
+    permission_action = "manage"
     model = Staff
     form_class = StaffForm
     template_name = "shared/_modal_form.html"
@@ -404,13 +487,14 @@ class ProductPriceListView(OwnerQuerysetMixin, CurrentShopMixin, ListView):
 
 
 class ProductPriceCreateView(OwnerCreateMixin, CurrentShopMixin, CreateView):
+    permission_action = "manage"
     model = ProductPrice
     form_class = ProductPriceForm
     template_name = "cadastros/product_prices/form.html"
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         return kwargs
 
     def get_initial(self):
@@ -437,13 +521,14 @@ class ProductPriceCreateView(OwnerCreateMixin, CurrentShopMixin, CreateView):
 
 
 class ProductPriceUpdateView(OwnerQuerysetMixin, CurrentShopMixin, UpdateView):
+    permission_action = "manage"
     model = ProductPrice
     form_class = ProductPriceForm
     template_name = "cadastros/product_prices/form.html"
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["owner"] = self.request.user
+        kwargs["owner"] = self.request.tenant
         return kwargs
 
     def get_success_url(self):
@@ -455,6 +540,7 @@ class ProductPriceUpdateView(OwnerQuerysetMixin, CurrentShopMixin, UpdateView):
 
 
 class ProductPriceDeleteView(OwnerQuerysetMixin, CurrentShopMixin, DeleteView):
+    permission_action = "manage"
     model = ProductPrice
     template_name = "cadastros/product_prices/confirm_delete.html"
 
@@ -464,6 +550,62 @@ class ProductPriceDeleteView(OwnerQuerysetMixin, CurrentShopMixin, DeleteView):
             url += f"?shop={self.current_shop_id}"
         return url
 
+class PriceMatrixView(TenantShardMixin, View):
+    """
+    Grade produto x loja com o preço efetivo de cada célula (override em
+    destaque). O navegador manda só as células alteradas, num POST só.
+    """
+    write_action = "manage"
+    template_name = "cadastros/product_prices/matrix.html"
+    grid_template = "cadastros/product_prices/_matrix.html"
+
+    def get_context_data(self):
+        product_type = self.request.GET.get("type") or self.request.POST.get("type") or ""
+        ctx = prices.price_matrix(self.request.access.owner_id, product_type)
+        ctx["type"] = product_type
+        ctx["type_choices"] = Product.TYPE_CHOICES
+        return ctx
+
+    def render_grid(self, toast=None):
+        resp = render(self.request, self.grid_template, self.get_context_data())
+        if toast:
+            resp["HX-Trigger"] = json.dumps({"toast": toast})
+        return resp
+
+    def get(self, request, *args, **kwargs):
+        if is_htmx(request) and request.GET.get("fragment") == "grid":
+            return self.render_grid()
+        return render(request, self.template_name, self.get_context_data())
+
+    def post(self, request, *args, **kwargs):
+        try:
+            changes = prices.parse_cells(request.POST)
+            if not changes:
+                return self.render_grid("Nenhuma alteração.")
+            saved, removed = prices.save_matrix(request.access.owner_id, changes)
+        except prices.PriceError as e:
+            # 204: o htmx não troca a grade e o que foi digitado continua lá
+            resp = HttpResponse(status=204)
+            resp["HX-Trigger"] = json.dumps({"toast": str(e)})
+            return resp
+        return self.render_grid(f"{saved} preço(s) salvo(s), {removed} voltaram ao padrão.")
+
+
+class PriceAdjustView(PriceMatrixView):
+    """Reajuste percentual em massa (por loja e/ou tipo) num único UPDATE."""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            percent = prices.parse_percent(request.POST.get("percent"))
+            adjusted = prices.bulk_adjust(
+                request.access.owner_id, percent, request.POST.get("shop") or None, request.POST.get("type") or None,
+            )
+        except prices.PriceError as e:
+            resp = HttpResponse(status=204)
+            resp["HX-Trigger"] = json.dumps({"toast": str(e)})
+            return resp
+        return self.render_grid(f"{adjusted} preço(s) reajustado(s) em {percent}%.")
+
 # ========= Clientes ========
 class ClientListView(OwnerQuerysetMixin, ListView):
     model = Client
@@ -471,6 +613,10 @@ class ClientListView(OwnerQuerysetMixin, ListView):
     context_object_name = "clients"
     paginate_by = 12
 
+    def get_queryset(self):
+        qs = super().get_queryset().exclude(pk__in=purge.pending_ids(self.request.access.owner_id, PurgeJob.KIND_CLIENT))
+        return qs.rows(ClientRow)
+
     def get(self, request, *args, **kwargs):
         resp = super().get(request, *args, **kwargs)
         # fragmento só da tabela (usado em refresh via evento)
@@ -518,6 +664,7 @@ class ClientUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, UpdateView):
 
 
 class ClientDeleteView(OwnerQuerysetMixin, DeleteView):
+    permission_action = "delete"
     model = Client
     template_name = "shared/_confirm_delete.html"
     success_url = reverse_lazy("cadastros:client_list")
@@ -527,9 +674,10 @@ class ClientDeleteView(OwnerQuerysetMixin, DeleteView):
         ctx["title"] = "Excluir cliente"
         return ctx
 
-    def delete(self, request, *args, **kwargs):
-        self.object = self.get_object()
-        self.object.delete()
+    def form_valid(self, form):
+        # as comandas do cliente são desvinculadas em lotes (core.purge)
+        request = self.request
+        purge.schedule(request.access.owner_id, PurgeJob.KIND_CLIENT, self.object)
 
         is_htmx = request.headers.get("HX-Request") or request.META.get("HTTP_HX_REQUEST")
         if is_htmx:
@@ -537,3 +685,211 @@ class ClientDeleteView(OwnerQuerysetMixin, DeleteView):
             resp["HX-Trigger"] = '{"closeModal": true, "refreshClientsTable": true, "toast": "Cliente excluído."}'
             return resp
         return redirect(self.success_url)
+
+
+# =============== AÇÕES EM MASSA ===============
+class BulkActionView(TenantShardMixin, View):
+    """
+    POST com ids[] e action (activate/deactivate/delete). A resposta só traz
+    as linhas afetadas, como swaps OOB (atualizar ou remover pelo id da <tr>).
+    Subclasses definem ``delete_func(owner_id, ids)``, que devolve
+    (ids removidos, ids só atualizados); falta dele é erro na definição da classe.
+    """
+    model = None
+    delete_func = None
+    row_template = None
+    row_name = None   # nome do objeto no template da linha
+    dom_prefix = None  # <tr id="<prefixo>-<pk>">
+    delete_action = "delete"
+    toasts = {
+        "activate": "{n} ativado(s).",
+        "deactivate": "{n} desativado(s).",
+        "delete": "{n} excluído(s).",
+    }
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.delete_func is None:
+            raise ImproperlyConfigured(f"{cls.__name__} precisa definir delete_func.")
+        cls.delete_func = staticmethod(cls.delete_func)
+
+    def get_permission_action(self):
+        if self.request.POST.get("action") == "delete":
+            return self.delete_action
+        return super().get_permission_action()
+
+    def _valid_ids(self):
+        ids = []
+        for value in self.request.POST.getlist("ids"):
+            try:
+                ids.append(uuid.UUID(value))
+            except ValueError:
+                continue
+        return ids
+
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get("action")
+        ids = self._valid_ids()
+        if action not in self.toasts or not ids:
+            resp = HttpResponse(status=204)
+            resp["HX-Trigger"] = json.dumps({"toast": "Selecione ao menos um item."})
+            return resp
+
+        owner_id = request.access.owner_id
+        if action == "delete":
+            # clientes/catálogo não têm loja: vale o menor papel do usuário (Access.role_in)
+            if not request.access.can_in(self.delete_action, None):
+                raise PermissionDenied
+            removed, changed = self.delete_func(owner_id, ids)
+        else:
+            removed, changed = [], bulk.set_active(self.model, owner_id, ids, action == "activate")
+
+        rows = [
+            render_to_string(self.row_template, {self.row_name: obj, "oob": True}, request=request)
+            for obj in self.model.objects.filter(owner_id=owner_id, pk__in=changed)
+        ]
+        rows += [f'<tr id="{self.dom_prefix}-{pk}" hx-swap-oob="delete"></tr>' for pk in removed]
+        toast = self.toasts[action].format(n=len(removed) if action == "delete" else len(changed))
+        if action == "delete" and changed:
+            toast += f" {len(changed)} em uso em comandas: só desativado(s)."
+        resp = HttpResponse("\n".join(rows))
+        resp["HX-Trigger"] = json.dumps({"toast": toast})
+        return resp
+
+
+class ProductBulkView(BulkActionView):
+    write_action = delete_action = "manage"
+    model = Product
+    row_template = "cadastros/products/_row.html"
+    row_name = "p"
+    dom_prefix = "product"
+    delete_func = bulk.delete_products
+
+
+class ClientBulkView(BulkActionView):
+    model = Client
+    row_template = "cadastros/clients/_row.html"
+    row_name = "c"
+    dom_prefix = "client"
+    toasts = {**BulkActionView.toasts, "delete": "{n} cliente(s) na fila de exclusão."}
+    delete_func = bulk.delete_clients
+
+
+# =============== IMPORTAÇÃO ===============
+class ClientImportView(TenantShardMixin, View):
+    """Modal de upload; o processamento vai para a fila (cadastros.run_import)."""
+    write_action = "manage"
+    kind = ImportJob.KIND_CLIENTS
+    extensions = (".csv",)
+    title = "Importar clientes"
+    help_text = "CSV com as colunas nome e telefone (observações é opcional). Telefones já cadastrados são atualizados."
+
+    def render_form(self, form):
+        return render(self.request, "cadastros/imports/_form.html", {
+            "form": form, "title": self.title, "help_text": self.help_text,
+        })
+
+    def get(self, request, *args, **kwargs):
+        return self.render_form(ImportUploadForm(extensions=self.extensions))
+
+    def create_job(self, form, **extra):
+        upload = form.cleaned_data["file"]
+        return ImportJob.objects.create(
+            owner=self.request.tenant, kind=self.kind, file=upload, filename=upload.name[:255], **extra,
+        )
+
+    def post(self, request, *args, **kwargs):
+        form = ImportUploadForm(request.POST, request.FILES, extensions=self.extensions)
+        if not form.is_valid():
+            return self.render_form(form)
+        job = self.create_job(form)
+        enqueue(run_import, request.access.owner_id, job.pk)
+        return render(request, "cadastros/imports/_progress.html", {"job": job, "title": self.title})
+
+
+class CatalogImportView(ClientImportView):
+    """Upload + prévia (dry-run) do catálogo; só grava depois de ImportConfirmView."""
+    kind = ImportJob.KIND_CATALOG
+    extensions = (".csv", ".xlsx")
+    title = "Importar catálogo"
+    help_text = (
+        "Uma linha por produto: nome, tipo, descrição, duração, preço, compartilhado, ativo "
+        "e uma coluna de preço por loja (cabeçalho = nome da loja). Célula vazia mantém o valor atual; "
+        "\"-\" numa coluna de loja remove o preço específico."
+    )
+    preview_limit = 200
+
+    def post(self, request, *args, **kwargs):
+        form = ImportUploadForm(request.POST, request.FILES, extensions=self.extensions)
+        if not form.is_valid():
+            return self.render_form(form)
+        job = self.create_job(form, status=ImportJob.STATUS_PREVIEW)
+        try:
+            with job.file.open("rb") as fh:
+                plan = imports.plan_catalog(request.access.owner_id, imports.open_rows(fh.file, job.filename))
+        except imports.FILE_ERRORS as e:
+            job.file.delete(save=False)
+            job.delete()
+            form.add_error("file", str(e))
+            return self.render_form(form)
+        job.total_rows = plan.rows
+        job.save(update_fields=["total_rows", "updated_at"])
+        return render(request, "cadastros/imports/_catalog_preview.html", {
+            "job": job, "plan": plan, "title": self.title,
+            "changes": plan.changes[:self.preview_limit], "errors": plan.errors[:self.preview_limit],
+        })
+
+
+class ImportConfirmView(OwnerQuerysetMixin, DetailView):
+    """Confirma a prévia: o job entra na fila."""
+    write_action = "manage"
+    model = ImportJob
+
+    def post(self, request, *args, **kwargs):
+        job = self.get_object()
+        if ImportJob.objects.filter(pk=job.pk, status=ImportJob.STATUS_PREVIEW).update(status=ImportJob.STATUS_PENDING):
+            job.status = ImportJob.STATUS_PENDING
+            enqueue(run_import, request.access.owner_id, job.pk)
+        return render(request, "cadastros/imports/_progress.html", {"job": job})
+
+
+class ImportCancelView(OwnerQuerysetMixin, DetailView):
+    """Descarta uma prévia não confirmada (e o arquivo enviado)."""
+    write_action = "manage"
+    model = ImportJob
+
+    def post(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status == ImportJob.STATUS_PREVIEW:
+            job.file.delete(save=False)
+            job.delete()
+        resp = HttpResponse("")
+        resp["HX-Trigger"] = json.dumps({"closeModal": True})
+        return resp
+
+
+class ImportJobView(OwnerQuerysetMixin, DetailView):
+    """Progresso da importação (o fragmento se reconsulta até terminar)."""
+    model = ImportJob
+    template_name = "cadastros/imports/_progress.html"
+    context_object_name = "job"
+    refresh_events = {ImportJob.KIND_CLIENTS: "refreshClientsTable", ImportJob.KIND_CATALOG: "refreshProductsTable"}
+
+    def get(self, request, *args, **kwargs):
+        resp = super().get(request, *args, **kwargs)
+        if self.object.is_finished:
+            # última consulta do polling: atualiza a lista por trás do modal
+            resp["HX-Trigger"] = json.dumps({self.refresh_events[self.object.kind]: True})
+        return resp
+
+
+class ImportErrorsView(OwnerQuerysetMixin, DetailView):
+    """Relatório de erros por linha (CSV)."""
+    model = ImportJob
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        resp = HttpResponse(content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="erros_importacao_{job.pk}.csv"'
+        resp.write("\ufeff")  # BOM: o Excel abre com acentos certos
+        return imports.error_report(job, resp)
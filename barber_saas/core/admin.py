@@ -1,3 +1,33 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import Tombstone, PurgeJob, Task
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ("model", "object_id", "owner", "deleted_at")
+    list_filter = ("model",)
+    search_fields = ("object_id", "owner__email")
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "label", "owner_email", "status", "done", "total", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    search_fields = ("label", "owner_email", "target_id")
+    readonly_fields = ("total", "done", "error", "started_at", "finished_at")
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "attempts", "max_attempts", "run_at", "locked_by", "finished_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("attempts", "locked_by", "locked_at", "last_error", "created_at", "finished_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Recolocar na fila")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=Task.STATUS_RUNNING).update(
+            status=Task.STATUS_QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
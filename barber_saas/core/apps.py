@@ -4,3 +4,23 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.utils.module_loading import autodiscover_modules
+        from django.db.models.signals import post_delete, post_save
+        from . import identity, sharding, sync
+
+        # usuários espelhados nos shards (FKs owner/user)
+        post_save.connect(sharding.user_saved, sender=get_user_model(), dispatch_uid="shard-mirror-user")
+
+        # identity map do request não guarda objeto alterado/apagado
+        post_save.connect(identity.forget, dispatch_uid="identity-forget-save")
+        post_delete.connect(identity.forget, dispatch_uid="identity-forget-delete")
+
+        # tombstones para o sync incremental
+        for model in sync.sync_models():
+            post_delete.connect(sync.record_deletion, sender=model, dispatch_uid=f"sync-tombstone-{model._meta.label}")
+
+        # @queue.task de cada app (<app>/tasks.py)
+        autodiscover_modules("tasks")
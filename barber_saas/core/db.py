@@ -0,0 +1,28 @@
+"""
+Utilitários de banco de baixo nível para jobs em lote.
+"""
+from django.db import connections, router
+
+# abaixo do limite de parâmetros do SQLite (999)
+DELETE_CHUNK = 500
+
+
+def delete_ids(model, ids, using=None):
+    """
+    ``DELETE FROM <tabela> WHERE id IN (...)`` direto, sem o collector do
+    Django: não carrega objetos, não segue cascatas nem dispara sinais.
+    Quem chama é responsável pela ordem (filhos antes dos pais).
+    """
+    ids = list(ids)
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    pk = model._meta.pk
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(pk.column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), DELETE_CHUNK):
+            params = [pk.get_db_prep_value(v, connection) for v in ids[i:i + DELETE_CHUNK]]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(params))})", params)
+            deleted += cursor.rowcount
+    return deleted
@@ -0,0 +1,62 @@
+"""
+Cache de linhas de tabela (russian doll).
+
+Cada linha é cacheada pela chave ``<prefixo>:<pk>:<updated_at>`` (mais o
+updated_at dos relacionados exibidos na linha); a tabela inteira fica sob
+uma chave derivada das chaves das linhas. Se nada mudou, a tabela sai de um
+GET só; se uma comanda mudou, só a linha dela é renderizada e o resto vem
+do cache num ``get_many``. Nada precisa ser invalidado: gravar muda o
+updated_at e, com ele, a chave. O backend "fragments" (settings.CACHES) é
+limitado em entradas e descarta as menos usadas.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CACHE_ALIAS = "fragments"
+
+
+def _stamp(obj):
+    updated = getattr(obj, "updated_at", None)
+    return f"{obj.pk}.{int(updated.timestamp() * 1_000_000) if updated else 0}"
+
+
+def _related(obj, name):
+    if not hasattr(obj, "_meta"):
+        return getattr(obj, name)  # linha projetada (core.rows): o relacionado veio na query
+    # só segue a FK se estiver preenchida (select_related na view evita query)
+    field = obj._meta.get_field(name)
+    return getattr(obj, name) if getattr(obj, field.attname) is not None else None
+
+
+def row_key(prefix, obj, deps=()):
+    parts = [prefix, _stamp(obj)]
+    for name in deps:
+        related = _related(obj, name)
+        parts.append(_stamp(related) if related is not None else "-")
+    return ":".join(parts)
+
+
+def render_rows(objs, template_name, name, prefix, deps=()):
+    """HTML das linhas de ``objs`` (cada uma renderizada com ``{name: obj}``)."""
+    cache = caches[CACHE_ALIAS]
+    timeout = settings.FRAGMENT_CACHE_TIMEOUT
+    objs = list(objs)
+    keys = [f"row:{template_name}:{row_key(prefix, obj, deps)}" for obj in objs]
+    table_key = f"rows:{template_name}:{hashlib.md5(' '.join(keys).encode()).hexdigest()}"
+
+    html = cache.get(table_key)
+    if html is None:
+        found = cache.get_many(keys)
+        missing = {}
+        for key, obj in zip(keys, objs):
+            if key not in found:
+                found[key] = missing[key] = render_to_string(template_name, {name: obj})
+        if missing:
+            cache.set_many(missing, timeout)
+        html = "".join(found[key] for key in keys)
+        cache.set(table_key, html, timeout)
+    return mark_safe(html)
@@ -0,0 +1,146 @@
+"""
+Identity map por request.
+
+Validar uma comanda com formset carregava a mesma loja/produto/profissional
+várias vezes (ModelChoiceField.to_python faz um ``.get()`` por linha e o
+``clean()`` dos modelos segue as FKs de novo). Durante o request (ver
+IdentityMapMiddleware) os objetos carregados ficam aqui por (modelo, pk):
+
+- ``warm(qs)`` avalia o queryset de escolhas de um form uma vez só por
+  request (mesmo SQL = mesma lista) e registra os objetos;
+- ``related(obj, "shop")`` segue a FK consultando o mapa antes do banco;
+- ``prime(qs, objs)`` entrega ao mapa uma lista já montada (cache local);
+- ``pick(qs, valor)`` acha a escolha do form sem ``.get()``;
+- ``lookup(model, pk)`` devolve o objeto se já foi visto.
+
+Fora de um ``scope()`` (jobs, shell) tudo cai no comportamento normal.
+Gravações e exclusões tiram o objeto do mapa (sinais em core.apps).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import EmptyResultSet
+
+_current = ContextVar("identity_map", default=None)
+
+
+class IdentityMap:
+    def __init__(self):
+        self.objects = {}    # (label, pk) -> instância
+        self.querysets = {}  # (alias, label, sql, params) -> [instâncias]
+        self.indexes = {}    # (chave do queryset, campo) -> {valor: instância}
+
+    @staticmethod
+    def key(model, pk):
+        return model._meta.concrete_model._meta.label, str(pk)
+
+
+@contextmanager
+def scope():
+    token = _current.set(IdentityMap())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def active():
+    return _current.get() is not None
+
+
+def remember(*objs):
+    current = _current.get()
+    if current is not None:
+        for obj in objs:
+            if obj is not None and obj.pk is not None:
+                current.objects[IdentityMap.key(type(obj), obj.pk)] = obj
+
+
+def lookup(model, pk):
+    current = _current.get()
+    if current is None or pk is None:
+        return None
+    return current.objects.get(IdentityMap.key(model, pk))
+
+
+def forget(sender, instance, **kwargs):
+    """Receiver de post_save/post_delete: a próxima leitura vai ao banco."""
+    current = _current.get()
+    if current is not None and instance.pk is not None:
+        label, pk = IdentityMap.key(sender, instance.pk)
+        current.objects.pop((label, pk), None)
+        # listas de escolhas do mesmo modelo podem ter mudado
+        for key in [k for k in current.querysets if k[1] == label]:
+            del current.querysets[key]
+        for key in [k for k in current.indexes if k[0][1] == label]:
+            del current.indexes[key]
+
+
+def _qs_key(qs):
+    try:
+        sql, params = qs.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    return qs.db, qs.model._meta.concrete_model._meta.label, sql, tuple(str(p) for p in params)
+
+
+def warm(qs):
+    """Lista do queryset, avaliada uma vez por request; os objetos entram no mapa."""
+    current = _current.get()
+    if current is None:
+        return list(qs)
+    key = _qs_key(qs)
+    if key is None:
+        return []
+    objs = current.querysets.get(key)
+    if objs is None:
+        objs = current.querysets[key] = list(qs)
+        remember(*objs)
+    return objs
+
+
+def prime(qs, objs):
+    """Registra ``objs`` como o resultado de ``qs`` (ex.: lista vinda do core.localcache)."""
+    current = _current.get()
+    key = _qs_key(qs) if current is not None else None
+    if key is not None:
+        current.querysets[key] = objs
+        remember(*objs)
+    return qs
+
+
+def pick(qs, value, field="pk"):
+    """Objeto de ``warm(qs)`` com ``field == value`` (None se não estiver no queryset)."""
+    current = _current.get()
+    key = _qs_key(qs) if current is not None else None
+    if key is None:
+        return next((o for o in warm(qs) if str(getattr(o, field)) == str(value)), None)
+    index = current.indexes.get((key, field))
+    if index is None:
+        index = current.indexes[(key, field)] = {str(getattr(o, field)): o for o in warm(qs)}
+    return index.get(str(value))
+
+
+def related(instance, name):
+    """``instance.<name>`` sem query quando o objeto já está no mapa (ou no cache da FK)."""
+    field = instance._meta.get_field(name)
+    if field.is_cached(instance):
+        return field.get_cached_value(instance)
+    obj = lookup(field.related_model, getattr(instance, field.attname))
+    if obj is None:
+        obj = getattr(instance, name)
+        remember(obj)
+    else:
+        field.set_cached_value(instance, obj)
+    return obj
+
+
+def loaded(instance, name):
+    """A FK já aponta para um objeto lido do banco neste request? (dispensa o ``exists()`` do clean_fields)"""
+    if _current.get() is None:
+        return False
+    field = instance._meta.get_field(name)
+    if not field.is_cached(instance) or field.get_limit_choices_to():
+        return False
+    obj = field.get_cached_value(instance)
+    return obj is not None and not obj._state.adding and obj.pk == getattr(instance, field.attname)
@@ -0,0 +1,100 @@
+"""
+LRU por processo para leituras pequenas e quentes por tenant (lojas,
+equipe ativa, catálogo), com tamanho limitado por TENANT_LRU_SIZE.
+
+Cada entrada guarda a versão do tenant com que foi montada. A versão mora
+no cache compartilhado (uma chave por tenant, um GET por leitura) e é
+incrementada por ``bump(owner_id)`` quando alguém grava (sinais em
+cadastros.signals, no commit): os outros workers veem a versão nova e
+descartam a entrada antiga na próxima leitura. Os valores são compartilhados
+entre requests — trate como somente leitura.
+
+Isso exige que o cache ``default`` seja de fato compartilhado (Redis,
+Memcached...): com LocMemCache cada processo tem a sua versão, e um bump
+feito no ``run_worker`` (importação de catálogo, por exemplo) nunca chegaria
+aos processos web. Nesse caso o LRU fica desligado e toda leitura vai ao
+banco, a menos que TENANT_LRU_SINGLE_PROCESS diga que só há um processo.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def enabled():
+    """O LRU só é coerente com a versão num cache visto por todos os processos."""
+    if getattr(settings, "TENANT_LRU_SINGLE_PROCESS", False):
+        return True
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+# ===== versão do tenant =====
+def _version_key(owner_id):
+    return f"tenant:version:{owner_id}"
+
+
+def version(owner_id):
+    value = cache.get(_version_key(owner_id))
+    if value is None:
+        cache.add(_version_key(owner_id), 1, None)
+        value = cache.get(_version_key(owner_id), 1)
+    return value
+
+
+def bump(owner_id):
+    try:
+        cache.incr(_version_key(owner_id))
+    except ValueError:
+        cache.add(_version_key(owner_id), 2, None)
+
+
+# ===== LRU =====
+class TenantLRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # (owner_id, chave) -> (versão, valor)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, owner_id, key, loader):
+        current = version(owner_id)
+        slot = (owner_id, key)
+        with self._lock:
+            entry = self._data.get(slot)
+            if entry is not None and entry[0] == current:
+                self._data.move_to_end(slot)
+                return entry[1]
+        value = loader()
+        with self._lock:
+            self._data[slot] = (current, value)
+            self._data.move_to_end(slot)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lru = TenantLRU(getattr(settings, "TENANT_LRU_SIZE", 1024))
+
+
+def cached(owner_id, key, loader):
+    """Valor de ``loader()`` para o tenant, reaproveitado enquanto a versão não mudar."""
+    if not enabled():
+        return loader()
+    return _lru.get(owner_id, key, loader)
+
+
+def clear():
+    _lru.clear()
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Move todos os dados de um tenant para outro shard (alias de TENANT_SHARDS). "
+        "Rode com o tenant sem uso: escritas durante a cópia não são levadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="E-mail do owner (tenant).")
+        parser.add_argument("--to", required=True, dest="target", help="Alias do shard de destino.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        owner = get_user_model().objects.filter(email=opts["owner"]).first()
+        if owner is None:
+            raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        try:
+            source = sharding.move_tenant(
+                owner, opts["target"], batch_size=opts["batch_size"],
+                progress=lambda label, n: self.stderr.write(f"{label}: {n}"),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"{owner.email}: {source} -> {opts['target']}")
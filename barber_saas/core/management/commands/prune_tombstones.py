@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove tombstones mais antigos que a retenção do sync. "
+        "Clientes com cursor anterior a isso recebem reset e sincronizam do zero."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+    def handle(self, *args, **opts):
+        deleted = sync.prune_tombstones(opts["days"])
+        self.stdout.write(f"{deleted} tombstone(s) removido(s).")
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import purge
+from core.models import PurgeJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Agenda a exclusão de todos os dados de um tenant (o login é desativado na hora). "
+        "Use --now para executar em seguida; senão fica para run_purge_jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="E-mail do owner (tenant).")
+        parser.add_argument("--now", action="store_true")
+
+    def handle(self, *args, **opts):
+        owner = get_user_model().objects.filter(email=opts["owner"]).first()
+        if owner is None:
+            raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        job = purge.schedule(owner, PurgeJob.KIND_TENANT, owner)
+        if opts["now"]:
+            purge.run(job)
+        self.stdout.write(f"{job.label}: job {job.pk} ({job.get_status_display()})")
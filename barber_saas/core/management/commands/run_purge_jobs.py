@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import purge
+from core.models import PurgeJob
+
+
+class Command(BaseCommand):
+    help = "Processa as exclusões pendentes (tenant, loja, cliente) em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--limit", type=int, default=None, help="Máximo de jobs nesta execução.")
+
+    def handle(self, *args, **opts):
+        ran = purge.run_pending(batch_size=opts["batch_size"], limit=opts["limit"])
+        failed = PurgeJob.objects.filter(status=PurgeJob.STATUS_FAILED).count()
+        self.stdout.write(f"{ran} exclusão(ões) concluída(s); {failed} com falha.")
@@ -0,0 +1,33 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core import queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de tarefas em banco: reivindica tarefas vencidas e executa "
+        "até --concurrency em paralelo. SIGTERM/SIGINT terminam as tarefas em andamento e saem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument("--poll", type=float, default=None, help="Segundos entre consultas com a fila vazia.")
+        parser.add_argument("--once", action="store_true", help="Sai quando a fila esvaziar.")
+
+    def handle(self, *args, **opts):
+        stop = []
+
+        def request_stop(signum, frame):
+            stop.append(signum)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        worker = queue.default_worker_id()
+        self.stdout.write(f"worker {worker} iniciado")
+        queue.run_worker(
+            concurrency=opts["concurrency"], poll=opts["poll"], worker=worker,
+            once=opts["once"], should_stop=lambda: bool(stop),
+        )
+        self.stdout.write(f"worker {worker} encerrado")
@@ -0,0 +1,48 @@
+from django.utils.cache import patch_vary_headers
+
+from . import identity, sharding
+
+
+class TenantShardMiddleware:
+    """Garante que nenhum request herde o tenant ativo de outro (mesma thread)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = sharding.clear()
+        try:
+            return self.get_response(request)
+        finally:
+            sharding.deactivate(token)
+
+
+class IdentityMapMiddleware:
+    """Um identity map (core.identity) por request: cada loja/produto/cliente é lido uma vez."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity.scope():
+            return self.get_response(request)
+
+
+class BoostedMiddleware:
+    """
+    ``request.boosted``: navegação do sidebar com hx-boost (header HX-Boosted).
+    O base.html então devolve só o <title> e o #pageFrame, sem o layout.
+    Restauração de histórico (cache do htmx vazio) continua com a página inteira.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.boosted = (
+            request.headers.get("HX-Boosted") == "true"
+            and request.headers.get("HX-History-Restore-Request") != "true"
+        )
+        response = self.get_response(request)
+        patch_vary_headers(response, ("HX-Boosted",))
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tenant_shard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_email', models.EmailField(blank=True, max_length=254)),
+                ('kind', models.CharField(choices=[('tenant', 'Tenant'), ('shop', 'Loja'), ('client', 'Cliente')], max_length=16)),
+                ('target_id', models.CharField(max_length=64)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em andamento'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=16)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('done', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purge_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_purgej_status_7db160_idx')],
+            },
+        ),
+    ]
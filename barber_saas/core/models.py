@@ -1,10 +1,13 @@
 import uuid
 from decimal import Decimal
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+from . import identity
+
 # ===== Mixins base =====
 class UUIDModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -21,6 +24,10 @@ class TenantQuerySet(models.QuerySet):
     def for_user(self, user):
         return self.filter(owner=user)
 
+    def rows(self, row):
+        """Projeção em linhas leves (core.rows): só as colunas da tabela, num SELECT."""
+        return row.project(self)
+
 class TenantOwnedModel(UUIDModel, TimeStampedModel):
     """
     Todo registro pertence a um 'owner' (usuário/tenant).
@@ -37,7 +44,140 @@ class TenantOwnedModel(UUIDModel, TimeStampedModel):
         abstract = True
         indexes = [models.Index(fields=["owner"])]
 
+    def clean_fields(self, exclude=None):
+        # FK para objeto já carregado no request (core.identity) não precisa do exists() de validação
+        exclude = set(exclude or ())
+        exclude.update(
+            f.name for f in self._meta.concrete_fields
+            if f.many_to_one and f.name not in exclude and identity.loaded(self, f.name)
+        )
+        super().clean_fields(exclude=exclude)
+
     def clean(self):
         super().clean()
         if not self.owner_id:
             raise ValidationError("Defina 'owner' (tenant) no objeto.")
+
+
+class Tombstone(models.Model):
+    """
+    Registro de exclusão para o sync incremental: os clientes offline não
+    têm como "ver" uma linha apagada, então guardamos (modelo, id) aqui.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="tombstones")
+    model = models.CharField(max_length=64)  # "app_label.ModelName"
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["owner", "deleted_at", "id"])]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id}"
+
+
+class TenantShard(models.Model):
+    """Em qual shard (alias de DATABASES) mora cada tenant. Global: fica no default."""
+    tenant_sharded = False
+
+    owner = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="shard")
+    alias = models.CharField(max_length=64)
+    moved_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.owner_id} -> {self.alias}"
+
+
+class PurgeJob(models.Model):
+    """
+    Exclusão em segundo plano (tenant, loja ou cliente): o request só cria o
+    job; core.purge apaga em lotes e vai registrando o progresso aqui.
+    Global (fica no default) para sobreviver à exclusão do próprio tenant.
+    """
+    tenant_sharded = False
+
+    KIND_TENANT = "tenant"
+    KIND_SHOP = "shop"
+    KIND_CLIENT = "client"
+    KIND_CHOICES = [
+        (KIND_TENANT, "Tenant"),
+        (KIND_SHOP, "Loja"),
+        (KIND_CLIENT, "Cliente"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendente"),
+        (STATUS_RUNNING, "Em andamento"),
+        (STATUS_DONE, "Concluído"),
+        (STATUS_FAILED, "Falhou"),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name="purge_jobs")
+    owner_email = models.EmailField(blank=True)  # o owner some quando o job é do próprio tenant
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    target_id = models.CharField(max_length=64)
+    label = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("created_at",)
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.label or self.target_id} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        return int(self.done * 100 / self.total) if self.total else 0
+
+
+class Task(models.Model):
+    """
+    Tarefa da fila em banco (core.queue). ``name`` é a chave registrada com
+    @queue.task; args/kwargs vão em JSON. Maior ``priority`` sai antes.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Na fila"),
+        (STATUS_RUNNING, "Executando"),
+        (STATUS_DONE, "Concluída"),
+        (STATUS_FAILED, "Falhou"),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_at"], name="core_task_claim_idx"),
+            models.Index(fields=["status", "locked_at"], name="core_task_stale_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
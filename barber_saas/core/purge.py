@@ -0,0 +1,244 @@
+"""
+Exclusão em segundo plano de tenant, loja ou cliente.
+
+O collector do Django carrega todos os objetos relacionados (comandas,
+itens, preços, vínculos...) antes de apagar e segura a escrita durante a
+operação inteira; ``ServiceOrder.shop`` ainda é PROTECT, então excluir uma
+loja com histórico falhava. Aqui o request só agenda um PurgeJob (tira o
+alvo de circulação e enfileira ``core.run_purge``); ``run`` apaga em lotes
+de PURGE_BATCH_SIZE ids com ``DELETE ... WHERE id IN (...)``, cada lote
+numa transação curta, filhos antes dos pais, e grava o progresso no job.
+
+O plano sai das próprias FKs: CASCADE/PROTECT/RESTRICT viram exclusão (com
+os netos antes), SET_NULL vira UPDATE em lote. O alvo em si é apagado por
+último com ``.delete()`` normal, já sem dependentes, para disparar os sinais
+de sempre (catálogo, tombstone).
+"""
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, models
+from django.utils import timezone
+
+from . import queue, sharding
+from .db import delete_ids
+from .models import PurgeJob, Tombstone
+
+logger = logging.getLogger(__name__)
+
+DELETE_ON = (models.CASCADE, models.PROTECT, models.RESTRICT)
+ACTIVE = (PurgeJob.STATUS_PENDING, PurgeJob.STATUS_RUNNING)
+
+
+def _target_model(kind):
+    return {
+        PurgeJob.KIND_SHOP: apps.get_model("cadastros", "Shop"),
+        PurgeJob.KIND_CLIENT: apps.get_model("cadastros", "Client"),
+    }[kind]
+
+
+# ===== plano =====
+def _referencing(model):
+    """(modelo, campo) de cada FK de modelo de tenant que aponta para ``model``."""
+    for child in apps.get_models():
+        if not sharding.is_tenant_model(child) or not child._meta.managed or child._meta.proxy:
+            continue
+        for field in child._meta.concrete_fields:
+            if field.is_relation and (field.many_to_one or field.one_to_one) and field.related_model is model:
+                yield child, field
+
+
+def plan(model, path="", _seen=()):
+    """
+    [(ação, modelo, lookup, campo)] para remover tudo que depende de
+    ``model``, folhas primeiro. ``lookup`` filtra a partir do id do alvo
+    (ex.: ``order__shop``); ``campo`` é o FK a anular nas ações "null".
+    """
+    steps = []
+    for child, field in _referencing(model):
+        lookup = f"{field.name}__{path}" if path else field.name
+        on_delete = field.remote_field.on_delete
+        if on_delete in DELETE_ON:
+            if child in _seen:
+                continue
+            steps += plan(child, lookup, _seen + (model,))
+            steps.append(("delete", child, lookup, None))
+        elif on_delete is models.SET_NULL:
+            steps.append(("null", child, lookup, field.name))
+    return steps
+
+
+def tenant_plan():
+    """Todas as tabelas do tenant, filhos antes dos pais."""
+    return [("delete", model, None, None) for model in reversed(sharding.tenant_models())]
+
+
+def _queryset(step, owner_id, target_id):
+    _action, model, lookup, _field = step
+    qs = model.objects.filter(owner_id=owner_id).order_by()
+    if lookup:
+        qs = qs.filter(**{lookup: target_id})
+    return qs
+
+
+# ===== agendamento (request) =====
+def schedule(owner, kind, obj=None):
+    """
+    Cria o job (ou devolve o que já está na fila para o mesmo alvo) e tira o
+    alvo de circulação: loja/cliente inativo, tenant sem login.
+    """
+    owner_id = getattr(owner, "pk", owner)
+    target_id = str(obj.pk if obj is not None else owner_id)
+    job = PurgeJob.objects.filter(kind=kind, target_id=target_id, status__in=ACTIVE).first()
+    if job is not None:
+        return job
+    if kind == PurgeJob.KIND_TENANT:
+        user = obj if obj is not None else get_user_model().objects.get(pk=owner_id)
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        label, email = user.email, user.email
+    else:
+        obj.is_active = False
+        obj.save(update_fields=["is_active", "updated_at"])
+        label = str(obj)
+        email = get_user_model().objects.filter(pk=owner_id).values_list("email", flat=True).first() or ""
+    job = PurgeJob.objects.create(owner_id=owner_id, owner_email=email, kind=kind, target_id=target_id, label=label)
+    queue.enqueue("core.run_purge", job.pk)
+    return job
+
+
+def schedule_many(owner, kind, ids):
+    """
+    ``schedule`` para vários alvos (loja/cliente) com queries em lote: um
+    UPDATE desativa todos, jobs e tarefas entram com bulk_create.
+    Devolve quantos jobs novos foram criados.
+    """
+    owner_id = getattr(owner, "pk", owner)
+    model = _target_model(kind)
+    active = set(pending_ids(owner_id, kind))
+    objs = [
+        obj for obj in model.objects.filter(owner_id=owner_id, pk__in=ids)
+        if str(obj.pk) not in active
+    ]
+    if not objs:
+        return 0
+    model.objects.filter(pk__in=[obj.pk for obj in objs]).update(is_active=False, updated_at=timezone.now())
+    email = get_user_model().objects.filter(pk=owner_id).values_list("email", flat=True).first() or ""
+    jobs = PurgeJob.objects.bulk_create([
+        PurgeJob(owner_id=owner_id, owner_email=email, kind=kind, target_id=str(obj.pk), label=str(obj)[:200])
+        for obj in objs
+    ])
+    queue.enqueue_many("core.run_purge", [(job.pk,) for job in jobs])
+    return len(jobs)
+
+
+def pending_ids(owner, kind):
+    """Ids de alvos com exclusão em andamento (para esconder das listagens)."""
+    owner_id = getattr(owner, "pk", owner)
+    return list(
+        PurgeJob.objects.filter(owner_id=owner_id, kind=kind, status__in=ACTIVE).values_list("target_id", flat=True)
+    )
+
+
+# ===== execução (worker) =====
+def _claim(job, reclaim=False):
+    """
+    pending -> running. Com ``reclaim``, também retoma um job "running" há mais
+    que TASK_LOCK_TIMEOUT_SECONDS (o worker morreu no meio); cada passo
+    seleciona de novo os ids que restam, então recomeçar é seguro.
+    """
+    claimable = models.Q(status=PurgeJob.STATUS_PENDING)
+    if reclaim:
+        cutoff = timezone.now() - timedelta(seconds=settings.TASK_LOCK_TIMEOUT_SECONDS)
+        claimable |= models.Q(status=PurgeJob.STATUS_RUNNING, started_at__lt=cutoff)
+    return PurgeJob.objects.filter(claimable, pk=job.pk).update(
+        status=PurgeJob.STATUS_RUNNING, started_at=timezone.now(), error="",
+    ) == 1
+
+
+def _progress(job, n):
+    job.done += n
+    PurgeJob.objects.filter(pk=job.pk).update(done=models.F("done") + n)
+
+
+def _run_step(job, step, owner_id, target_id, batch_size, tombstone):
+    action, model, _lookup, field = step
+    label = model._meta.label
+    has_updated_at = any(f.name == "updated_at" for f in model._meta.concrete_fields)
+    qs = _queryset(step, owner_id, target_id)
+    while True:
+        ids = list(qs.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        with sharding.tenant_atomic():
+            if action == "delete":
+                if tombstone and label in settings.SYNC_MODELS:
+                    # DELETE cru não passa pelo post_delete do sync
+                    Tombstone.objects.bulk_create(
+                        [Tombstone(owner_id=owner_id, model=label, object_id=pk) for pk in ids]
+                    )
+                delete_ids(model, ids, using=sharding.current_db())
+            else:
+                values = {field: None}
+                if has_updated_at:
+                    values["updated_at"] = timezone.now()  # o sync precisa ver a mudança
+                model.objects.filter(pk__in=ids).update(**values)
+        _progress(job, len(ids))
+
+
+def _delete_tenant_user(owner_id):
+    User = get_user_model()
+    for alias in sharding.shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            User.objects.using(alias).filter(pk=owner_id).delete()  # espelho
+    User.objects.using(DEFAULT_DB_ALIAS).filter(pk=owner_id).delete()
+
+
+def run(job, batch_size=None, reclaim=False):
+    """Executa um job pendente. Devolve False se outro worker já o pegou."""
+    if not _claim(job, reclaim):
+        return False
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    owner_id = job.owner_id
+    try:
+        with sharding.tenant(owner_id):
+            if job.kind == PurgeJob.KIND_TENANT:
+                steps, target_id = tenant_plan(), None
+            else:
+                target_model = _target_model(job.kind)
+                steps, target_id = plan(target_model), target_model._meta.pk.to_python(job.target_id)
+            job.total = sum(_queryset(step, owner_id, target_id).count() for step in steps)
+            job.done = 0
+            PurgeJob.objects.filter(pk=job.pk).update(total=job.total, done=0)
+
+            for step in steps:
+                _run_step(job, step, owner_id, target_id, batch_size, tombstone=job.kind != PurgeJob.KIND_TENANT)
+
+            if job.kind == PurgeJob.KIND_TENANT:
+                _delete_tenant_user(owner_id)
+            else:
+                obj = target_model.objects.filter(owner_id=owner_id, pk=target_id).first()
+                if obj is not None:
+                    obj.delete()
+    except Exception as e:
+        logger.exception("Falha na exclusão %s", job.pk)
+        job.status, job.error = PurgeJob.STATUS_FAILED, str(e)
+        PurgeJob.objects.filter(pk=job.pk).update(status=job.status, error=job.error, finished_at=timezone.now())
+        raise
+    job.status, job.finished_at = PurgeJob.STATUS_DONE, timezone.now()
+    PurgeJob.objects.filter(pk=job.pk).update(status=job.status, finished_at=job.finished_at)
+    return True
+
+
+def run_pending(batch_size=None, limit=None):
+    """Processa os jobs pendentes em ordem de criação. Devolve quantos rodou."""
+    ran = 0
+    for job in PurgeJob.objects.filter(status=PurgeJob.STATUS_PENDING)[:limit]:
+        try:
+            ran += run(job, batch_size)
+        except Exception:
+            continue  # já registrado no job; segue para o próximo
+    return ran
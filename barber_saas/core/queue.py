@@ -0,0 +1,222 @@
+"""
+Fila de tarefas em banco, sem broker externo.
+
+Registro: funções marcadas com ``@task`` nos módulos ``<app>/tasks.py``
+(importados no ready() do core). A chave é "<app>.<função>".
+
+Produtor: ``enqueue("relatorios.rebuild_facts", owner_id)`` grava uma linha
+em core.Task. Argumentos viram JSON (UUID/data chegam como string).
+
+Worker (``manage.py run_worker``): reivindica tarefas vencidas por
+prioridade e run_at. Em bancos com SKIP LOCKED usa SELECT ... FOR UPDATE
+SKIP LOCKED; no SQLite, um UPDATE condicional por id (status=queued): só um
+worker vence. Executa num pool de threads limitado a TASK_CONCURRENCY.
+Falhas voltam para a fila com backoff exponencial até max_attempts; enquanto
+uma tarefa roda, o worker renova ``locked_at`` a cada TASK_HEARTBEAT_SECONDS,
+então só volta para a fila (após TASK_LOCK_TIMEOUT_SECONDS sem renovação) a
+tarefa de um worker que morreu.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+# ===== registro =====
+def task(func=None, *, name=None, max_attempts=None, priority=0):
+    """Registra a função como tarefa (``@task`` ou ``@task(priority=10)``)."""
+    def register(f):
+        key = name or f"{f.__module__.split('.')[0]}.{f.__name__}"
+        _registry[key] = (f, max_attempts, priority)
+        f.task_name = key
+        return f
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(f"Tarefa não registrada: {name}")
+
+
+# ===== produtor =====
+def enqueue(name, *args, priority=None, delay=None, run_at=None, **kwargs):
+    """Põe a tarefa na fila e devolve a linha criada. ``name`` aceita a própria função."""
+    name = getattr(name, "task_name", name)
+    _func, max_attempts, default_priority = get_task(name)
+    if run_at is None:
+        run_at = timezone.now() + (timedelta(seconds=delay) if delay else timedelta())
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs,
+        priority=default_priority if priority is None else priority,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=run_at,
+    )
+
+
+def enqueue_many(name, args_list, priority=None):
+    """Uma tarefa por tupla de argumentos, num único INSERT em lote."""
+    name = getattr(name, "task_name", name)
+    _func, max_attempts, default_priority = get_task(name)
+    now = timezone.now()
+    return Task.objects.bulk_create([
+        Task(
+            name=name, args=list(args), kwargs={},
+            priority=default_priority if priority is None else priority,
+            max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+            run_at=now,
+        )
+        for args in args_list
+    ], batch_size=500)
+
+
+# ===== reivindicação =====
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker, limit=1):
+    """Marca até ``limit`` tarefas vencidas como running para ``worker`` e devolve-as."""
+    if limit <= 0:
+        return []
+    db = router.db_for_write(Task)
+    now = timezone.now()
+    due = Task.objects.filter(status=Task.STATUS_QUEUED, run_at__lte=now).order_by("-priority", "run_at", "id")
+    take = {"status": Task.STATUS_RUNNING, "locked_by": worker, "locked_at": now, "attempts": F("attempts") + 1}
+
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            ids = list(due.select_for_update(skip_locked=True).values_list("pk", flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**take)
+    else:
+        # SQLite: sem lock de linha; o UPDATE condicional decide quem leva
+        ids = []
+        for pk in due.values_list("pk", flat=True)[:limit * 2]:
+            if Task.objects.filter(pk=pk, status=Task.STATUS_QUEUED).update(**take):
+                ids.append(pk)
+                if len(ids) >= limit:
+                    break
+    return list(Task.objects.filter(pk__in=ids).order_by("-priority", "run_at", "id"))
+
+
+def heartbeat(worker, ids):
+    """Renova o lock das tarefas que ``worker`` ainda está executando."""
+    if not ids:
+        return 0
+    return Task.objects.filter(pk__in=list(ids), status=Task.STATUS_RUNNING, locked_by=worker).update(
+        locked_at=timezone.now(),
+    )
+
+
+def requeue_stale():
+    """Devolve à fila tarefas presas em running (worker morto no meio: o heartbeat parou)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_LOCK_TIMEOUT_SECONDS)
+    return Task.objects.filter(status=Task.STATUS_RUNNING, locked_at__lt=cutoff).update(
+        status=Task.STATUS_QUEUED, locked_by="", locked_at=None,
+    )
+
+
+# ===== execução =====
+def backoff(attempts):
+    delay = settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.TASK_RETRY_BACKOFF_MAX_SECONDS))
+
+
+def execute(t):
+    """Roda uma tarefa já reivindicada e grava o resultado (done, retry ou failed)."""
+    try:
+        func, _max, _prio = get_task(t.name)
+        func(*t.args, **t.kwargs)
+    except Exception as e:
+        error = traceback.format_exc()
+        logger.warning("Tarefa %s #%s falhou (tentativa %s)", t.name, t.pk, t.attempts)
+        retry = not isinstance(e, UnknownTask)  # tarefa removida do código: não adianta repetir
+        if retry and t.attempts < t.max_attempts:
+            t.status, t.run_at = Task.STATUS_QUEUED, timezone.now() + backoff(t.attempts)
+        else:
+            t.status, t.finished_at = Task.STATUS_FAILED, timezone.now()
+        t.last_error = error
+    else:
+        t.status, t.finished_at = Task.STATUS_DONE, timezone.now()
+    t.locked_by, t.locked_at = "", None
+    Task.objects.filter(pk=t.pk).update(
+        status=t.status, run_at=t.run_at, finished_at=t.finished_at,
+        last_error=t.last_error, locked_by="", locked_at=None,
+    )
+    return t.status
+
+
+def work(worker=None, limit=None):
+    """Roda, no thread atual, as tarefas vencidas até a fila esvaziar. Devolve quantas rodou."""
+    worker = worker or default_worker_id()
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = claim(worker, 1)
+        if not claimed:
+            return ran
+        execute(claimed[0])
+        ran += 1
+    return ran
+
+
+def _run_in_thread(t):
+    try:
+        return execute(t)
+    finally:
+        connections.close_all()  # conexões são por thread
+
+
+def run_worker(concurrency=None, poll=None, worker=None, once=False, should_stop=lambda: False):
+    """
+    Laço do worker: mantém até ``concurrency`` tarefas em paralelo (threads).
+    ``once`` sai quando não houver mais nada vencido.
+    """
+    concurrency = concurrency or settings.TASK_CONCURRENCY
+    poll = settings.TASK_POLL_SECONDS if poll is None else poll
+    worker = worker or default_worker_id()
+    running = {}  # future -> id da tarefa
+    last_sweep = last_beat = 0.0
+
+    def wait_some():
+        nonlocal last_beat
+        done, _pending = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+        for future in done:
+            del running[future]
+        if time.monotonic() - last_beat > settings.TASK_HEARTBEAT_SECONDS:
+            heartbeat(worker, list(running.values()))
+            last_beat = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="task") as pool:
+        while not should_stop():
+            if time.monotonic() - last_sweep > poll * 30:
+                requeue_stale()
+                last_sweep = time.monotonic()
+            for t in claim(worker, concurrency - len(running)):
+                running[pool.submit(_run_in_thread, t)] = t.pk
+            if running:
+                wait_some()
+            elif once:
+                break
+            else:
+                time.sleep(poll)
+        while running:  # encerrando: termina o que está em andamento sem perder o lock
+            wait_some()
@@ -0,0 +1,33 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from . import sharding
+
+
+class TenantRouter:
+    """
+    Modelos de tenant -> shard do owner (da instância, quando há, senão o
+    tenant ativo). Todo o resto (usuários, sessões, TenantShard) -> default.
+    """
+
+    def _db(self, model, instance=None, **hints):
+        if not sharding.is_tenant_model(model):
+            return DEFAULT_DB_ALIAS
+        if instance is not None and instance._state.db and sharding.is_tenant_model(type(instance)):
+            return instance._state.db
+        return sharding.current_db()
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # usuários são globais e espelhados em todos os shards
+        if not (sharding.is_tenant_model(type(obj1)) and sharding.is_tenant_model(type(obj2))):
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # esquema completo em todos os shards (FKs para usuário precisam da tabela)
+        return None
@@ -0,0 +1,76 @@
+"""
+Linhas projetadas para tabelas/fragmentos.
+
+As listas (produtos, clientes, equipe, comandas da home) carregavam o modelo
+inteiro, com ``notes``/``description`` e afins, para o template ler quatro ou
+cinco colunas. Uma subclasse de ``Row`` declara em ``__slots__`` só o que a
+linha exibe; os relacionados (também ``Row``) vêm no mesmo SELECT, pelos JOINs
+do ``values_list``:
+
+    class ShopRef(Row):
+        __slots__ = ("pk", "updated_at", "name")
+
+    class OrderRow(Row):
+        model = ServiceOrder
+        related = {"shop": ShopRef}
+        __slots__ = ("pk", "updated_at", "status", "shop")
+
+    ServiceOrder.objects.filter(...).rows(OrderRow)
+
+O resultado continua um queryset (paginação, ``count()``, fatias) e cada item
+é um objeto pequeno com os mesmos nomes de atributo do modelo, então os
+templates de linha e as chaves do core.fragments servem aos dois. FK nula
+vira ``None``, como no modelo.
+"""
+from django.db.models.query import BaseIterable, ValuesListIterable
+
+
+class RowIterable(BaseIterable):
+    row = None
+
+    def __iter__(self):
+        build = self.row.build
+        for values in ValuesListIterable(self.queryset):
+            yield build(iter(values))
+
+
+class Row:
+    __slots__ = ()
+    model = None
+    related = {}  # nome do slot -> subclasse de Row do relacionado
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.columns = tuple(name for name in cls.__slots__ if name not in cls.related)
+        cls.iterable = type(f"{cls.__name__}Iterable", (RowIterable,), {"row": cls})
+
+    @classmethod
+    def paths(cls, prefix=""):
+        """Caminhos do ORM na ordem em que ``build`` os consome."""
+        paths = [prefix + name for name in cls.columns]
+        for name, sub in cls.related.items():
+            paths += sub.paths(f"{prefix}{name}__")
+        return paths
+
+    @classmethod
+    def build(cls, values):
+        obj = cls.__new__(cls)
+        for name in cls.columns:
+            setattr(obj, name, next(values))
+        for name, sub in cls.related.items():
+            setattr(obj, name, sub.build(values))
+        return obj if obj.pk is not None else None
+
+    @classmethod
+    def project(cls, qs):
+        qs = qs.values_list(*cls.paths())
+        qs._iterable_class = cls.iterable
+        return qs
+
+    def display(self, name):
+        """Rótulo do choice (o ``get_<campo>_display`` do modelo)."""
+        value = getattr(self, name)
+        return dict(self.model._meta.get_field(name).flatchoices).get(value, value)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.pk}>"
@@ -0,0 +1,244 @@
+"""
+Sharding por tenant.
+
+Cada owner mora num shard (alias de DATABASES listado em TENANT_SHARDS);
+o mapeamento fica em TenantShard, no banco "default", junto com usuários,
+sessões e tokens (tabelas globais). O router (core.routers.TenantRouter)
+manda toda query de modelo com ``owner`` para o shard do tenant ativo.
+
+O tenant ativo é um ContextVar: os mixins de view (OwnerQuerysetMixin e
+afins) ativam ``request.user``, a TenantShardMiddleware limpa ao fim do
+request; comandos e jobs usam ``with tenant(owner):``.
+
+Tabelas com FK para usuário existem em todos os shards, então cada usuário
+é espelhado (só a linha da tabela de usuários) em todos os shards.
+"""
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+from functools import cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+_current = ContextVar("tenant_shard", default=None)  # (owner_id, alias) ou None
+
+
+def shard_aliases():
+    return list(settings.TENANT_SHARDS)
+
+
+def is_sharded():
+    return shard_aliases() != [DEFAULT_DB_ALIAS]
+
+
+@cache
+def is_tenant_model(model):
+    """Modelos com FK ``owner`` para o usuário (salvo os que optam por ficar globais)."""
+    flag = getattr(model, "tenant_sharded", None)
+    if flag is not None:
+        return flag
+    try:
+        field = model._meta.get_field("owner")
+    except Exception:
+        return False
+    return bool(field.is_relation and field.related_model is get_user_model())
+
+
+def shard_for(owner_id):
+    """Alias do shard do owner (uma query indexada no default)."""
+    if owner_id is None or not is_sharded():
+        return settings.TENANT_DEFAULT_SHARD
+    from .models import TenantShard
+    alias = TenantShard.objects.using(DEFAULT_DB_ALIAS).filter(owner_id=owner_id).values_list("alias", flat=True).first()
+    return alias or settings.TENANT_DEFAULT_SHARD
+
+
+# ===== tenant ativo =====
+def activate(owner):
+    owner_id = getattr(owner, "pk", owner)
+    return _current.set((owner_id, shard_for(owner_id)))
+
+
+def clear():
+    """Zera o tenant ativo; devolve o token para restaurar com ``deactivate``."""
+    return _current.set(None)
+
+
+def deactivate(token=None):
+    if token is not None:
+        _current.reset(token)
+    else:
+        _current.set(None)
+
+
+@contextmanager
+def tenant(owner):
+    token = activate(owner)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def shard(alias):
+    """Ativa um shard sem tenant (jobs que varrem todos os tenants de cada shard)."""
+    token = _current.set((None, alias))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_owner_id():
+    value = _current.get()
+    return value[0] if value else None
+
+
+def current_db():
+    value = _current.get()
+    return value[1] if value else settings.TENANT_DEFAULT_SHARD
+
+
+def bind(iterable, owner):
+    """Mantém o tenant ativo enquanto um iterador é consumido (StreamingHttpResponse)."""
+    with tenant(owner):
+        yield from iterable
+
+
+class tenant_atomic(ContextDecorator):
+    """
+    transaction.atomic no shard do tenant ativo (resolvido na entrada, não no import).
+    Como decorator (``@tenant_atomic()``) cada chamada usa uma instância nova
+    (``_recreate_cm``): a do import é compartilhada entre threads do worker.
+    """
+
+    def __init__(self):
+        self._atomic = None
+
+    def _recreate_cm(self):
+        return type(self)()
+
+    def __enter__(self):
+        self._atomic = transaction.atomic(using=current_db())
+        return self._atomic.__enter__()
+
+    def __exit__(self, *exc):
+        return self._atomic.__exit__(*exc)
+
+
+def on_commit(func):
+    transaction.on_commit(func, using=current_db())
+
+
+# ===== espelho de usuários =====
+def mirror_users(users, aliases=None):
+    """Copia/atualiza as linhas de usuário nos shards (sem sinais)."""
+    User = get_user_model()
+    fields = [f.attname for f in User._meta.concrete_fields if not f.primary_key]
+    rows = [User(**{f.attname: getattr(u, f.attname) for f in User._meta.concrete_fields}) for u in users]
+    if not rows:
+        return
+    for alias in aliases or shard_aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        User.objects.using(alias).bulk_create(
+            rows, update_conflicts=True, unique_fields=[User._meta.pk.name], update_fields=fields,
+        )
+
+
+def user_saved(sender, instance, raw=False, **kwargs):
+    """post_save do usuário: mantém o espelho atualizado nos shards."""
+    if not raw and is_sharded():
+        mirror_users([instance])
+
+
+# ===== mover tenant =====
+def tenant_models():
+    """Modelos de tenant em ordem de dependência (pais antes dos filhos)."""
+    pending = [m for m in apps.get_models() if is_tenant_model(m) and m._meta.managed and not m._meta.proxy]
+    ordered, seen = [], set()
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        for field in model._meta.concrete_fields:
+            parent = field.related_model if field.is_relation else None
+            if parent is not None and parent is not model and parent in pending:
+                visit(parent)
+        ordered.append(model)
+
+    for model in pending:
+        visit(model)
+    return ordered
+
+
+def _owner_ids(model, owner_id, using, batch_size):
+    qs = model.objects.using(using).filter(owner_id=owner_id).order_by().values_list("pk", flat=True)
+    batch = []
+    for pk in qs.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _purge(models, owner_id, using, batch_size):
+    from .db import delete_ids
+    for model in reversed(models):
+        ids = [pk for batch in _owner_ids(model, owner_id, using, batch_size) for pk in batch]
+        delete_ids(model, ids, using=using)
+
+
+def move_tenant(owner, target, batch_size=1000, progress=None):
+    """
+    Copia todas as linhas do tenant para ``target`` (uma transação no destino),
+    troca o mapeamento e apaga da origem (uma transação na origem).
+    Escritas do tenant durante a cópia se perdem: rode com o tenant parado.
+    Sobras de uma tentativa anterior no destino são apagadas antes.
+    """
+    from .models import TenantShard
+    owner_id = getattr(owner, "pk", owner)
+    source = shard_for(owner_id)
+    if target not in shard_aliases():
+        raise ValueError(f"Shard desconhecido: {target}")
+    if source == target:
+        raise ValueError(f"O tenant já está em {target}.")
+    models = tenant_models()
+    User = get_user_model()
+
+    # usuários referenciados (owner + funcionários) precisam existir no destino
+    user_ids = {owner_id}
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is User and field.name != "owner":
+                user_ids.update(
+                    model.objects.using(source).filter(owner_id=owner_id).exclude(**{field.attname: None})
+                    .values_list(field.attname, flat=True).distinct()
+                )
+    mirror_users(User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids), [target])
+
+    with transaction.atomic(using=target):
+        _purge(models, owner_id, target, batch_size)
+        for model in models:
+            columns = [f.attname for f in model._meta.concrete_fields]
+            copied = 0
+            for ids in _owner_ids(model, owner_id, source, batch_size):
+                rows = model.objects.using(source).filter(pk__in=ids).values(*columns)
+                model.objects.using(target).bulk_create([model(**row) for row in rows])
+                copied += len(ids)
+            if progress and copied:
+                progress(model._meta.label, copied)
+
+    TenantShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        owner_id=owner_id, defaults={"alias": target, "moved_at": timezone.now()},
+    )
+    with transaction.atomic(using=source):
+        _purge(models, owner_id, source, batch_size)
+    return source
@@ -0,0 +1,51 @@
+"""
+Estáticos com hash no nome e pré-comprimidos.
+
+O ``collectstatic`` grava ``app.3f9a1c.js`` (ManifestStaticFilesStorage) e, ao
+lado, ``app.3f9a1c.js.gz`` e ``.br`` (este só com o pacote ``brotli``
+instalado). Como o nome muda a cada alteração do conteúdo, o arquivo pode ir
+com cache de um ano (``immutable``); quem serve (core.views.StaticView ou o
+nginx com ``gzip_static``) escolhe a variante comprimida pelo Accept-Encoding, sem
+comprimir nada por request.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há .gz
+    brotli = None
+
+COMPRESSIBLE = (".css", ".js", ".map", ".svg", ".json", ".txt", ".html", ".xml", ".ico")
+MIN_SIZE = 256  # abaixo disso o cabeçalho do gzip come o ganho
+
+
+def compress(content):
+    """[(extensão, bytes)] das variantes que de fato ficam menores que o original."""
+    variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(content)))
+    return [(ext, data) for ext, data in variants if len(data) < len(content)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # só os nomes finais do manifest (os intermediários já foram apagados)
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            yield from self._compress(hashed_name)
+
+    def _compress(self, name):
+        if not name.lower().endswith(COMPRESSIBLE) or self.size(name) < MIN_SIZE:
+            return
+        with self.open(name) as f:
+            content = f.read()
+        for ext, data in compress(content):
+            if self.exists(name + ext):
+                self.delete(name + ext)
+            self._save(name + ext, ContentFile(data))
+            yield name + ext, name + ext, True
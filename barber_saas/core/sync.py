@@ -0,0 +1,148 @@
+"""
+Sync incremental por tenant ("o que mudou desde X").
+
+Cada modelo de SYNC_MODELS é lido em ordem (updated_at, id) a partir do
+cursor do cliente, com índice (owner, updated_at, id) e no máximo ``limit``
+linhas por modelo por página. Exclusões vêm da tabela Tombstone, com o
+mesmo esquema de cursor em (deleted_at, id).
+
+O cursor é opaco para o cliente (JSON em base64 com a posição de cada
+modelo). Linhas gravadas nos últimos SYNC_LAG_SECONDS ficam para a próxima
+página: uma transação mais lenta pode commitar um updated_at "no passado"
+depois que o cursor já andou.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import sharding
+from .models import Tombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+TOMBSTONES = "tombstones"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def sync_models():
+    return [apps.get_model(label) for label in settings.SYNC_MODELS]
+
+
+def model_label(model):
+    return model._meta.label
+
+
+# ===== cursor =====
+def encode_cursor(as_of, positions):
+    data = {"at": as_of.isoformat(), "pos": {k: [ts.isoformat(), pk] for k, (ts, pk) in positions.items()}}
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """(as_of, {label: (datetime, id_str)}); cursor vazio = desde o início."""
+    if not value:
+        return None, {}
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        data = json.loads(raw)
+        as_of = parse_datetime(data["at"])
+        positions = {}
+        for label, (ts, pk) in data["pos"].items():
+            dt = parse_datetime(ts)
+            if dt is None:
+                raise ValueError
+            positions[label] = (dt, str(pk))
+        if as_of is None:
+            raise ValueError
+        return as_of, positions
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor("Cursor inválido.")
+
+
+def _after(qs, field, position):
+    if position is None:
+        return qs
+    ts, pk = position
+    return qs.filter(Q(**{f"{field}__gt": ts}) | Q(**{field: ts, "id__gt": pk}))
+
+
+def _fields(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def _page(qs, field, position, limit):
+    rows = list(_after(qs, field, position).order_by(field, "id")[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = (rows[-1][field], str(rows[-1]["id"]))
+    return rows, position, has_more
+
+
+# ===== página =====
+def changes(owner, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    {"changes": {label: [linhas]}, "deleted": [{model, id, deleted_at}],
+     "cursor", "has_more", "reset"}.
+    ``reset`` indica cursor mais velho que a retenção de tombstones: o
+    cliente deve descartar a cópia local e sincronizar do zero.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    as_of, positions = decode_cursor(cursor)
+    now = timezone.now()
+    upper = now - timedelta(seconds=settings.SYNC_LAG_SECONDS)
+    if as_of is not None and as_of < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        return {"changes": {}, "deleted": [], "cursor": "", "has_more": True, "reset": True}
+
+    out_changes, has_more = {}, False
+    for model in sync_models():
+        label = model_label(model)
+        qs = model.objects.filter(owner=owner, updated_at__lte=upper).values(*_fields(model))
+        rows, pos, more = _page(qs, "updated_at", positions.get(label), limit)
+        out_changes[label] = rows
+        has_more |= more
+        if pos is not None:
+            positions[label] = pos
+
+    qs = Tombstone.objects.filter(owner=owner, deleted_at__lte=upper).values("id", "model", "object_id", "deleted_at")
+    rows, pos, more = _page(qs, "deleted_at", positions.get(TOMBSTONES), limit)
+    has_more |= more
+    if pos is not None:
+        positions[TOMBSTONES] = pos
+    deleted = [{"model": r["model"], "id": r["object_id"], "deleted_at": r["deleted_at"]} for r in rows]
+
+    return {
+        "changes": out_changes,
+        "deleted": deleted,
+        "cursor": encode_cursor(upper, positions),
+        "has_more": has_more,
+        "reset": False,
+    }
+
+
+# ===== tombstones =====
+def record_deletion(sender, instance, origin=None, **kwargs):
+    """post_delete dos modelos sincronizados."""
+    # exclusão do próprio tenant: os tombstones iriam junto (e o FK falharia)
+    if isinstance(origin, apps.get_model(settings.AUTH_USER_MODEL)):
+        return
+    Tombstone.objects.create(owner_id=instance.owner_id, model=model_label(sender), object_id=instance.pk)
+
+
+def prune_tombstones(days=None):
+    days = settings.SYNC_TOMBSTONE_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    for alias in sharding.shard_aliases():
+        deleted += Tombstone.objects.using(alias).filter(deleted_at__lt=cutoff).delete()[0]
+    return deleted
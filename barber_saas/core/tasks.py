@@ -0,0 +1,23 @@
+from django.core.mail import EmailMultiAlternatives
+
+from . import purge
+from .models import PurgeJob
+from .queue import task
+
+
+@task(priority=10)
+def send_email(subject, body, from_email, to, html=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html:
+        message.attach_alternative(html, "text/html")
+    message.send()
+
+
+@task
+def run_purge(job_id):
+    # nova tentativa da fila: o job ficou "failed" na anterior, ou "running"
+    # se o worker morreu no meio (esse é retomado depois do timeout do lock)
+    PurgeJob.objects.filter(pk=job_id, status=PurgeJob.STATUS_FAILED).update(status=PurgeJob.STATUS_PENDING)
+    job = PurgeJob.objects.filter(pk=job_id).first()
+    if job is not None:
+        purge.run(job, reclaim=True)
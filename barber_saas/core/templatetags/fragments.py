@@ -0,0 +1,14 @@
+from django import template
+
+from core import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_rows(objs, template_name, name, prefix, deps=""):
+    """
+    {% cached_rows clients "cadastros/clients/_row.html" "c" "client" %}
+    ``deps``: FKs exibidas na linha, separadas por vírgula ("client,shop,staff").
+    """
+    return fragments.render_rows(objs, template_name, name, prefix, [d for d in deps.split(",") if d])
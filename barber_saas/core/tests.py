@@ -1,3 +1,508 @@
-from django.test import TestCase
+import gzip
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Template, Context
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.models import ApiToken
+from cadastros.models import Shop, Product, Client
+from .models import Tombstone, Task
+from . import queue, sync
+
+
+@override_settings(SYNC_LAG_SECONDS=0)
+class SyncTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.other = User.objects.create_user("other@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        Shop.objects.create(owner=self.other, name="Outra")
+        self.products = [
+            Product.objects.create(owner=self.owner, name=f"Serviço {i}", default_price=Decimal("10.00"))
+            for i in range(5)
+        ]
+
+    def _drain(self, cursor=None, limit=2):
+        pages = []
+        while True:
+            page = sync.changes(self.owner, cursor, limit)
+            pages.append(page)
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                return pages, cursor
+
+    def test_pages_are_bounded_and_cover_everything_once(self):
+        pages, cursor = self._drain()
+        products = [r["name"] for p in pages for r in p["changes"]["cadastros.Product"]]
+        self.assertEqual(sorted(products), [f"Serviço {i}" for i in range(5)])
+        self.assertTrue(all(len(p["changes"]["cadastros.Product"]) <= 2 for p in pages))
+        self.assertEqual([r["name"] for p in pages for r in p["changes"]["cadastros.Shop"]], ["Centro"])
+
+        # nada mudou: página vazia
+        page = sync.changes(self.owner, cursor)
+        self.assertEqual(page["changes"]["cadastros.Product"], [])
+
+        self.products[0].default_price = Decimal("12.00")
+        self.products[0].save()
+        page = sync.changes(self.owner, cursor)
+        self.assertEqual([r["id"] for r in page["changes"]["cadastros.Product"]], [self.products[0].pk])
+
+    def test_deletions_come_from_tombstones(self):
+        _, cursor = self._drain()
+        pk = self.products[1].pk
+        self.products[1].delete()
+        page = sync.changes(self.owner, cursor)
+        self.assertEqual([(d["model"], d["id"]) for d in page["deleted"]], [("cadastros.Product", pk)])
+
+    def test_deleting_tenant_does_not_write_tombstones(self):
+        Client.objects.create(owner=self.other, name="Ana", phone="11988887777")
+        self.other.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_old_cursor_requests_reset(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        old = sync.encode_cursor(timezone.now() - timedelta(days=365), {})
+        self.assertTrue(sync.changes(self.owner, old)["reset"])
+
+    def test_endpoint_requires_token_and_validates_cursor(self):
+        self.assertEqual(self.client.get("/api/sync/").status_code, 401)
+        _, key = ApiToken.issue(self.owner, "Tablet")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {key}"}
+        self.assertEqual(self.client.get("/api/sync/", {"cursor": "lixo"}, **auth).status_code, 400)
+        data = self.client.get("/api/sync/", {"limit": 10}, **auth).json()
+        self.assertEqual(len(data["changes"]["cadastros.Product"]), 5)
+        self.assertEqual([r["name"] for r in data["changes"]["cadastros.Shop"]], ["Centro"])
+
+
+SHARDS = ["default", "shard_1", "shard_2"]
+
+
+@override_settings(TENANT_SHARDS=SHARDS)
+class ShardingTests(TestCase):
+    databases = set(SHARDS)
+
+    def setUp(self):
+        from .models import TenantShard
+
+        User = get_user_model()
+        self.big = User.objects.create_user("big@example.com", "pass")
+        self.small = User.objects.create_user("small@example.com", "pass")
+        self.barber = User.objects.create_user("barber@example.com", "pass")
+        TenantShard.objects.create(owner=self.big, alias="shard_1")
+
+    def _count(self, model, alias, owner):
+        return model.objects.using(alias).filter(owner=owner).count()
+
+    def test_users_are_mirrored_to_every_shard(self):
+        for alias in SHARDS[1:]:
+            self.assertTrue(get_user_model().objects.using(alias).filter(email="barber@example.com").exists())
+
+    def test_router_uses_active_tenant_shard(self):
+        with sync.sharding.tenant(self.big):
+            shop = Shop.objects.create(owner=self.big, name="Matriz")
+            self.assertEqual(shop._state.db, "shard_1")
+            self.assertEqual(Shop.objects.filter(owner=self.big).count(), 1)
+        with sync.sharding.tenant(self.small):
+            Shop.objects.create(owner=self.small, name="Bairro")
+        self.assertEqual(self._count(Shop, "shard_1", self.big), 1)
+        self.assertEqual(self._count(Shop, "default", self.big), 0)
+        self.assertEqual(self._count(Shop, "default", self.small), 1)
+
+    def test_request_resolves_shard_from_logged_user(self):
+        with sync.sharding.tenant(self.big):
+            Shop.objects.create(owner=self.big, name="Matriz")
+        self.client.force_login(self.big)
+        self.assertContains(self.client.get("/cadastros/shops/"), "Matriz")
+        self.assertIsNone(sync.sharding.current_owner_id())  # middleware limpou
+
+    def test_decorated_tenant_atomic_does_not_share_state_between_threads(self):
+        import threading
+        import time
+        from django.db import connections
+
+        inside = threading.Barrier(2)
+        results = {}
+
+        @sync.sharding.tenant_atomic()
+        def work(delay):
+            inside.wait(timeout=5)  # as duas transações abertas ao mesmo tempo
+            time.sleep(delay)
+
+        def run(alias, delay):
+            try:
+                with sync.sharding.shard(alias):
+                    work(delay)
+                results[alias] = connections[alias].in_atomic_block
+            except Exception as e:
+                results[alias] = e
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=("shard_1", 0)), threading.Thread(target=run, args=("default", 0.1))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, {"shard_1": False, "default": False})
+
+    def test_move_tenant_copies_everything_and_clears_source(self):
+        from django.core.management import call_command
+        from cadastros.models import Staff, StaffMembership
+        from servicos.models import ServiceOrder, ServiceItem
+        from .models import TenantShard
+
+        with sync.sharding.tenant(self.big):
+            shop = Shop.objects.create(owner=self.big, name="Matriz")
+            staff = Staff.objects.create(owner=self.big, user=self.barber, full_name="Zé")
+            StaffMembership.objects.create(owner=self.big, staff=staff, shop=shop)
+            cut = Product.objects.create(owner=self.big, name="Corte", default_price=Decimal("40.00"))
+            client = Client.objects.create(owner=self.big, name="Ana", phone="11988887777")
+            order = ServiceOrder.objects.create(owner=self.big, shop=shop, staff=staff, client=client)
+            ServiceItem.objects.create(owner=self.big, order=order, product=cut)
+
+        from io import StringIO
+        call_command("move_tenant", "--owner", "big@example.com", "--to", "shard_2", stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(TenantShard.objects.get(owner=self.big).alias, "shard_2")
+        for model in (Shop, Staff, StaffMembership, Product, Client, ServiceOrder, ServiceItem):
+            self.assertEqual(self._count(model, "shard_1", self.big), 0, model)
+            self.assertEqual(self._count(model, "shard_2", self.big), 1, model)
+        with sync.sharding.tenant(self.big):
+            moved = ServiceOrder.objects.select_related("staff__user").get()
+            self.assertEqual(moved.total_amount, Decimal("40.00"))
+            self.assertEqual(moved.staff.user.email, "barber@example.com")
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        from cadastros.models import ProductPrice, Staff, StaffMembership
+        from servicos.models import ServiceOrder, ServiceItem
+
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.other = User.objects.create_user("other@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.keep = Shop.objects.create(owner=self.owner, name="Bairro")
+        cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        ProductPrice.objects.create(owner=self.owner, product=cut, shop=self.shop, price=Decimal("45.00"))
+        barber = User.objects.create_user("ana@example.com", "pass")
+        staff = Staff.objects.create(owner=self.owner, user=barber, full_name="Ana")
+        StaffMembership.objects.create(owner=self.owner, staff=staff, shop=self.shop)
+        self.customer = Client.objects.create(owner=self.owner, name="João", phone="85999990000")
+        for shop in (self.shop, self.shop, self.shop, self.keep):
+            order = ServiceOrder.objects.create(owner=self.owner, shop=shop, client=self.customer)
+            ServiceItem.objects.create(owner=self.owner, order=order, product=cut, qty=1)
+        other_shop = Shop.objects.create(owner=self.other, name="Outra")
+        ServiceOrder.objects.create(owner=self.other, shop=other_shop)
+
+    def test_shop_delete_is_scheduled_then_purged_in_batches(self):
+        from cadastros.models import ProductPrice, StaffMembership
+        from servicos.models import ServiceOrder, ServiceItem
+        from . import purge
+        from .models import PurgeJob
+
+        self.client.force_login(self.owner)
+        resp = self.client.post(f"/cadastros/shops/{self.shop.pk}/delete/", HTTP_HX_REQUEST="true")
+        self.assertEqual(resp.status_code, 200)
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.is_active)  # nada apagado no request
+        self.assertNotContains(self.client.get("/cadastros/shops/"), "Centro")
+
+        self.assertEqual(purge.run_pending(batch_size=2), 1)
+        job = PurgeJob.objects.get()
+        self.assertEqual((job.status, job.done, job.total), (PurgeJob.STATUS_DONE, 8, 8))
+        self.assertFalse(Shop.objects.filter(pk=self.shop.pk).exists())
+        self.assertEqual(ServiceOrder.objects.filter(owner=self.owner).count(), 1)
+        self.assertEqual(ServiceItem.objects.filter(owner=self.owner).count(), 1)
+        self.assertFalse(ProductPrice.objects.exists())
+        self.assertFalse(StaffMembership.objects.exists())
+        self.assertEqual(ServiceOrder.objects.filter(owner=self.other).count(), 1)
+        self.assertEqual(Tombstone.objects.filter(model="servicos.ServiceOrder").count(), 3)
+        self.assertTrue(Tombstone.objects.filter(model="cadastros.Shop", object_id=self.shop.pk).exists())
+
+    def test_client_delete_unlinks_orders(self):
+        from servicos.models import ServiceOrder
+        from . import purge
+        from .models import PurgeJob
+
+        job = purge.schedule(self.owner, PurgeJob.KIND_CLIENT, self.customer)
+        self.assertEqual(purge.schedule(self.owner, PurgeJob.KIND_CLIENT, self.customer), job)
+        self.assertTrue(purge.run(job))
+        self.assertFalse(Client.objects.filter(pk=self.customer.pk).exists())
+        self.assertEqual(ServiceOrder.objects.filter(owner=self.owner, client=None).count(), 4)
+
+    def test_job_of_a_dead_worker_is_resumed_by_the_requeued_task(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import purge
+        from .models import PurgeJob
+
+        job = purge.schedule(self.owner, PurgeJob.KIND_SHOP, self.shop)
+        # o worker pegou o job e morreu antes de terminar
+        PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.STATUS_RUNNING, started_at=timezone.now())
+        queue.work()
+        job.refresh_from_db()
+        self.assertEqual(job.status, PurgeJob.STATUS_RUNNING)  # ainda dentro do timeout: pode estar vivo
+
+        PurgeJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        queue.enqueue("core.run_purge", job.pk)  # o requeue_stale devolve a tarefa
+        queue.work()
+        job.refresh_from_db()
+        self.assertEqual(job.status, PurgeJob.STATUS_DONE)
+        self.assertFalse(Shop.objects.filter(pk=self.shop.pk).exists())
+        self.assertNotIn(str(self.shop.pk), purge.pending_ids(self.owner, PurgeJob.KIND_SHOP))
+
+    def test_tenant_purge_removes_all_rows_and_user(self):
+        from django.core.management import call_command
+        from servicos.models import ServiceOrder
+
+        call_command("purge_tenant", "--owner", "owner@example.com", "--now", stdout=StringIO())
+        self.assertFalse(get_user_model().objects.filter(email="owner@example.com").exists())
+        self.assertFalse(Shop.objects.filter(owner_id=self.owner.pk).exists())
+        self.assertFalse(ServiceOrder.objects.filter(owner_id=self.owner.pk).exists())
+        self.assertEqual(ServiceOrder.objects.filter(owner=self.other).count(), 1)
+
+
+_calls = []
+
+
+@queue.task(name="tests.flaky", max_attempts=2)
+def flaky(n):
+    _calls.append(n)
+    if n < 0:
+        raise ValueError("falhou")
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        _calls.clear()
+
+    def test_enqueue_runs_by_priority(self):
+        queue.enqueue(flaky, 1)
+        queue.enqueue(flaky, 2, priority=5)
+        queue.enqueue(flaky, 3, delay=60)  # ainda não venceu
+        self.assertEqual(queue.work(), 2)
+        self.assertEqual(_calls, [2, 1])
+        self.assertEqual(Task.objects.filter(status=Task.STATUS_DONE).count(), 2)
+
+    def test_claim_is_exclusive(self):
+        queue.enqueue(flaky, 1)
+        self.assertEqual(len(queue.claim("a", 5)), 1)
+        self.assertEqual(queue.claim("b", 5), [])
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        t = queue.enqueue(flaky, -1)
+        queue.work()
+        t.refresh_from_db()
+        self.assertEqual((t.status, t.attempts), (Task.STATUS_QUEUED, 1))
+        self.assertGreater(t.run_at, timezone.now() + timedelta(seconds=20))
+        self.assertIn("ValueError", t.last_error)
+
+        Task.objects.filter(pk=t.pk).update(run_at=timezone.now())
+        queue.work()
+        t.refresh_from_db()
+        self.assertEqual((t.status, t.attempts), (Task.STATUS_FAILED, 2))
+
+    def test_stale_running_task_is_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        t = queue.enqueue(flaky, 1)
+        queue.claim("morto")
+        Task.objects.filter(pk=t.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(queue.work(), 1)
+
+    def test_heartbeat_keeps_long_task_from_being_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        t = queue.enqueue(flaky, 1)
+        queue.claim("vivo")
+        Task.objects.filter(pk=t.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.heartbeat("outro", [t.pk]), 0)  # só o dono renova
+        self.assertEqual(queue.heartbeat("vivo", [t.pk]), 1)
+        self.assertEqual(queue.requeue_stale(), 0)
+        t.refresh_from_db()
+        self.assertEqual((t.status, t.locked_by), (Task.STATUS_RUNNING, "vivo"))
+
+    def test_password_reset_email_is_queued(self):
+        from django.core import mail
+
+        get_user_model().objects.create_user("owner@example.com", "pass")
+        self.client.post("/accounts/password_reset/", {"email": "owner@example.com"})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, "core.send_email")
+        queue.work()
+        self.assertEqual(mail.outbox[0].to, ["owner@example.com"])
+
+
+@queue.task(name="tests.slow", max_attempts=1)
+def slow(seconds):
+    import time
+    time.sleep(seconds)
+
+
+class WorkerHeartbeatTests(TransactionTestCase):
+    """Worker de verdade (threads), com commits reais."""
+
+    @override_settings(TASK_HEARTBEAT_SECONDS=0)
+    def test_worker_renews_lock_while_task_runs(self):
+        from unittest import mock
+
+        t = queue.enqueue(slow, 0.3)
+        with mock.patch.object(queue, "heartbeat", wraps=queue.heartbeat) as beat:
+            queue.run_worker(concurrency=1, poll=0.05, worker="w1", once=True)
+        t.refresh_from_db()
+        self.assertEqual(t.status, Task.STATUS_DONE)
+        self.assertIn(mock.call("w1", [t.pk]), beat.call_args_list)
+
+
+@override_settings(TENANT_LRU_SINGLE_PROCESS=True)
+class LocalCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import localcache
+
+        cache.clear()
+        localcache.clear()
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+
+    def test_lru_is_bounded_and_follows_tenant_version(self):
+        from . import localcache
+
+        lru = localcache.TenantLRU(maxsize=2)
+        loads = []
+        load = lambda value: (lambda: loads.append(value) or value)
+        self.assertEqual(lru.get(1, "a", load("a1")), "a1")
+        self.assertEqual(lru.get(1, "a", load("a2")), "a1")
+        lru.get(1, "b", load("b"))
+        lru.get(1, "c", load("c"))
+        self.assertEqual(len(lru), 2)  # "a" era o menos usado
+
+        localcache.bump(1)  # outro worker gravou
+        self.assertEqual(lru.get(1, "b", load("b2")), "b2")
+        self.assertEqual(loads, ["a1", "b", "c", "b2"])
+
+    def test_shop_list_is_invalidated_on_write(self):
+        from cadastros import lookups
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Shop.objects.create(owner=self.owner, name="Centro")
+        self.assertEqual([s.name for s in lookups.shops(self.owner.pk)], ["Centro"])
+        with self.assertNumQueries(0):
+            lookups.shops(self.owner.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Shop.objects.create(owner=self.owner, name="Bairro")
+            # a versão só muda no commit: até lá o LRU não guarda linhas não confirmadas como novas
+            self.assertEqual([s.name for s in lookups.shops(self.owner.pk)], ["Centro"])
+        self.assertEqual([s.name for s in lookups.shops(self.owner.pk)], ["Bairro", "Centro"])
+
+    @override_settings(TENANT_LRU_SINGLE_PROCESS=False)
+    def test_lru_is_off_when_the_version_cache_is_per_process(self):
+        from cadastros import lookups
+
+        Shop.objects.create(owner=self.owner, name="Centro")
+        lookups.shops(self.owner.pk)
+        with self.assertNumQueries(1):  # LocMem: o bump do run_worker não chegaria aqui
+            lookups.shops(self.owner.pk)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches["fragments"].clear()
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        for i in range(3):
+            Client.objects.create(owner=self.owner, name=f"C{i}", phone=f"8599999000{i}")
+
+    def _render(self):
+        from unittest import mock
+        from django.template.loader import render_to_string as real
+        from . import fragments
+
+        with mock.patch.object(fragments, "render_to_string", side_effect=real) as rendered:
+            html = fragments.render_rows(Client.objects.order_by("name"), "cadastros/clients/_row.html", "c", "client")
+        return html, rendered.call_count
+
+    def test_only_changed_rows_are_rendered(self):
+        html, count = self._render()
+        self.assertEqual(count, 3)
+        self.assertEqual(self._render(), (html, 0))
+
+        changed = Client.objects.get(name="C1")
+        changed.name = "C1 novo"
+        changed.save()
+        html, count = self._render()
+        self.assertEqual(count, 1)
+        self.assertIn("C1 novo", html)
+        self.assertIn("C2", html)
+
+
+class BoostedNavigationTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        self.client.force_login(self.owner)
+
+    def test_boosted_request_renders_only_page_frame(self):
+        full = self.client.get("/cadastros/clients/")
+        self.assertContains(full, "<!DOCTYPE html>")
+        self.assertContains(full, 'id="sidebarNav"')
+
+        boosted = self.client.get("/cadastros/clients/", HTTP_HX_REQUEST="true", HTTP_HX_BOOSTED="true")
+        self.assertNotContains(boosted, "<!DOCTYPE html>")
+        self.assertNotContains(boosted, 'id="sidebarNav"')
+        self.assertNotContains(boosted, 'id="appModal"')
+        self.assertContains(boosted, 'id="pageFrame"')
+        self.assertContains(boosted, "<title>")
+        self.assertIn("HX-Boosted", boosted["Vary"])
+        self.assertLess(len(boosted.content), len(full.content))
+
+
+class StaticAssetsTests(TestCase):
+    def test_layout_uses_local_assets(self):
+        self.client.force_login(get_user_model().objects.create_user("owner@example.com", "pass"))
+        page = self.client.get("/cadastros/clients/")
+        self.assertNotContains(page, "cdn.jsdelivr.net")
+        self.assertNotContains(page, "unpkg.com")
+        self.assertContains(page, "/static/js/app.js")
+        self.assertNotContains(page, "function refreshSidebarActive")
+
+    def test_collectstatic_hashes_compresses_and_serves_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "core.storage.CompressedManifestStaticFilesStorage"},
+            },
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed = staticfiles_storage.stored_name("js/app.js")
+            self.assertRegex(hashed, r"^js/app\.[0-9a-f]{12}\.js$")
+            original = (Path(root) / "js/app.js").read_bytes()
+            self.assertEqual(gzip.decompress((Path(root) / (hashed + ".gz")).read_bytes()), original)
+            self.assertIn(hashed, Template("{% load static %}{% static 'js/app.js' %}").render(Context()))
+
+            response = self.client.get(f"/static/{hashed}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("immutable", response["Cache-Control"])
+            self.assertIn("max-age=31536000", response["Cache-Control"])
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), original)
+
+            plain = self.client.get("/static/js/app.js")
+            self.assertFalse(plain.has_header("Content-Encoding"))
+            self.assertNotIn("immutable", plain["Cache-Control"])
+            self.assertEqual(self.client.get("/static/js/nao-existe.js").status_code, 404)
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import SyncView
+
+app_name = "core"
+
+urlpatterns = [
+    path("sync/", SyncView.as_view(), name="sync"),
+]
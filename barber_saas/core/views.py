@@ -1,3 +1,83 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views import View
+from django.views.static import was_modified_since
+
+from accounts.tokens import TokenRequiredMixin
+from . import sync
+
+
+class SyncView(TokenRequiredMixin, View):
+    """
+    GET ?cursor=<opaco>&limit=<n>: alterações do tenant desde o cursor.
+    O cliente repete com o cursor devolvido enquanto ``has_more`` for true.
+    """
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get("limit", sync.DEFAULT_LIMIT))
+        except ValueError:
+            limit = sync.DEFAULT_LIMIT
+        try:
+            page = sync.changes(request.user, request.GET.get("cursor"), limit)
+        except sync.InvalidCursor as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        return JsonResponse(page)
+
+
+# ===== estáticos (core.storage) =====
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}(\.[^./]+)$")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # preferência, se o cliente aceitar
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+class StaticView(View):
+    """
+    Serve o STATIC_ROOT quando não há proxy na frente (DEBUG=False). Nome com
+    hash do manifest = cache de um ano ``immutable``; a variante .br/.gz gerada
+    no collectstatic vai quando o Accept-Encoding permite.
+    """
+
+    def get(self, request, path):
+        try:
+            full = safe_join(settings.STATIC_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404(path)
+        if not os.path.isfile(full):
+            raise Http404(path)
+        stat = os.stat(full)
+        if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type, encoding = mimetypes.guess_type(full)
+        served, accept = full, request.headers.get("Accept-Encoding", "")
+        if encoding is None:
+            for name, ext in ENCODINGS:
+                if name in accept and os.path.isfile(full + ext):
+                    served, encoding = full + ext, name
+                    break
+
+        response = FileResponse(open(served, "rb"), content_type=content_type or "application/octet-stream")
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if self.is_hashed(path):
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=60)
+        return response
+
+    @staticmethod
+    def is_hashed(path):
+        original = HASHED_NAME.sub(r"\1", path)
+        return original != path and getattr(staticfiles_storage, "hashed_files", {}).get(original) == path
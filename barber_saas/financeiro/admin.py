@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import CommissionClosing, CommissionSnapshot
+
+
+class CommissionSnapshotInline(admin.TabularInline):
+    model = CommissionSnapshot
+    extra = 0
+    can_delete = False
+    readonly_fields = ("staff", "staff_name", "commission_percent", "orders", "revenue", "commission_amount")
+
+
+@admin.register(CommissionClosing)
+class CommissionClosingAdmin(admin.ModelAdmin):
+    list_display = ("month", "owner", "closed_at", "closed_by")
+    inlines = [CommissionSnapshotInline]
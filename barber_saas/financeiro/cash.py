@@ -0,0 +1,114 @@
+"""
+Fechamento de caixa diário por loja.
+
+Uma query agrupada por forma de pagamento sobre as comandas concluídas do
+dia (índice shop+status+finished_at), mais a mesma sobre o arquivo
+(servicos.archive), somadas em Python; o resultado é gravado em
+CashClosing + CashClosingLine, que passam a ser a fonte dos relatórios de caixa.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, When
+from django.utils import timezone
+
+from core.sharding import tenant_atomic
+from servicos.models import ServiceOrder, ArchivedServiceOrder
+from .models import CashClosing, CashClosingLine
+
+PAYMENT_LABELS = dict(ServiceOrder.PAYMENT_CHOICES)
+
+
+def _day_bounds(day):
+    lo = timezone.make_aware(datetime.combine(day, time.min))
+    return lo, lo + timedelta(days=1)
+
+
+def day_totals(owner, shop_id, day):
+    """
+    Totais do dia por forma de pagamento:
+    [{payment_method, label, orders, total_amount, received, discount}].
+    ``received`` = amount_paid quando informado, senão total_amount.
+    """
+    lo, hi = _day_bounds(day)
+    received = Case(
+        When(amount_paid__gt=0, then=F("amount_paid")),
+        default=F("total_amount"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    totals = defaultdict(lambda: {"orders": 0, "total_amount": Decimal("0.00"), "received": Decimal("0.00"),
+                                  "discount": Decimal("0.00")})
+    for model in (ServiceOrder, ArchivedServiceOrder):
+        rows = (
+            model.objects.filter(owner=owner, shop_id=shop_id, status=ServiceOrder.STATUS_DONE)
+            .filter(Q(finished_at__gte=lo, finished_at__lt=hi)
+                    | Q(finished_at__isnull=True, created_at__gte=lo, created_at__lt=hi))
+            .values("payment_method")
+            .annotate(
+                orders_count=Count("id"), total_sum=Sum("total_amount"),
+                received_sum=Sum(received), discount_sum=Sum("discount_amount"),
+            )
+            .order_by()
+        )
+        for r in rows:
+            acc = totals[r["payment_method"]]
+            acc["orders"] += r["orders_count"]
+            acc["total_amount"] += r["total_sum"] or Decimal("0.00")
+            acc["received"] += r["received_sum"] or Decimal("0.00")
+            acc["discount"] += r["discount_sum"] or Decimal("0.00")
+    return [
+        {"payment_method": method, "label": PAYMENT_LABELS.get(method, "Não informado"), **acc}
+        for method, acc in sorted(totals.items())
+    ]
+
+
+def expected_cash(lines):
+    return sum((l["received"] for l in lines if l["payment_method"] == ServiceOrder.PAY_CASH), Decimal("0.00"))
+
+
+@tenant_atomic()
+def close_day(owner, shop, day, counted_cash, notes="", closed_by=None):
+    """Grava o fechamento do dia (um por loja/dia)."""
+    if day > timezone.localdate():
+        raise ValidationError("Não é possível fechar o caixa de um dia futuro.")
+    if CashClosing.objects.filter(shop=shop, day=day).exists():
+        raise ValidationError("O caixa deste dia já foi fechado.")
+    lines = day_totals(owner, shop.pk, day)
+    expected = expected_cash(lines)
+    try:
+        closing = CashClosing.objects.create(
+            owner=owner, shop=shop, day=day,
+            orders=sum(l["orders"] for l in lines),
+            total_amount=sum((l["total_amount"] for l in lines), Decimal("0.00")),
+            expected_cash=expected,
+            counted_cash=counted_cash,
+            difference=counted_cash - expected,
+            notes=notes,
+            closed_by=closed_by,
+        )
+    except IntegrityError:
+        # outro fechamento da mesma loja/dia gravou entre o exists() e o INSERT
+        raise ValidationError("O caixa deste dia já foi fechado.")
+    CashClosingLine.objects.bulk_create([
+        CashClosingLine(
+            owner=owner, closing=closing, payment_method=l["payment_method"], orders=l["orders"],
+            total_amount=l["total_amount"], received=l["received"], discount=l["discount"],
+        )
+        for l in lines
+    ])
+    return closing
+
+
+def closing_history(owner, shop_id=None, start=None, end=None):
+    """Fechamentos gravados (com linhas) — não toca nas comandas."""
+    qs = CashClosing.objects.filter(owner=owner).select_related("shop").prefetch_related("lines")
+    if shop_id:
+        qs = qs.filter(shop_id=shop_id)
+    if start:
+        qs = qs.filter(day__gte=start)
+    if end:
+        qs = qs.filter(day__lte=end)
+    return qs
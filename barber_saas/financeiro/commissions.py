@@ -0,0 +1,118 @@
+"""
+Extrato de comissões por profissional.
+
+Mês aberto: uma query agrupada por staff em cada tabela de comandas
+concluídas (a quente e a de arquivo, ver servicos.archive), somadas por
+profissional. Mês fechado: lido dos CommissionSnapshot gravados no fechamento.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.sharding import tenant_atomic
+from servicos.models import ServiceOrder, ArchivedServiceOrder
+from .models import CommissionClosing, CommissionSnapshot
+
+CENTS = Decimal("0.01")
+
+
+@dataclass
+class StatementLine:
+    staff_id: object
+    staff_name: str
+    commission_percent: Decimal
+    orders: int
+    revenue: Decimal
+    commission_amount: Decimal
+
+
+def month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _month_bounds(month):
+    lo = timezone.make_aware(datetime.combine(month, time.min))
+    hi = timezone.make_aware(datetime.combine(_next_month(month), time.min))
+    return lo, hi
+
+
+def compute_statement(owner, month):
+    """Calcula o extrato de um mês a partir das comandas (uma query por tabela)."""
+    lo, hi = _month_bounds(month_start(month))
+    keys = ("staff_id", "staff__full_name", "staff__user__email", "staff__commission_percent")
+    totals = defaultdict(lambda: [Decimal("0.00"), 0])
+    for model in (ServiceOrder, ArchivedServiceOrder):
+        rows = (
+            model.objects.filter(owner=owner, status=ServiceOrder.STATUS_DONE, staff__isnull=False)
+            .annotate(biz_at=Coalesce("finished_at", "created_at"))
+            .filter(biz_at__gte=lo, biz_at__lt=hi)
+            .values(*keys)
+            .annotate(revenue=Sum("total_amount"), orders_count=Count("id"))
+            .order_by()
+        )
+        for r in rows:
+            acc = totals[tuple(r[k] for k in keys)]
+            acc[0] += r["revenue"] or Decimal("0.00")
+            acc[1] += r["orders_count"]
+    lines = []
+    for (staff_id, full_name, email, percent), (revenue, orders) in sorted(totals.items(), key=lambda i: i[0][1] or ""):
+        percent = percent or Decimal("0.00")
+        lines.append(StatementLine(
+            staff_id=staff_id,
+            staff_name=full_name or email or "",
+            commission_percent=percent,
+            orders=orders,
+            revenue=revenue,
+            commission_amount=(revenue * percent / 100).quantize(CENTS, rounding=ROUND_HALF_UP),
+        ))
+    return lines
+
+
+def get_statement(owner, month):
+    """(closing ou None, linhas) — meses fechados nunca tocam nas comandas."""
+    month = month_start(month)
+    closing = CommissionClosing.objects.filter(owner=owner, month=month).first()
+    if closing is None:
+        return None, compute_statement(owner, month)
+    lines = [
+        StatementLine(s.staff_id, s.staff_name, s.commission_percent, s.orders, s.revenue, s.commission_amount)
+        for s in closing.lines.all()
+    ]
+    return closing, lines
+
+
+@tenant_atomic()
+def close_month(owner, month, closed_by=None):
+    """Congela o extrato do mês em snapshots imutáveis."""
+    month = month_start(month)
+    # o mês corrente ainda recebe comandas: só meses encerrados podem ser congelados
+    if month >= month_start(timezone.localdate()):
+        raise ValidationError("Só é possível fechar meses já encerrados.")
+    if CommissionClosing.objects.filter(owner=owner, month=month).exists():
+        raise ValidationError("Este mês já está fechado.")
+
+    try:
+        closing = CommissionClosing.objects.create(owner=owner, month=month, closed_by=closed_by)
+    except IntegrityError:
+        # outro fechamento do mesmo mês gravou entre o exists() e o INSERT
+        raise ValidationError("Este mês já está fechado.")
+    CommissionSnapshot.objects.bulk_create([
+        CommissionSnapshot(
+            owner=owner, closing=closing, staff_id=line.staff_id, staff_name=line.staff_name,
+            commission_percent=line.commission_percent, orders=line.orders,
+            revenue=line.revenue, commission_amount=line.commission_amount,
+        )
+        for line in compute_statement(owner, month)
+    ])
+    return closing
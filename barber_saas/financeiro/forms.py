@@ -0,0 +1,10 @@
+from django import forms
+
+from cadastros.forms import CommaDecimalField
+
+
+class CashClosingForm(forms.Form):
+    counted_cash = CommaDecimalField(label="Dinheiro contado", min_value=0,
+                                     widget=forms.TextInput(attrs={"class": "form-control", "inputmode": "decimal"}))
+    notes = forms.CharField(label="Observações", required=False,
+                            widget=forms.Textarea(attrs={"class": "form-control", "rows": 2}))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:58
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_client'),
+        ('financeiro', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashClosing',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('expected_cash', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('counted_cash', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('difference', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('notes', models.TextField(blank=True)),
+                ('closed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to=settings.AUTH_USER_MODEL)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cash_closings', to='cadastros.shop')),
+            ],
+            options={
+                'ordering': ('-day',),
+            },
+        ),
+        migrations.CreateModel(
+            name='CashClosingLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payment_method', models.CharField(blank=True, choices=[('cash', 'Dinheiro'), ('card', 'Cartão'), ('pix', 'PIX'), ('transfer', 'Transferência'), ('other', 'Outro')], max_length=16)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('received', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('discount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('closing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='financeiro.cashclosing')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('payment_method',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cashclosing',
+            index=models.Index(fields=['owner', 'shop', 'day'], name='financeiro__owner_i_63195c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cashclosing',
+            unique_together={('shop', 'day')},
+        ),
+    ]
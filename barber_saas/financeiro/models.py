@@ -0,0 +1,93 @@
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+from core.models import TenantOwnedModel
+from servicos.models import ServiceOrder
+
+
+# ===== Comissões =====
+class CommissionClosing(TenantOwnedModel):
+    """
+    Fechamento mensal de comissões. Depois de fechado, o mês é lido apenas
+    dos snapshots (nunca recalculado das comandas).
+    """
+    month = models.DateField()  # sempre o dia 1 do mês
+    closed_at = models.DateTimeField(default=timezone.now)
+    closed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                                  on_delete=models.SET_NULL, related_name="+")
+
+    class Meta:
+        ordering = ("-month",)
+        unique_together = [("owner", "month")]
+
+    def __str__(self):
+        return f"Comissões {self.month:%m/%Y}"
+
+
+class CommissionSnapshot(TenantOwnedModel):
+    """
+    Linha congelada do extrato: nome e percentual copiados do Staff no
+    fechamento, para que edições posteriores não reescrevam o histórico.
+    """
+    closing = models.ForeignKey(CommissionClosing, on_delete=models.CASCADE, related_name="lines")
+    staff = models.ForeignKey("cadastros.Staff", null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    staff_name = models.CharField(max_length=150)
+    commission_percent = models.DecimalField(max_digits=5, decimal_places=2)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    commission_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ("staff_name",)
+        indexes = [models.Index(fields=["closing", "staff"])]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Snapshot de comissão é imutável.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.staff_name}: {self.commission_amount}"
+
+
+# ===== Caixa =====
+class CashClosing(TenantOwnedModel):
+    """
+    Fechamento de caixa diário por loja. Relatórios históricos de caixa
+    leem daqui, sem voltar às comandas.
+    """
+    shop = models.ForeignKey("cadastros.Shop", on_delete=models.CASCADE, related_name="cash_closings")
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    expected_cash = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    counted_cash = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    difference = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    notes = models.TextField(blank=True)
+    closed_at = models.DateTimeField(default=timezone.now)
+    closed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                                  on_delete=models.SET_NULL, related_name="+")
+
+    class Meta:
+        ordering = ("-day",)
+        unique_together = [("shop", "day")]
+        indexes = [models.Index(fields=["owner", "shop", "day"])]
+
+    def __str__(self):
+        return f"Caixa {self.shop} {self.day:%d/%m/%Y}"
+
+
+class CashClosingLine(TenantOwnedModel):
+    """Totais de uma forma de pagamento no fechamento."""
+    closing = models.ForeignKey(CashClosing, on_delete=models.CASCADE, related_name="lines")
+    payment_method = models.CharField(max_length=16, choices=ServiceOrder.PAYMENT_CHOICES, blank=True)
+    orders = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    received = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ("payment_method",)
@@ -0,0 +1,166 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+
+from cadastros.models import Shop, Staff
+from servicos.models import ServiceOrder
+
+from . import commissions
+from .models import CommissionClosing
+
+
+class CommissionStatementTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        barber = User.objects.create_user("barber@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.staff = Staff.objects.create(owner=self.owner, user=barber, full_name="João",
+                                          commission_percent=Decimal("40.00"))
+        self.month = date(2025, 3, 1)
+        finished = timezone.make_aware(datetime(2025, 3, 15, 12))
+        for total in ("100.00", "50.00"):
+            ServiceOrder.objects.create(owner=self.owner, shop=self.shop, staff=self.staff,
+                                        status=ServiceOrder.STATUS_DONE, finished_at=finished,
+                                        total_amount=Decimal(total))
+        ServiceOrder.objects.create(owner=self.owner, shop=self.shop, staff=self.staff,
+                                    status=ServiceOrder.STATUS_CANCELED, finished_at=finished,
+                                    total_amount=Decimal("999.00"))
+
+    def test_open_month_is_one_grouped_query_per_table(self):
+        with self.assertNumQueries(2):
+            lines = commissions.compute_statement(self.owner, self.month)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].revenue, Decimal("150.00"))
+        self.assertEqual(lines[0].commission_amount, Decimal("60.00"))
+
+    def test_archived_orders_count_in_the_statement(self):
+        from servicos import archive
+
+        archive.archive(cutoff=timezone.make_aware(datetime(2025, 4, 1)), owner=self.owner)
+        self.assertFalse(ServiceOrder.objects.filter(status=ServiceOrder.STATUS_DONE).exists())
+        lines = commissions.compute_statement(self.owner, self.month)
+        self.assertEqual((lines[0].orders, lines[0].revenue), (2, Decimal("150.00")))
+
+    def test_closed_month_is_frozen(self):
+        commissions.close_month(self.owner, self.month)
+        self.staff.commission_percent = Decimal("10.00")
+        self.staff.save()
+
+        closing, lines = commissions.get_statement(self.owner, self.month)
+        self.assertIsNotNone(closing)
+        self.assertEqual(lines[0].commission_percent, Decimal("40.00"))
+        self.assertEqual(lines[0].commission_amount, Decimal("60.00"))
+
+        with self.assertRaises(ValidationError):
+            commissions.close_month(self.owner, self.month)
+        snapshot = closing.lines.get()
+        snapshot.revenue = Decimal("1.00")
+        with self.assertRaises(ValidationError):
+            snapshot.save()
+
+    def test_current_month_cannot_be_closed(self):
+        with self.assertRaises(ValidationError):
+            commissions.close_month(self.owner, timezone.localdate())
+        self.assertFalse(CommissionClosing.objects.exists())
+
+    def test_concurrent_close_is_a_validation_error(self):
+        from unittest import mock
+
+        commissions.close_month(self.owner, self.month)
+        # o outro request passou pelo exists() antes deste gravar
+        with mock.patch.object(commissions.CommissionClosing.objects, "filter") as filter_:
+            filter_.return_value.exists.return_value = False
+            with self.assertRaisesMessage(ValidationError, "já está fechado"):
+                commissions.close_month(self.owner, self.month)
+        self.assertEqual(CommissionClosing.objects.count(), 1)
+
+    def test_statement_view(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/financeiro/comissoes/", {"month": "2025-03"})
+        self.assertContains(resp, "João")
+        self.assertContains(resp, "60.00")
+
+
+class CashClosingTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.day = date(2025, 3, 10)
+        at = timezone.make_aware(datetime(2025, 3, 10, 14))
+        for method, total, paid in (("cash", "50.00", "0"), ("cash", "30.00", "30.00"), ("pix", "40.00", "40.00")):
+            ServiceOrder.objects.create(owner=self.owner, shop=self.shop, status=ServiceOrder.STATUS_DONE,
+                                        finished_at=at, payment_method=method,
+                                        total_amount=Decimal(total), amount_paid=Decimal(paid))
+
+    def test_day_totals_grouped_by_payment_method(self):
+        from . import cash
+        with self.assertNumQueries(2):
+            lines = cash.day_totals(self.owner, self.shop.pk, self.day)
+        by_method = {l["payment_method"]: l for l in lines}
+        self.assertEqual(by_method["cash"]["orders"], 2)
+        self.assertEqual(cash.expected_cash(lines), Decimal("80.00"))
+
+    def test_day_totals_include_archived_orders(self):
+        from servicos import archive
+        from . import cash
+
+        # metade do dia arquivada, metade ainda na tabela quente
+        ServiceOrder.objects.filter(payment_method="pix").update(finished_at=timezone.make_aware(datetime(2025, 3, 10, 9)))
+        self.assertEqual(archive.archive(cutoff=timezone.make_aware(datetime(2025, 3, 10, 12)), owner=self.owner), 1)
+        lines = cash.day_totals(self.owner, self.shop.pk, self.day)
+        self.assertEqual(sum(l["total_amount"] for l in lines), Decimal("120.00"))
+        self.assertEqual(cash.expected_cash(lines), Decimal("80.00"))
+
+    def test_close_day_stores_reconciliation(self):
+        from . import cash
+        closing = cash.close_day(self.owner, self.shop, self.day, Decimal("75.00"))
+        self.assertEqual(closing.total_amount, Decimal("120.00"))
+        self.assertEqual(closing.difference, Decimal("-5.00"))
+        self.assertEqual(closing.lines.count(), 2)
+        with self.assertRaises(ValidationError):
+            cash.close_day(self.owner, self.shop, self.day, Decimal("80.00"))
+
+    def test_future_day_cannot_be_closed(self):
+        from datetime import timedelta
+        from . import cash
+        with self.assertRaisesMessage(ValidationError, "dia futuro"):
+            cash.close_day(self.owner, self.shop, timezone.localdate() + timedelta(days=1), Decimal("0"))
+
+    def test_concurrent_close_is_a_validation_error(self):
+        from unittest import mock
+        from . import cash
+        from .models import CashClosing
+
+        cash.close_day(self.owner, self.shop, self.day, Decimal("80.00"))
+        # o outro request passou pelo exists() antes deste gravar
+        with mock.patch.object(cash.CashClosing.objects, "filter") as filter_:
+            filter_.return_value.exists.return_value = False
+            with self.assertRaisesMessage(ValidationError, "já foi fechado"):
+                cash.close_day(self.owner, self.shop, self.day, Decimal("80.00"))
+        self.assertEqual(CashClosing.objects.count(), 1)
+
+    def test_staff_role_cannot_close_the_register(self):
+        from cadastros.models import StaffMembership
+
+        barber = get_user_model().objects.create_user("caixa@example.com", "pass")
+        staff = Staff.objects.create(owner=self.owner, user=barber, full_name="Caixa")
+        StaffMembership.objects.create(owner=self.owner, staff=staff, shop=self.shop, role=StaffMembership.ROLE_STAFF)
+        self.client.force_login(barber)
+        resp = self.client.post(f"/financeiro/caixa/?shop={self.shop.pk}",
+                                {"day": "2025-03-10", "counted_cash": "80,00"}, HTTP_HX_REQUEST="true")
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(self.client.get("/financeiro/caixa/").status_code, 403)
+
+    def test_close_view(self):
+        self.client.force_login(self.owner)
+        resp = self.client.post(f"/financeiro/caixa/?shop={self.shop.pk}",
+                                {"day": "2025-03-10", "counted_cash": "80,00"}, HTTP_HX_REQUEST="true")
+        self.assertContains(resp, "fechado em")
+        resp = self.client.get("/financeiro/caixa/historico/")
+        self.assertContains(resp, "R$ 0.00")
@@ -0,0 +1,14 @@
+from django.urls import path
+from . import views
+
+app_name = "financeiro"
+
+urlpatterns = [
+    # Comissões
+    path("comissoes/", views.CommissionStatementView.as_view(), name="commission_statement"),
+    path("comissoes/fechar/", views.CommissionCloseView.as_view(), name="commission_close"),
+
+    # Caixa
+    path("caixa/", views.CashCloseView.as_view(), name="cash_close"),
+    path("caixa/historico/", views.CashHistoryView.as_view(), name="cash_history"),
+]
@@ -0,0 +1,144 @@
+import json
+from datetime import date
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views import View
+from django.views.generic import TemplateView
+
+from cadastros.mixins import OwnerQuerysetMixin, CurrentShopMixin, is_htmx
+from cadastros import lookups
+from . import cash, commissions
+from .forms import CashClosingForm
+
+
+def _parse_month(value):
+    """'AAAA-MM' -> date(AAAA, MM, 1); inválido/vazio -> mês corrente."""
+    try:
+        year, month = (int(p) for p in (value or "").split("-")[:2])
+        return date(year, month, 1)
+    except (TypeError, ValueError):
+        return timezone.localdate().replace(day=1)
+
+
+# =============== COMISSÕES ===============
+class CommissionStatementView(OwnerQuerysetMixin, TemplateView):
+    permission_action = "manage"
+    template_name = "financeiro/commissions.html"
+    fragment_template = "financeiro/_commissions_table.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        month = _parse_month(self.request.GET.get("month"))
+        closing, lines = commissions.get_statement(self.request.tenant, month)
+        ctx.update({
+            "month": month,
+            "closing": closing,
+            "lines": lines,
+            "total_revenue": sum((l.revenue for l in lines), 0),
+            "total_commission": sum((l.commission_amount for l in lines), 0),
+        })
+        return ctx
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.get_context_data(**kwargs)
+        if is_htmx(request) and request.GET.get("fragment") == "table":
+            return render(request, self.fragment_template, ctx)
+        return render(request, self.template_name, ctx)
+
+
+class CommissionCloseView(OwnerQuerysetMixin, View):
+    permission_action = "manage"
+
+    def post(self, request, *args, **kwargs):
+        month = _parse_month(request.POST.get("month"))
+        try:
+            commissions.close_month(request.tenant, month, closed_by=request.user)
+        except ValidationError as exc:
+            resp = HttpResponse("")
+            resp["HX-Trigger"] = json.dumps({"toast": " ".join(exc.messages)})
+            return resp
+        resp = HttpResponse("")
+        resp["HX-Trigger"] = json.dumps({"refreshCommissionsTable": True, "toast": "Mês fechado."})
+        return resp
+
+
+# =============== CAIXA ===============
+class CashCloseView(OwnerQuerysetMixin, CurrentShopMixin, TemplateView):
+    """
+    Fechamento diário da loja atual: totais por forma de pagamento (uma query
+    agrupada) x dinheiro contado. Depois de fechado, exibe o registro gravado.
+    """
+    template_name = "financeiro/cash.html"
+    fragment_template = "financeiro/_cash_panel.html"
+    permission_action = "manage"
+
+    def get_day(self):
+        source = self.request.POST if self.request.method == "POST" else self.request.GET
+        return parse_date(source.get("day", "")) or timezone.localdate()
+
+    def get_shops(self):
+        access = self.request.access
+        return [s for s in lookups.shops(access.owner_id) if access.allows_shop(s.pk)]
+
+    def get_shop(self):
+        shops = self.get_shops()
+        return next((s for s in shops if str(s.pk) == str(self.current_shop_id)), None) or next(iter(shops), None)
+
+    def get_context_data(self, form=None, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        user, shop, day = self.request.tenant, self.get_shop(), self.get_day()
+        closing = None
+        lines = []
+        if shop:
+            closing = cash.closing_history(user, shop.pk, day, day).first()
+            if closing is None:
+                lines = cash.day_totals(user, shop.pk, day)
+        ctx.update({
+            "shop": shop,
+            "shops": self.get_shops(),
+            "day": day,
+            "closing": closing,
+            "lines": lines,
+            "expected_cash": cash.expected_cash(lines),
+            "form": form or CashClosingForm(),
+        })
+        return ctx
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.get_context_data(**kwargs)
+        if is_htmx(request) and request.GET.get("fragment") == "panel":
+            return render(request, self.fragment_template, ctx)
+        return render(request, self.template_name, ctx)
+
+    def post(self, request, *args, **kwargs):
+        form = CashClosingForm(request.POST)
+        shop = self.get_shop()
+        if shop and not request.access.can_in(self.permission_action, shop.pk):
+            raise PermissionDenied  # papel misto: gerente em outra loja, não nesta
+        if shop and form.is_valid():
+            try:
+                cash.close_day(request.tenant, shop, self.get_day(), form.cleaned_data["counted_cash"],
+                               notes=form.cleaned_data["notes"], closed_by=request.user)
+            except ValidationError as exc:
+                form.add_error(None, exc)
+        resp = render(request, self.fragment_template, self.get_context_data(form=form if form.errors else None))
+        if not form.errors:
+            resp["HX-Trigger"] = json.dumps({"toast": "Caixa fechado."})
+        return resp
+
+
+class CashHistoryView(OwnerQuerysetMixin, CurrentShopMixin, TemplateView):
+    """Histórico de caixa: lê só os fechamentos gravados."""
+    template_name = "financeiro/cash_history.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        start = parse_date(self.request.GET.get("start", ""))
+        end = parse_date(self.request.GET.get("end", ""))
+        ctx["closings"] = cash.closing_history(self.request.tenant, self.current_shop_id, start, end)
+        ctx["filters"] = {"start": start, "end": end}
+        return ctx
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'barber_saas.settings')
+    # a suíte de testes tem settings próprios (shards locais, estáticos sem manifest)
+    default = 'barber_saas.settings_test' if sys.argv[1:2] == ['test'] else 'barber_saas.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
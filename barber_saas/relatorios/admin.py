@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import DailySalesFact, DailyOrderFact
+
+
+@admin.register(DailySalesFact)
+class DailySalesFactAdmin(admin.ModelAdmin):
+    list_display = ("day", "shop", "staff", "product", "payment_method", "qty", "revenue", "orders")
+    list_filter = ("payment_method",)
+    date_hierarchy = "day"
+
+
+@admin.register(DailyOrderFact)
+class DailyOrderFactAdmin(admin.ModelAdmin):
+    list_display = ("day", "shop", "staff", "payment_method", "orders", "revenue")
+    list_filter = ("payment_method",)
+    date_hierarchy = "day"
@@ -0,0 +1,125 @@
+"""
+Consultas de faturamento sobre as tabelas fato (nunca sobre ServiceOrder/ServiceItem).
+
+Dimensões: shop, staff, payment_method (DailyOrderFact, valores líquidos) e
+product (DailySalesFact, valores brutos por item). Granularidade: day/week/month.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from servicos.models import ServiceOrder
+from .models import DailySalesFact, DailyOrderFact
+
+GRAINS = ("day", "week", "month")
+DIMENSIONS = ("shop", "staff", "product", "payment_method")
+
+# dimensão -> (campo de agrupamento, campo de rótulo)
+_DIM_FIELDS = {
+    "shop": ("shop_id", "shop__name"),
+    "staff": ("staff_id", "staff__full_name"),
+    "product": ("product_id", "product__name"),
+    "payment_method": ("payment_method", None),
+}
+_PAYMENT_LABELS = dict(ServiceOrder.PAYMENT_CHOICES)
+
+
+def _period_expr(grain):
+    if grain == "week":
+        return TruncWeek("day")
+    if grain == "month":
+        return TruncMonth("day")
+    return F("day")
+
+
+def revenue_report(owner, start, end, grain="day", by=None, shop_id=None):
+    """
+    Lista de dicts {period, key, label, revenue, orders, avg_ticket, qty},
+    ordenada por período e faturamento. ``by=None`` agrega tudo por período.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"grain inválido: {grain}")
+    if by is not None and by not in DIMENSIONS:
+        raise ValueError(f"dimensão inválida: {by}")
+
+    model = DailySalesFact if by == "product" else DailyOrderFact
+    qs = model.objects.filter(owner=owner, day__gte=start, day__lte=end)
+    if shop_id:
+        qs = qs.filter(shop_id=shop_id)
+
+    qs = qs.annotate(period=_period_expr(grain))
+    group = ["period"]
+    key_field = label_field = None
+    if by:
+        key_field, label_field = _DIM_FIELDS[by]
+        group.append(key_field)
+        if label_field:
+            group.append(label_field)
+
+    measures = {"revenue_sum": Sum("revenue"), "orders_sum": Sum("orders")}
+    if model is DailySalesFact:
+        measures["qty_sum"] = Sum("qty")
+    rows = qs.values(*group).annotate(**measures).order_by("period", "-revenue_sum")
+
+    out = []
+    for r in rows:
+        revenue = r["revenue_sum"] or Decimal("0.00")
+        orders = r["orders_sum"] or 0
+        key = r.get(key_field) if key_field else None
+        if by == "payment_method":
+            label = _PAYMENT_LABELS.get(key, key or "—")
+        elif label_field:
+            label = r.get(label_field) or "—"
+        else:
+            label = "Total"
+        out.append({
+            "period": r["period"],
+            "key": key,
+            "label": label,
+            "revenue": revenue,
+            "orders": orders,
+            "avg_ticket": (revenue / orders).quantize(Decimal("0.01")) if orders and model is DailyOrderFact else None,
+            "qty": r.get("qty_sum"),
+        })
+    return out
+
+
+def period_totals(owner, start, end, shop_id=None):
+    """Totais líquidos do período: faturamento, comandas e ticket médio."""
+    qs = DailyOrderFact.objects.filter(owner=owner, day__gte=start, day__lte=end)
+    if shop_id:
+        qs = qs.filter(shop_id=shop_id)
+    agg = qs.aggregate(revenue=Sum("revenue"), orders=Sum("orders"), discount=Sum("discount"))
+    revenue = agg["revenue"] or Decimal("0.00")
+    orders = agg["orders"] or 0
+    return {
+        "revenue": revenue,
+        "orders": orders,
+        "discount": agg["discount"] or Decimal("0.00"),
+        "avg_ticket": (revenue / orders).quantize(Decimal("0.01")) if orders else Decimal("0.00"),
+    }
+
+
+def _shift_year(d, years):
+    try:
+        return d.replace(year=d.year + years)
+    except ValueError:  # 29/02
+        return d.replace(year=d.year + years, day=28)
+
+
+def year_over_year(owner, start, end, shop_id=None):
+    """Compara o período com o mesmo intervalo do ano anterior."""
+    current = period_totals(owner, start, end, shop_id)
+    previous = period_totals(owner, _shift_year(start, -1), _shift_year(end, -1), shop_id)
+    growth = None
+    if previous["revenue"]:
+        growth = ((current["revenue"] - previous["revenue"]) / previous["revenue"] * 100).quantize(Decimal("0.1"))
+    return {"current": current, "previous": previous, "growth_percent": growth}
+
+
+def default_range(today=None):
+    """Mês corrente até hoje."""
+    today = today or date.today()
+    return today.replace(day=1), today
@@ -0,0 +1,164 @@
+"""
+Manutenção das tabelas fato de vendas.
+
+- ``refresh_slice``: recalcula um (owner, shop, dia) a partir das comandas —
+  é o caminho incremental, disparado quando uma comanda concluída muda.
+- ``rebuild``: reconstrói em massa um período inteiro com uma query agrupada
+  por tabela fato + bulk_create.
+
+Dia de negócio = data de ``finished_at`` (ou ``created_at`` se ainda vazio).
+As comandas arquivadas (servicos.archive) também entram: os dois pares de
+tabelas são agregados separadamente e somados por chave.
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core import sharding
+from core.sharding import tenant_atomic
+from servicos.models import ServiceOrder, ServiceItem, ArchivedServiceOrder, ArchivedServiceItem
+from .models import DailySalesFact, DailyOrderFact
+
+BATCH_SIZE = 1000
+SOURCES = ((ServiceOrder, ServiceItem), (ArchivedServiceOrder, ArchivedServiceItem))
+
+
+def business_day(order):
+    """Dia de negócio de uma comanda já carregada."""
+    return timezone.localdate(order.finished_at or order.created_at)
+
+
+def _bounds(start, end):
+    """[start, end] em datas -> [início de start, início de end+1) em datetimes aware."""
+    lo = timezone.make_aware(datetime.combine(start, time.min)) if start else None
+    hi = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)) if end else None
+    return lo, hi
+
+
+def _order_qs(model, owner_id, start=None, end=None, shop_id=None, prefix=""):
+    """Filtro comum: comandas concluídas do owner no período (por dia de negócio)."""
+    biz = Coalesce(f"{prefix}finished_at", f"{prefix}created_at")
+    qs = model.objects.filter(**{f"{prefix}owner_id": owner_id, f"{prefix}status": ServiceOrder.STATUS_DONE})
+    if shop_id:
+        qs = qs.filter(**{f"{prefix}shop_id": shop_id})
+    qs = qs.annotate(biz_at=biz)
+    lo, hi = _bounds(start, end)
+    if lo:
+        qs = qs.filter(biz_at__gte=lo)
+    if hi:
+        qs = qs.filter(biz_at__lt=hi)
+    return qs.annotate(day=TruncDate("biz_at"))
+
+
+def _merge(querysets, key_fields, sum_fields):
+    """Soma, por chave, as linhas agrupadas vindas de tabelas diferentes."""
+    merged = defaultdict(lambda: dict.fromkeys(sum_fields, 0))
+    for qs in querysets:
+        for r in qs.iterator(chunk_size=BATCH_SIZE):
+            acc = merged[tuple(r[k] for k in key_fields)]
+            for f in sum_fields:
+                acc[f] += r[f] or 0
+    for key, sums in merged.items():
+        yield {**dict(zip(key_fields, key)), **sums}
+
+
+def _item_fact_rows(owner_id, start=None, end=None, shop_id=None):
+    line_total = ExpressionWrapper(F("qty") * F("unit_price"), output_field=DecimalField(max_digits=12, decimal_places=2))
+    keys = ("day", "order__shop_id", "order__staff_id", "product_id", "order__payment_method")
+    querysets = [
+        _order_qs(item_model, owner_id, start, end, shop_id, prefix="order__")
+        .values(*keys)
+        .annotate(qty_sum=Sum("qty"), revenue_sum=Sum(line_total), orders_count=Count("order_id", distinct=True))
+        .order_by()
+        for _, item_model in SOURCES
+    ]
+    for r in _merge(querysets, keys, ("qty_sum", "revenue_sum", "orders_count")):
+        yield DailySalesFact(
+            owner_id=owner_id, day=r["day"], shop_id=r["order__shop_id"], staff_id=r["order__staff_id"],
+            product_id=r["product_id"], payment_method=r["order__payment_method"] or "",
+            qty=r["qty_sum"], revenue=r["revenue_sum"], orders=r["orders_count"],
+        )
+
+
+def _order_fact_rows(owner_id, start=None, end=None, shop_id=None):
+    keys = ("day", "shop_id", "staff_id", "payment_method")
+    querysets = [
+        _order_qs(order_model, owner_id, start, end, shop_id)
+        .values(*keys)
+        .annotate(
+            orders_count=Count("id"), subtotal_sum=Sum("subtotal"),
+            discount_sum=Sum("discount_amount"), revenue_sum=Sum("total_amount"),
+        )
+        .order_by()
+        for order_model, _ in SOURCES
+    ]
+    for r in _merge(querysets, keys, ("orders_count", "subtotal_sum", "discount_sum", "revenue_sum")):
+        yield DailyOrderFact(
+            owner_id=owner_id, day=r["day"], shop_id=r["shop_id"], staff_id=r["staff_id"],
+            payment_method=r["payment_method"] or "", orders=r["orders_count"],
+            subtotal=r["subtotal_sum"], discount=r["discount_sum"], revenue=r["revenue_sum"],
+        )
+
+
+def _bulk_insert(model, objs):
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+@tenant_atomic()
+def refresh_slice(owner_id, shop_id, day):
+    """Recalcula os fatos de um único (owner, shop, dia)."""
+    for model in (DailySalesFact, DailyOrderFact):
+        model.objects.filter(owner_id=owner_id, shop_id=shop_id, day=day).delete()
+    _bulk_insert(DailySalesFact, _item_fact_rows(owner_id, day, day, shop_id))
+    _bulk_insert(DailyOrderFact, _order_fact_rows(owner_id, day, day, shop_id))
+
+
+@tenant_atomic()
+def rebuild(owner, start=None, end=None):
+    """Reconstrói os fatos do owner (período opcional, datas inclusivas)."""
+    owner_id = getattr(owner, "pk", owner)
+    for model in (DailySalesFact, DailyOrderFact):
+        qs = model.objects.filter(owner_id=owner_id)
+        if start:
+            qs = qs.filter(day__gte=start)
+        if end:
+            qs = qs.filter(day__lte=end)
+        qs.delete()
+    _bulk_insert(DailySalesFact, _item_fact_rows(owner_id, start, end))
+    _bulk_insert(DailyOrderFact, _order_fact_rows(owner_id, start, end))
+
+
+# ===== fatias pendentes (dedup por transação) =====
+_pending = threading.local()
+
+
+def mark_dirty(owner_id, shop_id, day):
+    """
+    Agenda o refresh de uma fatia para o commit da transação corrente.
+    Várias gravações na mesma comanda (ordem + itens do formset) viram um refresh só.
+    """
+    slices = getattr(_pending, "slices", None)
+    if slices is None:
+        slices = _pending.slices = set()
+    slices.add((owner_id, shop_id, day))
+    # o primeiro callback que rodar esvazia o conjunto; os demais viram no-op.
+    # (se a transação sofrer rollback, a fatia é recalculada no próximo commit — idempotente)
+    sharding.on_commit(_flush)
+
+
+def _flush():
+    slices = getattr(_pending, "slices", None) or set()
+    _pending.slices = set()
+    for owner_id, shop_id, day in slices:
+        refresh_slice(owner_id, shop_id, day)
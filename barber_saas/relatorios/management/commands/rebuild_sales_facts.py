@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import sharding
+from core.queue import enqueue
+from relatorios import facts
+from relatorios.tasks import rebuild_facts
+
+
+class Command(BaseCommand):
+    help = "Reconstrói em massa as tabelas fato de vendas (todos os tenants ou um owner)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", help="E-mail do owner (padrão: todos).")
+        parser.add_argument("--start", help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--end", help="Data final (AAAA-MM-DD).")
+        parser.add_argument("--async", action="store_true", dest="queued",
+                            help="Só enfileira (run_worker processa), um job por owner.")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        start = parse_date(opts["start"]) if opts["start"] else None
+        end = parse_date(opts["end"]) if opts["end"] else None
+
+        owners = User.objects.all()
+        if opts["owner"]:
+            owners = owners.filter(email=opts["owner"])
+            if not owners.exists():
+                raise CommandError(f"Owner não encontrado: {opts['owner']}")
+
+        for owner in owners.only("pk", "email").iterator():
+            if opts["queued"]:
+                enqueue(rebuild_facts, owner.pk, start, end)
+                self.stdout.write(f"{owner.email}: reconstrução enfileirada")
+                continue
+            with sharding.tenant(owner):
+                facts.rebuild(owner, start, end)
+            self.stdout.write(f"{owner.email}: fatos reconstruídos")
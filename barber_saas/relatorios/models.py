@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.db import models
+
+from core.models import TenantOwnedModel
+
+
+# ===== Tabelas fato (derivadas; podem ser reconstruídas a qualquer momento) =====
+class DailySalesFact(TenantOwnedModel):
+    """
+    Grão de ServiceItem agregado por dia de negócio:
+    (day, shop, staff, product, payment_method) de comandas concluídas.
+    ``revenue`` é bruto (qty * unit_price), antes do desconto da comanda.
+    """
+    day = models.DateField()
+    shop = models.ForeignKey("cadastros.Shop", on_delete=models.CASCADE, related_name="+")
+    staff = models.ForeignKey("cadastros.Staff", null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    product = models.ForeignKey("cadastros.Product", null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    payment_method = models.CharField(max_length=16, blank=True)
+
+    qty = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    orders = models.PositiveIntegerField(default=0)  # comandas distintas com este produto
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "day"]),
+            models.Index(fields=["owner", "shop", "day"]),
+        ]
+
+
+class DailyOrderFact(TenantOwnedModel):
+    """
+    Grão de comanda agregado por (day, shop, staff, payment_method):
+    contagem de comandas e valores líquidos (ticket médio = revenue / orders).
+    """
+    day = models.DateField()
+    shop = models.ForeignKey("cadastros.Shop", on_delete=models.CASCADE, related_name="+")
+    staff = models.ForeignKey("cadastros.Staff", null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    payment_method = models.CharField(max_length=16, blank=True)
+
+    orders = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "day"]),
+            models.Index(fields=["owner", "shop", "day"]),
+        ]
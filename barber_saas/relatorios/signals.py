@@ -0,0 +1,67 @@
+"""
+Mantém DailySalesFact/DailyOrderFact incrementalmente: toda gravação que
+afeta uma comanda concluída (ou que deixa de estar concluída) marca a
+fatia (owner, shop, dia) para recálculo no commit.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import sharding
+from core.queue import enqueue
+from servicos.models import ServiceOrder, ServiceItem
+from servicos.signals import orders_bulk_created
+from .facts import mark_dirty, business_day
+from .tasks import refresh_slices
+
+
+@receiver(pre_save, sender=ServiceOrder)
+def remember_previous_slice(sender, instance, raw=False, **kwargs):
+    instance._fact_previous = None
+    if raw:
+        return
+    prev = instance.get_previous_values()
+    if prev is not None and prev["status"] == ServiceOrder.STATUS_DONE:
+        day = timezone.localdate(prev["finished_at"] or prev["created_at"])
+        instance._fact_previous = (prev["owner_id"], prev["shop_id"], day)
+
+
+@receiver(post_save, sender=ServiceOrder)
+def order_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_fact_previous", None)
+    if previous:
+        mark_dirty(*previous)
+    if instance.status == ServiceOrder.STATUS_DONE:
+        mark_dirty(instance.owner_id, instance.shop_id, business_day(instance))
+
+
+@receiver(post_delete, sender=ServiceOrder)
+def order_deleted(sender, instance, **kwargs):
+    if instance.status == ServiceOrder.STATUS_DONE:
+        mark_dirty(instance.owner_id, instance.shop_id, business_day(instance))
+
+
+@receiver(post_save, sender=ServiceItem)
+@receiver(post_delete, sender=ServiceItem)
+def item_changed(sender, instance, raw=False, **kwargs):
+    if raw or not instance.order_id:
+        return
+    try:
+        order = instance.order
+    except ServiceOrder.DoesNotExist:  # removido em cascata junto com a comanda
+        return
+    if order.status == ServiceOrder.STATUS_DONE:
+        mark_dirty(order.owner_id, order.shop_id, business_day(order))
+
+
+@receiver(orders_bulk_created, sender=ServiceOrder)
+def orders_bulk_created_receiver(sender, owner_id, orders, **kwargs):
+    # um lote do PDV pode tocar dezenas de fatias: o recálculo vai para a fila
+    slices = sorted({
+        (owner_id, str(order.shop_id), business_day(order).isoformat())
+        for order in orders if order.status == ServiceOrder.STATUS_DONE
+    })
+    if slices:
+        sharding.on_commit(lambda: enqueue(refresh_slices, [list(s) for s in slices]))
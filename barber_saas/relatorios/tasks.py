@@ -0,0 +1,19 @@
+from django.utils.dateparse import parse_date
+
+from core import sharding
+from core.queue import task
+from . import facts
+
+
+@task
+def refresh_slices(slices):
+    """[[owner_id, shop_id, "AAAA-MM-DD"], ...] — fatias marcadas por uma ingestão em lote."""
+    for owner_id, shop_id, day in slices:
+        with sharding.tenant(owner_id):
+            facts.refresh_slice(owner_id, shop_id, parse_date(day))
+
+
+@task(priority=-10)
+def rebuild_facts(owner_id, start=None, end=None):
+    with sharding.tenant(owner_id):
+        facts.rebuild(owner_id, parse_date(start) if start else None, parse_date(end) if end else None)
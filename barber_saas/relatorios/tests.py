@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from cadastros.models import Shop, Staff, Product
+from servicos.models import ServiceOrder, ServiceItem
+
+from . import analytics, facts
+from .models import DailySalesFact, DailyOrderFact
+
+
+class SalesFactTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.staff = Staff.objects.create(owner=self.owner, user=self.owner, full_name="João")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.beard = Product.objects.create(owner=self.owner, name="Barba", default_price=Decimal("25.00"))
+        self.day = date(2025, 3, 10)
+
+    def _order(self, items, status=ServiceOrder.STATUS_DONE, day=None, payment=ServiceOrder.PAY_PIX):
+        finished = timezone.make_aware(datetime.combine(day or self.day, datetime.min.time().replace(hour=15)))
+        with self.captureOnCommitCallbacks(execute=True):
+            order = ServiceOrder.objects.create(
+                owner=self.owner, shop=self.shop, staff=self.staff, status=status,
+                payment_method=payment, finished_at=finished,
+            )
+            for product, qty in items:
+                ServiceItem.objects.create(owner=self.owner, order=order, product=product, qty=qty)
+        return order
+
+    def test_completion_maintains_facts_incrementally(self):
+        self._order([(self.cut, 1), (self.beard, 2)])
+        self._order([(self.cut, 1)], status=ServiceOrder.STATUS_IN_PROGRESS)
+
+        fact = DailyOrderFact.objects.get(owner=self.owner, day=self.day)
+        self.assertEqual(fact.orders, 1)
+        self.assertEqual(fact.revenue, Decimal("90.00"))
+        self.assertEqual(DailySalesFact.objects.filter(owner=self.owner).count(), 2)
+
+    def test_reopening_order_removes_it_from_facts(self):
+        order = self._order([(self.cut, 1)])
+        order.status = ServiceOrder.STATUS_CANCELED
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertFalse(DailyOrderFact.objects.filter(owner=self.owner).exists())
+
+    def test_rebuild_matches_incremental(self):
+        self._order([(self.cut, 2)])
+        self._order([(self.beard, 1)], day=date(2025, 3, 12), payment=ServiceOrder.PAY_CASH)
+        before = sorted(DailySalesFact.objects.values_list("day", "product_id", "qty", "revenue"))
+        facts.rebuild(self.owner)
+        after = sorted(DailySalesFact.objects.values_list("day", "product_id", "qty", "revenue"))
+        self.assertEqual(before, after)
+
+    def test_report_reads_only_fact_tables(self):
+        self._order([(self.cut, 1)])
+        self._order([(self.beard, 2)], day=date(2025, 3, 12), payment=ServiceOrder.PAY_CASH)
+        with self.assertNumQueries(1):
+            rows = analytics.revenue_report(self.owner, date(2025, 3, 1), date(2025, 3, 31), grain="month", by="payment_method")
+        self.assertEqual({r["label"]: r["revenue"] for r in rows}, {"PIX": Decimal("40.00"), "Dinheiro": Decimal("50.00")})
+
+        totals = analytics.period_totals(self.owner, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(totals["orders"], 2)
+        self.assertEqual(totals["avg_ticket"], Decimal("45.00"))
+
+    def test_report_view(self):
+        self._order([(self.cut, 1)])
+        self.client.force_login(self.owner)
+        resp = self.client.get("/relatorios/faturamento/", {"start": "2025-03-01", "end": "2025-03-31", "by": "product"})
+        self.assertContains(resp, "Corte")
+
+
+class SalesFactCommitTests(TransactionTestCase):
+    """Commits de verdade (sem captureOnCommitCallbacks): o refresh roda depois dos totais."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.beard = Product.objects.create(owner=self.owner, name="Barba", default_price=Decimal("25.00"))
+        self.order = ServiceOrder.objects.create(
+            owner=self.owner, shop=self.shop, status=ServiceOrder.STATUS_DONE, finished_at=timezone.now(),
+        )
+
+    def test_item_saved_outside_a_transaction_sees_new_totals(self):
+        ServiceItem.objects.create(owner=self.owner, order=self.order, product=self.cut, qty=1)
+        ServiceItem.objects.create(owner=self.owner, order=self.order, product=self.beard, qty=2)
+        fact = DailyOrderFact.objects.get(owner=self.owner)
+        self.assertEqual(fact.revenue, Decimal("90.00"))
+
+    def test_items_in_one_transaction_refresh_once(self):
+        from core.sharding import tenant_atomic
+
+        with mock.patch.object(facts, "refresh_slice") as refresh, tenant_atomic():
+            ServiceItem.objects.create(owner=self.owner, order=self.order, product=self.cut, qty=1)
+            ServiceItem.objects.create(owner=self.owner, order=self.order, product=self.beard, qty=1)
+            refresh.assert_not_called()
+        refresh.assert_called_once()
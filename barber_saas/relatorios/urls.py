@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = "relatorios"
+
+urlpatterns = [
+    path("faturamento/", views.RevenueReportView.as_view(), name="revenue"),
+]
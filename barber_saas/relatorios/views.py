@@ -0,0 +1,49 @@
+from django.shortcuts import render
+from django.views.generic import TemplateView
+from django.utils.dateparse import parse_date
+
+from cadastros.mixins import OwnerQuerysetMixin, is_htmx
+from . import analytics
+
+
+class RevenueReportView(OwnerQuerysetMixin, TemplateView):
+    """
+    Faturamento, comandas, ticket médio e mix de itens por dia/semana/mês,
+    quebrados por loja, profissional, produto ou forma de pagamento.
+    Lê apenas as tabelas fato.
+    """
+    permission_action = "manage"
+    template_name = "relatorios/revenue.html"
+    fragment_template = "relatorios/_revenue_table.html"
+
+    def get_filters(self):
+        start_default, end_default = analytics.default_range()
+        grain = self.request.GET.get("grain", "day")
+        by = self.request.GET.get("by") or None
+        return {
+            "start": parse_date(self.request.GET.get("start", "")) or start_default,
+            "end": parse_date(self.request.GET.get("end", "")) or end_default,
+            "grain": grain if grain in analytics.GRAINS else "day",
+            "by": by if by in analytics.DIMENSIONS else None,
+            "shop_id": self.request.session.get("current_shop_id"),
+        }
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        f = self.get_filters()
+        user = self.request.tenant
+        ctx["filters"] = f
+        ctx["rows"] = analytics.revenue_report(user, f["start"], f["end"], f["grain"], f["by"], f["shop_id"])
+        ctx["yoy"] = analytics.year_over_year(user, f["start"], f["end"], f["shop_id"])
+        ctx["grain_choices"] = (("day", "Dia"), ("week", "Semana"), ("month", "Mês"))
+        ctx["dimension_choices"] = (
+            ("shop", "Loja"), ("staff", "Profissional"),
+            ("product", "Produto/Serviço"), ("payment_method", "Forma de pagamento"),
+        )
+        return ctx
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.get_context_data(**kwargs)
+        if is_htmx(request) and request.GET.get("fragment") == "table":
+            return render(request, self.fragment_template, ctx)
+        return render(request, self.template_name, ctx)
@@ -0,0 +1,79 @@
+"""
+Agenda (semana/dia) montada a partir de uma única query por janela.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+from cadastros.models import Staff
+from .models import ServiceOrder
+
+WEEKDAYS = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+
+
+def window(view, day):
+    """Primeiro dia e número de dias da janela exibida."""
+    if view == "day":
+        return day, 1
+    return day - timedelta(days=day.weekday()), 7
+
+
+def appointments(owner, first_day, days, shop_id=None, staff_id=None):
+    lo = timezone.make_aware(datetime.combine(first_day, time.min))
+    hi = lo + timedelta(days=days)
+    qs = (
+        ServiceOrder.objects.filter(owner=owner, scheduled_for__gte=lo, scheduled_for__lt=hi)
+        .exclude(status=ServiceOrder.STATUS_CANCELED)
+        .select_related("client", "staff", "staff__user")
+        .order_by("scheduled_for")
+    )
+    if shop_id:
+        qs = qs.filter(shop_id=shop_id)
+    if staff_id:
+        qs = qs.filter(staff_id=staff_id)
+    return list(qs)
+
+
+def build_columns(view, first_day, days, orders, staff_list=None):
+    """
+    Semana: uma coluna por dia. Dia: uma coluna por profissional
+    (+ "Sem profissional" se houver agendamento sem staff).
+    """
+    if view == "day":
+        columns = {s.pk: {"title": str(s), "key": s.pk, "appointments": []} for s in (staff_list or [])}
+        for o in orders:
+            col = columns.get(o.staff_id)
+            if col is None:
+                col = columns[o.staff_id] = {
+                    "title": str(o.staff) if o.staff_id else "Sem profissional",
+                    "key": o.staff_id, "appointments": [],
+                }
+            col["appointments"].append(o)
+        return list(columns.values())
+
+    columns = []
+    by_day = {}
+    for i in range(days):
+        d = first_day + timedelta(days=i)
+        col = {"title": f"{WEEKDAYS[d.weekday()]} {d:%d/%m}", "key": d, "appointments": []}
+        by_day[d] = col
+        columns.append(col)
+    for o in orders:
+        col = by_day.get(timezone.localtime(o.scheduled_for).date())
+        if col is not None:
+            col["appointments"].append(o)
+    return columns
+
+
+def active_staff(owner, shop_id=None):
+    qs = Staff.objects.filter(owner=owner, is_active=True).select_related("user").order_by("full_name")
+    if shop_id:
+        qs = qs.filter(memberships__shop_id=shop_id, memberships__is_active=True).distinct()
+    return list(qs)
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return timezone.localdate()
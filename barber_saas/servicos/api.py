@@ -0,0 +1,278 @@
+"""
+Ingestão em lote de comandas vindas de integrações (PDV).
+
+Um request traz até MAX_BATCH comandas com itens. Todas as referências
+(lojas, profissionais, produtos, preços por loja, clientes, chaves de
+idempotência já gravadas) são resolvidas com uma query IN cada; as
+comandas válidas são gravadas com bulk_create numa única transação e a
+resposta traz o resultado por registro (created / duplicate / error).
+
+bulk_create não passa por ServiceOrder.save/ServiceItem.save nem dispara
+post_save: totais e carimbos são calculados aqui e o sinal
+``orders_bulk_created`` avisa quem mantém dados derivados (relatórios).
+"""
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.sharding import tenant_atomic
+from cadastros.models import Shop, Staff, Product, ProductPrice, Client
+from cadastros.utils import normalize_phone
+from .models import ServiceOrder, ServiceItem, ArchivedServiceOrder
+from .signals import orders_bulk_created
+
+MAX_BATCH = 500
+MAX_ITEMS_PER_ORDER = 100
+ALLOWED_STATUSES = (ServiceOrder.STATUS_DONE, ServiceOrder.STATUS_CANCELED)
+PAYMENT_METHODS = {code for code, _ in ServiceOrder.PAYMENT_CHOICES}
+
+
+class PayloadError(Exception):
+    """Payload malformado como um todo (responde 400)."""
+
+
+# ===== parsing =====
+def _uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _decimal(value, default="0.00"):
+    if value in (None, ""):
+        value = default
+    try:
+        number = Decimal(str(value).replace(",", "."))
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or number < 0:
+        return None
+    return number.quantize(Decimal("0.01"))
+
+
+def _datetime(value):
+    if not value:
+        return None
+    dt = parse_datetime(str(value))
+    if dt is not None and timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def parse_batch(payload):
+    if not isinstance(payload, dict) or not isinstance(payload.get("orders"), list):
+        raise PayloadError('Esperado um objeto {"orders": [...]}.')
+    orders = payload["orders"]
+    if not orders:
+        raise PayloadError("Lote vazio.")
+    if len(orders) > MAX_BATCH:
+        raise PayloadError(f"Máximo de {MAX_BATCH} comandas por lote.")
+    return orders
+
+
+# ===== resolução em lote =====
+class _Lookups:
+    """Todas as referências do lote, uma query por tabela."""
+
+    def __init__(self, owner, records):
+        shop_ids, staff_ids, product_ids, client_ids, phones, keys = set(), set(), set(), set(), set(), set()
+        for rec in records:
+            if not isinstance(rec, dict):
+                continue
+            shop_ids.add(_uuid(rec.get("shop")))
+            staff_ids.add(_uuid(rec.get("staff")))
+            client_ids.add(_uuid(rec.get("client")))
+            phones.add(normalize_phone(str(rec.get("client_phone") or "")))
+            keys.add(str(rec.get("idempotency_key") or "").strip())
+            items = rec.get("items")
+            for item in items if isinstance(items, list) else ():
+                if isinstance(item, dict):
+                    product_ids.add(_uuid(item.get("product")))
+        for s in (shop_ids, staff_ids, product_ids, client_ids, phones, keys):
+            s.discard(None)
+            s.discard("")
+
+        self.shops = set(Shop.objects.filter(owner=owner, pk__in=shop_ids).values_list("pk", flat=True))
+        self.staff = set(Staff.objects.filter(owner=owner, pk__in=staff_ids).values_list("pk", flat=True))
+        self.products = dict(Product.objects.filter(owner=owner, pk__in=product_ids).values_list("pk", "default_price"))
+        self.prices = {
+            (product_id, shop_id): price
+            for product_id, shop_id, price in ProductPrice.objects.filter(
+                owner=owner, shop_id__in=self.shops, product_id__in=self.products
+            ).values_list("product_id", "shop_id", "price")
+        }
+        self.clients = set(Client.objects.filter(owner=owner, pk__in=client_ids).values_list("pk", flat=True))
+        self.clients_by_phone = dict(Client.objects.filter(owner=owner, phone__in=phones).values_list("phone", "pk"))
+        self.existing_keys = {}
+        for model in (ArchivedServiceOrder, ServiceOrder):  # reenvio de comanda já arquivada também é duplicata
+            self.existing_keys.update(
+                model.objects.filter(owner=owner, idempotency_key__in=keys).values_list("idempotency_key", "pk")
+            )
+
+    def price(self, product_id, shop_id):
+        return self.prices.get((product_id, shop_id), self.products[product_id])
+
+
+# ===== validação por registro =====
+def _build(owner, rec, lookups, now):
+    """(ServiceOrder, [ServiceItem], novo_cliente|None, erros)."""
+    errors = []
+    if not isinstance(rec, dict):
+        return None, None, None, ["Registro deve ser um objeto."]
+
+    shop_id = _uuid(rec.get("shop"))
+    if shop_id not in lookups.shops:
+        errors.append("shop: loja inexistente.")
+    staff_id = None
+    if rec.get("staff"):
+        staff_id = _uuid(rec["staff"])
+        if staff_id not in lookups.staff:
+            errors.append("staff: profissional inexistente.")
+
+    client_id, new_client = None, None
+    if rec.get("client"):
+        client_id = _uuid(rec["client"])
+        if client_id not in lookups.clients:
+            errors.append("client: cliente inexistente.")
+    elif rec.get("client_phone"):
+        phone = normalize_phone(str(rec["client_phone"]))
+        if len(phone) < 10:
+            errors.append("client_phone: telefone inválido.")
+        else:
+            client_id = lookups.clients_by_phone.get(phone)
+            if client_id is None:
+                name = str(rec.get("client_name") or "").strip()[:150] or phone
+                new_client = Client(owner=owner, name=name, phone=phone)
+                client_id = new_client.pk
+
+    status = str(rec.get("status") or ServiceOrder.STATUS_DONE)
+    if status not in ALLOWED_STATUSES:
+        errors.append(f"status: use {' ou '.join(ALLOWED_STATUSES)}.")
+    payment_method = str(rec.get("payment_method") or "")
+    if payment_method and payment_method not in PAYMENT_METHODS:
+        errors.append("payment_method: forma de pagamento inválida.")
+    discount = _decimal(rec.get("discount_amount"))
+    amount_paid = _decimal(rec.get("amount_paid"))
+    if discount is None:
+        errors.append("discount_amount: valor inválido.")
+    if amount_paid is None:
+        errors.append("amount_paid: valor inválido.")
+    finished_at = now
+    if rec.get("finished_at"):
+        finished_at = _datetime(rec["finished_at"])
+        if finished_at is None:
+            errors.append("finished_at: data/hora inválida.")
+
+    raw_items = rec.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        errors.append("items: informe ao menos um item.")
+        raw_items = []
+    elif len(raw_items) > MAX_ITEMS_PER_ORDER:
+        errors.append(f"items: máximo de {MAX_ITEMS_PER_ORDER} por comanda.")
+        raw_items = []
+
+    items = []
+    for n, item in enumerate(raw_items):
+        if not isinstance(item, dict):
+            errors.append(f"items[{n}]: deve ser um objeto.")
+            continue
+        product_id = _uuid(item.get("product"))
+        if product_id not in lookups.products:
+            errors.append(f"items[{n}].product: produto inexistente.")
+            continue
+        try:
+            qty = int(item.get("qty", 1))
+        except (TypeError, ValueError):
+            qty = 0
+        if qty <= 0:
+            errors.append(f"items[{n}].qty: quantidade deve ser positiva.")
+            continue
+        if item.get("unit_price") in (None, ""):
+            # sem preço informado: override da loja, senão preço padrão
+            unit_price = lookups.price(product_id, shop_id) or Decimal("0.00")
+        else:
+            unit_price = _decimal(item["unit_price"])
+            if unit_price is None:
+                errors.append(f"items[{n}].unit_price: valor inválido.")
+                continue
+        items.append(ServiceItem(owner=owner, product_id=product_id, qty=qty, unit_price=unit_price))
+
+    if errors:
+        return None, None, None, errors
+
+    subtotal = sum((it.qty * it.unit_price for it in items), Decimal("0.00"))
+    order = ServiceOrder(
+        owner=owner, shop_id=shop_id, staff_id=staff_id, client_id=client_id,
+        status=status, payment_method=payment_method,
+        amount_paid=amount_paid, discount_amount=discount,
+        subtotal=subtotal, total_amount=max(subtotal - discount, Decimal("0.00")),
+        finished_at=finished_at if status == ServiceOrder.STATUS_DONE else None,
+        notes=str(rec.get("notes") or "")[:2000],
+        idempotency_key=str(rec.get("idempotency_key") or "").strip(),
+    )
+    for it in items:
+        it.order = order
+    return order, items, new_client, []
+
+
+# ===== gravação =====
+def ingest_orders(owner, records):
+    """
+    Valida e grava o lote. Devolve [{index, idempotency_key, status, id?, errors?}].
+    Conflito concorrente na chave de idempotência (ou telefone) derruba a
+    transação; repetimos uma vez, e a segunda passada já enxerga os registros.
+    """
+    for attempt in range(2):
+        try:
+            return _ingest(owner, records)
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _ingest(owner, records):
+    lookups = _Lookups(owner, records)
+    now = timezone.now()
+    results, orders, items, new_clients = [], [], [], {}
+    seen_keys = {}
+
+    for index, rec in enumerate(records):
+        key = str(rec.get("idempotency_key") or "").strip() if isinstance(rec, dict) else ""
+        result = {"index": index, "idempotency_key": key}
+        results.append(result)
+        if len(key) > 64:
+            result.update(status="error", errors=["idempotency_key: máximo de 64 caracteres."])
+            continue
+        if key in lookups.existing_keys:
+            result.update(status="duplicate", id=str(lookups.existing_keys[key]))
+            continue
+        if key and key in seen_keys:
+            result.update(status="duplicate", id=str(seen_keys[key]))
+            continue
+
+        order, order_items, new_client, errors = _build(owner, rec, lookups, now)
+        if errors:
+            result.update(status="error", errors=errors)
+            continue
+        if new_client is not None:
+            # o mesmo telefone novo pode aparecer em várias comandas do lote
+            known = new_clients.setdefault(new_client.phone, new_client)
+            lookups.clients_by_phone[new_client.phone] = known.pk
+            order.client_id = known.pk
+        if key:
+            seen_keys[key] = order.pk
+        orders.append(order)
+        items.extend(order_items)
+        result.update(status="created", id=str(order.pk))
+
+    if orders:
+        with tenant_atomic():
+            Client.objects.bulk_create(new_clients.values())
+            ServiceOrder.objects.bulk_create(orders)
+            ServiceItem.objects.bulk_create(items)
+            orders_bulk_created.send(sender=ServiceOrder, owner_id=owner.pk, orders=orders)
+    return results
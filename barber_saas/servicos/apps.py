@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ServicosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicos'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (invalidação do cache de disponibilidade)
@@ -0,0 +1,92 @@
+"""
+Arquivamento de comandas fechadas (concluídas/canceladas) antigas.
+
+As comandas e seus itens são copiados para ArchivedServiceOrder /
+ArchivedServiceItem e removidos das tabelas quentes em lotes limitados,
+cada lote na sua transação (o SQLite não fica travado pelo job inteiro).
+A remoção é um DELETE direto por id: nada de collector nem sinais — os
+fatos de vendas já contam as comandas arquivadas (relatorios.facts lê as
+duas tabelas) e o sync não deve ver isso como exclusão.
+``restore`` faz o caminho inverso.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.db import delete_ids
+from core.sharding import tenant_atomic
+from .models import ServiceOrder, ServiceItem, ArchivedServiceOrder, ArchivedServiceItem
+
+CLOSED_STATUSES = (ServiceOrder.STATUS_DONE, ServiceOrder.STATUS_CANCELED)
+
+
+def _columns(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+ORDER_COLUMNS = _columns(ServiceOrder)
+ITEM_COLUMNS = _columns(ServiceItem)
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archivable(cutoff, owner=None):
+    qs = ServiceOrder.objects.filter(status__in=CLOSED_STATUSES).filter(
+        Q(finished_at__lt=cutoff) | Q(finished_at__isnull=True, created_at__lt=cutoff)
+    )
+    if owner is not None:
+        qs = qs.filter(owner=owner)
+    return qs
+
+
+@tenant_atomic()
+def _move(ids, order_src, item_src, order_dst, item_dst):
+    orders = list(order_src.objects.filter(pk__in=ids).values(*ORDER_COLUMNS))
+    items = list(item_src.objects.filter(order_id__in=ids).values(*ITEM_COLUMNS))
+    order_dst.objects.bulk_create([order_dst(**row) for row in orders])
+    item_dst.objects.bulk_create([item_dst(**row) for row in items])
+    delete_ids(item_src, [row["id"] for row in items])
+    delete_ids(order_src, [row["id"] for row in orders])
+    return len(orders)
+
+
+def _run(ids_qs, batch_size, move, progress=None):
+    total = 0
+    while True:
+        ids = list(ids_qs.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += move(ids)
+        if progress:
+            progress(total)
+
+
+def archive(cutoff=None, owner=None, batch_size=None, progress=None):
+    """Arquiva tudo que estiver fechado antes de ``cutoff``; devolve o total movido."""
+    cutoff = cutoff or default_cutoff()
+    qs = archivable(cutoff, owner).order_by("created_at", "id")
+    return _run(
+        qs, batch_size or settings.ARCHIVE_BATCH_SIZE,
+        lambda ids: _move(ids, ServiceOrder, ServiceItem, ArchivedServiceOrder, ArchivedServiceItem),
+        progress,
+    )
+
+
+def restore(owner, ids=None, start=None, end=None, batch_size=None, progress=None):
+    """Devolve comandas arquivadas às tabelas quentes (por id ou faixa de created_at)."""
+    qs = ArchivedServiceOrder.objects.filter(owner=owner)
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lt=end)
+    return _run(
+        qs.order_by("created_at", "id"), batch_size or settings.ARCHIVE_BATCH_SIZE,
+        lambda ids: _move(ids, ArchivedServiceOrder, ArchivedServiceItem, ServiceOrder, ServiceItem),
+        progress,
+    )
@@ -0,0 +1,227 @@
+"""
+Motor de disponibilidade: "próximos horários livres para estes serviços,
+com qualquer profissional desta loja".
+
+Por (loja, dia) calculamos os intervalos livres de cada profissional ativo
+(StaffMembership) com uma varredura (sweep-line) sobre os agendamentos do
+período, carregados numa única query. Os intervalos livres independem da
+duração pedida, então ficam em cache por (loja, dia); a invalidação é por
+contador de versão (owner, dia), incrementado quando uma comanda daquele dia
+muda. A checagem de conflito em ServiceOrder.clean continua sendo a garantia
+final caso o cache esteja defasado.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from cadastros.models import Product, StaffMembership
+from .models import ServiceOrder
+
+CACHE_TIMEOUT = 60 * 60
+DEFAULT_STEP_MINUTES = 15
+
+
+# ===== versões para invalidação =====
+def _day_version_key(owner_id, day):
+    return f"availability:v:{owner_id}:{day.isoformat()}"
+
+
+def _staff_version_key(owner_id):
+    return f"availability:staff:{owner_id}"
+
+
+def _version(key):
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, 1, None)
+        value = cache.get(key, 1)
+    return value
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, None)
+
+
+def invalidate_day(owner_id, day):
+    _bump(_day_version_key(owner_id, day))
+
+
+def invalidate_staff(owner_id):
+    _bump(_staff_version_key(owner_id))
+
+
+# ===== cálculo =====
+def valid_ids(values):
+    """Só os valores que são UUIDs (ids vindos da query string)."""
+    out = []
+    for value in values:
+        try:
+            out.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return out
+
+
+def required_minutes(owner, product_ids):
+    """Soma das durações dos serviços escolhidos (uma query; ids inválidos são ignorados)."""
+    product_ids = valid_ids(product_ids)
+    if not product_ids:
+        return settings.AGENDA_DEFAULT_DURATION_MINUTES
+    total = Product.objects.filter(owner=owner, pk__in=product_ids).aggregate(t=Sum("duration_minutes"))["t"]
+    return total or settings.AGENDA_DEFAULT_DURATION_MINUTES
+
+
+def shop_staff(owner_id, shop_id):
+    """[(staff_id, nome)] dos profissionais ativos vinculados à loja (em cache)."""
+    key = f"availability:staff-list:{shop_id}:{_version(_staff_version_key(owner_id))}"
+    staff = cache.get(key)
+    if staff is None:
+        rows = (
+            StaffMembership.objects.filter(owner_id=owner_id, shop_id=shop_id, is_active=True, staff__is_active=True)
+            .values_list("staff_id", "staff__full_name", "staff__user__email")
+            .order_by("staff__full_name")
+        )
+        # sem nome cadastrado não expõe o e-mail (a lista também vai para a página pública)
+        staff = [(staff_id, name or "Profissional") for staff_id, name, _email in rows]
+        cache.set(key, staff, CACHE_TIMEOUT)
+    return staff
+
+
+def _working_window(day):
+    start = timezone.make_aware(datetime.combine(day, time(settings.AGENDA_DAY_START_HOUR)))
+    end = timezone.make_aware(datetime.combine(day, time(settings.AGENDA_DAY_END_HOUR)))
+    return start, end
+
+
+def _busy_intervals(owner_id, staff_ids, lo, hi):
+    """
+    {staff_id: [(início, fim), ...]} dos agendamentos que cruzam [lo, hi) —
+    uma query, limitada pelo índice (staff, scheduled_for).
+    """
+    max_len = timedelta(minutes=settings.AGENDA_MAX_DURATION_MINUTES)
+    default_len = timedelta(minutes=settings.AGENDA_DEFAULT_DURATION_MINUTES)
+    rows = (
+        ServiceOrder.objects.filter(
+            owner_id=owner_id, staff_id__in=staff_ids,
+            scheduled_for__lt=hi, scheduled_for__gt=lo - max_len,
+        )
+        .exclude(status=ServiceOrder.STATUS_CANCELED)
+        .values_list("staff_id", "scheduled_for", "scheduled_end")
+    )
+    busy = defaultdict(list)
+    for staff_id, start, end in rows:
+        busy[staff_id].append((start, end or start + default_len))
+    return busy
+
+
+def sweep_free(window_start, window_end, intervals):
+    """
+    Sweep-line: ordena os intervalos ocupados e devolve as lacunas livres
+    dentro da janela de trabalho. Intervalos sobrepostos são fundidos.
+    """
+    free = []
+    cursor = window_start
+    for start, end in sorted(intervals):
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+        if cursor >= window_end:
+            break
+    if cursor < window_end:
+        free.append((cursor, window_end))
+    return free
+
+
+def _compute_free_gaps(owner_id, shop_id, days):
+    """{day: {staff_id: [(início, fim)]}} para vários dias com uma query de agenda."""
+    staff = shop_staff(owner_id, shop_id)
+    staff_ids = [s for s, _ in staff]
+    if not staff_ids:
+        return {d: {} for d in days}
+    lo, _ = _working_window(days[0])
+    _, hi = _working_window(days[-1])
+    busy = _busy_intervals(owner_id, staff_ids, lo, hi)
+    out = {}
+    for d in days:
+        w_start, w_end = _working_window(d)
+        out[d] = {sid: sweep_free(w_start, w_end, busy.get(sid, ())) for sid in staff_ids}
+    return out
+
+
+def free_gaps(owner_id, shop_id, days):
+    """
+    Lacunas livres por dia/profissional, com cache por (loja, dia).
+    Só os dias ausentes do cache são recalculados (em uma única query).
+    """
+    staff_ver = _version(_staff_version_key(owner_id))
+    keys = {
+        d: f"availability:gaps:{shop_id}:{d.isoformat()}:{staff_ver}:{_version(_day_version_key(owner_id, d))}"
+        for d in days
+    }
+    cached = cache.get_many(list(keys.values()))
+    result, missing = {}, []
+    for d in days:
+        if keys[d] in cached:
+            result[d] = cached[keys[d]]
+        else:
+            missing.append(d)
+    if missing:
+        computed = _compute_free_gaps(owner_id, shop_id, missing)
+        cache.set_many({keys[d]: computed[d] for d in missing}, CACHE_TIMEOUT)
+        result.update(computed)
+    return result
+
+
+def free_slots(owner, shop_id, start_day, days=7, product_ids=(), step_minutes=DEFAULT_STEP_MINUTES, not_before=None,
+               minutes=None):
+    """
+    Horários de início livres para a soma das durações de ``product_ids``
+    (ou ``minutes``, quando o chamador já conhece a duração):
+    [{"day", "staff_id", "staff_name", "slots": [datetime, ...]}].
+    """
+    owner_id = getattr(owner, "pk", owner)
+    need = timedelta(minutes=minutes or required_minutes(owner_id, product_ids))
+    step = timedelta(minutes=step_minutes)
+    not_before = not_before or timezone.now()
+    day_list = [start_day + timedelta(days=i) for i in range(days)]
+    gaps = free_gaps(owner_id, shop_id, day_list)
+    names = dict(shop_staff(owner_id, shop_id))
+
+    out = []
+    for d in day_list:
+        w_start, _ = _working_window(d)
+        for staff_id, free in gaps[d].items():
+            slots = []
+            for g_start, g_end in free:
+                t = _align(max(g_start, not_before), w_start, step)
+                while t + need <= g_end:
+                    slots.append(t)
+                    t += step
+            if slots:
+                out.append({"day": d, "staff_id": staff_id, "staff_name": names.get(staff_id, ""), "slots": slots})
+    return out
+
+
+def on_grid(start, minutes, step_minutes=DEFAULT_STEP_MINUTES):
+    """``start`` cai na grade de horários do dia e o atendimento termina dentro do expediente."""
+    w_start, w_end = _working_window(timezone.localtime(start).date())
+    step = timedelta(minutes=step_minutes)
+    return w_start <= start and start + timedelta(minutes=minutes) <= w_end and _align(start, w_start, step) == start
+
+
+def _align(t, origin, step):
+    """Arredonda ``t`` para cima na grade de ``step`` contada a partir de ``origin``."""
+    remainder = (t - origin) % step
+    return t if not remainder else t + (step - remainder)
@@ -0,0 +1,196 @@
+"""
+Agendamento online (público, sem login).
+
+Leitura: o catálogo da loja (serviços com preço efetivo, durações, equipe)
+é pré-calculado e guardado em cache sob uma versão por tenant, incrementada
+por qualquer gravação em Shop/Product/ProductPrice/Staff/StaffMembership.
+A página só consulta o banco quando a versão muda.
+
+Escrita: ``create_booking`` não usa ServiceOrderForm/formset; resolve preços
+e durações pelo catálogo em cache e grava cliente, comanda e itens com
+poucas queries (itens via bulk_create).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from core import sharding
+from core.sharding import tenant_atomic
+from cadastros.models import Shop, Product, ProductPrice, StaffMembership, Client
+from cadastros.utils import normalize_phone
+from . import availability
+from .models import ServiceOrder, ServiceItem
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+
+# ===== versão do catálogo =====
+def _version_key(owner_id):
+    return f"booking:catalog-version:{owner_id}"
+
+
+def catalog_version(owner_id):
+    version = cache.get(_version_key(owner_id))
+    if version is None:
+        cache.add(_version_key(owner_id), 1, None)
+        version = cache.get(_version_key(owner_id), 1)
+    return version
+
+
+def invalidate_catalog(owner_id):
+    try:
+        cache.incr(_version_key(owner_id))
+    except ValueError:
+        cache.add(_version_key(owner_id), 2, None)
+
+
+# ===== catálogo =====
+def _shop_owner_key(shop_id):
+    return f"booking:shop-owner:{shop_id}"
+
+
+def shop_owner_id(shop_id):
+    """owner_id de uma loja ativa (em cache; loja não muda de dono)."""
+    owner_id = cache.get(_shop_owner_key(shop_id))
+    if owner_id is None:
+        # a URL pública só traz a loja: procura em cada shard (uma vez; depois vem do cache)
+        for alias in sharding.shard_aliases():
+            owner_id = Shop.objects.using(alias).filter(pk=shop_id, is_active=True).values_list("owner_id", flat=True).first()
+            if owner_id is not None:
+                break
+        else:
+            return None
+        cache.set(_shop_owner_key(shop_id), owner_id, CATALOG_TIMEOUT)
+    return owner_id
+
+
+def build_catalog(shop_id, owner_id):
+    """
+    Monta o catálogo da loja (3 queries). Só tipos simples (str/int): vai
+    para o cache e direto para o template.
+    Serviço sem preço compartilhado só aparece se a loja tiver override.
+    """
+    shop = Shop.objects.filter(pk=shop_id, owner_id=owner_id, is_active=True).values("id", "name", "phone", "address").first()
+    if shop is None:
+        return None
+    overrides = dict(ProductPrice.objects.filter(owner_id=owner_id, shop_id=shop_id).values_list("product_id", "price"))
+    products = (
+        Product.objects.filter(owner_id=owner_id, is_active=True, type=Product.TYPE_SERVICE)
+        .values("id", "name", "description", "duration_minutes", "default_price", "share_across_shops")
+        .order_by("name")
+    )
+    services = [
+        {
+            "id": str(p["id"]),
+            "name": p["name"],
+            "description": p["description"],
+            "duration_minutes": p["duration_minutes"],
+            "price": str(overrides.get(p["id"], p["default_price"])),
+        }
+        for p in products
+        if p["share_across_shops"] or p["id"] in overrides
+    ]
+    staff = [
+        {"id": str(staff_id), "name": name or "Profissional"}
+        for staff_id, name in StaffMembership.objects.filter(
+            owner_id=owner_id, shop_id=shop_id, is_active=True, staff__is_active=True
+        ).values_list("staff_id", "staff__full_name").order_by("staff__full_name")
+    ]
+    return {
+        "shop": {k: str(v) for k, v in shop.items()},
+        "owner_id": owner_id,
+        "services": services,
+        "staff": staff,
+    }
+
+
+def get_catalog(shop_id):
+    """(catálogo, versão) da loja — do cache enquanto a versão não mudar."""
+    owner_id = shop_owner_id(shop_id)
+    if owner_id is None:
+        return None, None
+    sharding.activate(owner_id)  # request público: o tenant vem da loja
+    version = catalog_version(owner_id)
+    key = f"booking:catalog:{shop_id}:{version}"
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_catalog(shop_id, owner_id)
+        if catalog is None:
+            return None, None
+        cache.set(key, catalog, CATALOG_TIMEOUT)
+    return catalog, version
+
+
+def catalog_etag(shop_id, version, day):
+    """A página traz a data de hoje (valor/mínimo do campo): a virada do dia também muda o ETag."""
+    return f'"booking-{shop_id}-{version}-{day.isoformat()}"'
+
+
+# ===== limite de tentativas =====
+def allow_attempt(ip):
+    """Conta uma tentativa de confirmação do IP; False quando passou do limite da janela."""
+    key = f"booking:attempts:{ip}"
+    cache.add(key, 0, settings.BOOKING_RATE_WINDOW_SECONDS)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:  # expirou entre o add e o incr
+        cache.add(key, 1, settings.BOOKING_RATE_WINDOW_SECONDS)
+        attempts = 1
+    return attempts <= settings.BOOKING_RATE_LIMIT
+
+
+# ===== gravação =====
+@tenant_atomic()
+def create_booking(catalog, shop_id, product_ids, staff_id, start, name, phone, notes=""):
+    """
+    Cria cliente (se novo), comanda agendada e itens.
+    Preços e durações vêm do catálogo; o horário tem de ser um dos devolvidos
+    pelo motor de disponibilidade (em cache) e o teste de conflito (range
+    scan em staff+scheduled_for) confirma no banco.
+    """
+    owner_id = catalog["owner_id"]
+    services = {s["id"]: s for s in catalog["services"]}
+    chosen = [services[pid] for pid in product_ids if pid in services]
+    if not chosen or len(chosen) != len(product_ids):
+        raise ValidationError("Escolha ao menos um serviço válido.")
+    if staff_id not in {s["id"] for s in catalog["staff"]}:
+        raise ValidationError("Profissional indisponível nesta loja.")
+    phone = normalize_phone(phone)
+    name = (name or "").strip()
+    if len(phone) < 10:
+        raise ValidationError("Informe um telefone com DDD.")
+    if not name:
+        raise ValidationError("Informe seu nome.")
+    if start <= timezone.now():
+        raise ValidationError("Escolha um horário futuro.")
+
+    minutes = sum(s["duration_minutes"] for s in chosen) or settings.AGENDA_DEFAULT_DURATION_MINUTES
+    if not availability.on_grid(start, minutes):
+        raise ValidationError("Horário inválido. Escolha um dos horários disponíveis.")
+    day = timezone.localtime(start).date()
+    free = availability.free_slots(owner_id, shop_id, day, days=1, minutes=minutes)
+    if not any(str(r["staff_id"]) == staff_id and start in r["slots"] for r in free):
+        raise ValidationError("Este horário acabou de ser ocupado. Escolha outro.")
+    end = start + timedelta(minutes=minutes)
+    # o cache de disponibilidade pode estar defasado: a checagem no banco é a garantia final
+    if ServiceOrder.overlapping(owner_id, staff_id, start, end).exists():
+        raise ValidationError("Este horário acabou de ser ocupado. Escolha outro.")
+
+    client, _ = Client.objects.get_or_create(owner_id=owner_id, phone=phone, defaults={"name": name})
+    subtotal = sum((Decimal(s["price"]) for s in chosen), Decimal("0.00"))
+    order = ServiceOrder.objects.create(
+        owner_id=owner_id, shop_id=shop_id, client=client, staff_id=staff_id,
+        scheduled_for=start, scheduled_end=end, status=ServiceOrder.STATUS_SCHEDULED,
+        subtotal=subtotal, total_amount=subtotal,
+        notes=("Agendamento online. " + notes).strip(),
+    )
+    # bulk_create não chama ServiceItem.save (sem autofill nem recálculo por item)
+    ServiceItem.objects.bulk_create([
+        ServiceItem(owner_id=owner_id, order=order, product_id=s["id"], qty=1, unit_price=Decimal(s["price"]))
+        for s in chosen
+    ])
+    return order
@@ -0,0 +1,139 @@
+"""
+Exportação contábil de comandas (CSV/XLSX) em streaming.
+
+Uma única query (ServiceOrder LEFT JOIN itens/produto/loja/cliente/staff),
+lida com ``.iterator(chunk_size=...)``: a memória fica constante não importa
+quantas linhas o período tenha. A ordenação por (created_at, id) permite
+retomar uma exportação interrompida a partir da última comanda escrita.
+"""
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ServiceOrder, ArchivedServiceOrder
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (cabeçalho, campo do values_list)
+EXPORT_COLUMNS = (
+    ("comanda", "id"),
+    ("criada_em", "created_at"),
+    ("finalizada_em", "finished_at"),
+    ("status", "status"),
+    ("loja", "shop__name"),
+    ("cliente", "client__name"),
+    ("telefone_cliente", "client__phone"),
+    ("profissional", "staff__full_name"),
+    ("email_profissional", "staff__user__email"),
+    ("forma_pagamento", "payment_method"),
+    ("subtotal", "subtotal"),
+    ("desconto", "discount_amount"),
+    ("total", "total_amount"),
+    ("valor_pago", "amount_paid"),
+    ("item", "items__product__name"),
+    ("qtd", "items__qty"),
+    ("preco_unit", "items__unit_price"),
+)
+HEADER = [c[0] for c in EXPORT_COLUMNS] + ["total_item"]
+
+_STATUS_LABELS = dict(ServiceOrder.STATUS_CHOICES)
+_PAYMENT_LABELS = dict(ServiceOrder.PAYMENT_CHOICES)
+
+
+def _day_start(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def export_queryset(owner, start=None, end=None, shop_id=None, after=None, archived=False):
+    """
+    Linhas (tuplas) no grão de item; comandas sem item saem uma vez com as
+    colunas de item vazias. ``start``/``end`` são datas inclusivas sobre
+    created_at; ``after`` é o id da última comanda já exportada;
+    ``archived`` lê as comandas arquivadas em vez das tabelas quentes.
+    """
+    model = ArchivedServiceOrder if archived else ServiceOrder
+    qs = model.objects.filter(owner=owner)
+    if start:
+        qs = qs.filter(created_at__gte=_day_start(start))
+    if end:
+        qs = qs.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+    if shop_id:
+        qs = qs.filter(shop_id=shop_id)
+    if after:
+        last = model.objects.filter(owner=owner, pk=after).values_list("created_at", flat=True).first()
+        if last is not None:
+            qs = qs.filter(Q(created_at__gt=last) | Q(created_at=last, id__gt=after))
+    return qs.order_by("created_at", "id").values_list(*(c[1] for c in EXPORT_COLUMNS))
+
+
+def iter_export_rows(owner, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Gera as linhas já formatadas (strings) para CSV/XLSX."""
+    rows = export_queryset(owner, **filters).iterator(chunk_size=chunk_size)
+    for row in rows:
+        (order_id, created_at, finished_at, status, shop, client, client_phone,
+         staff, staff_email, payment, subtotal, discount, total, paid,
+         item, qty, unit_price) = row
+        item_total = (qty * unit_price) if qty is not None and unit_price is not None else None
+        yield [
+            str(order_id),
+            timezone.localtime(created_at).isoformat(timespec="seconds"),
+            timezone.localtime(finished_at).isoformat(timespec="seconds") if finished_at else "",
+            _STATUS_LABELS.get(status, status),
+            shop or "",
+            client or "",
+            client_phone or "",
+            staff or staff_email or "",
+            staff_email or "",
+            _PAYMENT_LABELS.get(payment, payment or ""),
+            _fmt(subtotal), _fmt(discount), _fmt(total), _fmt(paid),
+            item or "",
+            "" if qty is None else str(qty),
+            _fmt(unit_price),
+            _fmt(item_total),
+        ]
+
+
+def _fmt(value):
+    if value is None:
+        return ""
+    return str(Decimal(value).quantize(Decimal("0.01")))
+
+
+class Echo:
+    """Pseudo-buffer: csv.writer escreve e devolvemos a linha para o streaming."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo(), delimiter=";")
+    yield "\ufeff" + writer.writerow(HEADER)  # BOM: Excel abre UTF-8 corretamente
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows, fileobj=None):
+    """
+    Escreve um XLSX em modo write_only (memória constante) num arquivo
+    temporário e devolve o arquivo posicionado no início.
+    Requer o pacote opcional ``openpyxl``.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError as exc:
+        raise ImproperlyConfigured("Exportação XLSX requer o pacote 'openpyxl'.") from exc
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("comandas")
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    out = fileobj or tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
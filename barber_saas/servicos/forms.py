@@ -7,7 +7,10 @@ from .models import ServiceOrder, ServiceItem, Client
 from cadastros.forms import (
     TenantOwnedForm,
     CommaDecimalField,
+    TenantModelChoiceField,
 )  # sua base que injeta owner/current_user
+from cadastros import lookups
+from core import identity
 from django.forms.models import BaseInlineFormSet  # <- importante
 
 class ServiceOrderForm(TenantOwnedForm):
@@ -17,15 +20,16 @@ class ServiceOrderForm(TenantOwnedForm):
         model = ServiceOrder
         fields = [
             "shop", "client",
-            "staff", "scheduled_for", "status",
+            "staff", "scheduled_for", "scheduled_end", "status",
             "discount_amount", "payment_method", "amount_paid", "notes",
         ]
+        field_classes = {"shop": TenantModelChoiceField, "client": TenantModelChoiceField, "staff": TenantModelChoiceField}
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         owner = getattr(self.instance, "owner", None)
         if owner:
-            self.fields["shop"].queryset = Shop.objects.for_user(owner)
-            self.fields["staff"].queryset = Staff.objects.filter(owner=owner, is_active=True)
+            self.fields["shop"].queryset = lookups.shop_choices(owner.pk)
+            self.fields["staff"].queryset = lookups.staff_choices(owner.pk)
             self.fields["client"].queryset = Client.objects.filter(owner=owner, is_active=True).order_by("name")
         if not self.instance.pk:
             self.fields["status"].initial = ServiceOrder.STATUS_IN_PROGRESS
@@ -50,6 +54,7 @@ class ServiceItemForm(TenantOwnedForm):
     class Meta:
         model = ServiceItem
         fields = ["product", "qty", "unit_price"]
+        field_classes = {"product": TenantModelChoiceField}
 
     def __init__(self, *args, owner=None, current_user=None, **kwargs):
         """
@@ -64,12 +69,9 @@ class ServiceItemForm(TenantOwnedForm):
         # tenta pegar do instance (quando edição) ou do override (quando criação)
         owner_obj = getattr(self.instance, "owner", None) or self._owner_override
 
-        # Se você tem um manager .for_user, use; senão filtre por owner/is_active
+        # catálogo ativo do tenant (core.localcache; uma leitura para todas as linhas)
         if owner_obj:
-            try:
-                qs = Product.objects.for_user(owner_obj).filter(is_active=True)
-            except AttributeError:
-                qs = Product.objects.filter(owner=owner_obj, is_active=True)
+            qs = lookups.catalog_choices(owner_obj.pk)
         else:
             qs = Product.objects.none()
 
@@ -77,7 +79,8 @@ class ServiceItemForm(TenantOwnedForm):
 
         # Map product IDs to their default prices so the frontend can
         # automatically fill the unit price when a product is chosen.
-        prices = {str(p.pk): str(p.default_price) for p in qs}
+        # (identity map: a lista sai uma vez só para todas as linhas do formset)
+        prices = {str(p.pk): str(p.default_price) for p in identity.warm(qs)}
         self.fields["product"].widget.attrs["data-prices"] = json.dumps(prices)
 
         val = self.initial.get("unit_price")
@@ -109,3 +112,13 @@ ServiceItemFormSet = inlineformset_factory(
     formset=OwnerInlineFormSet,   # <- usa o formset custom
     extra=3, can_delete=True, min_num=1, validate_min=True
 )
+
+
+# ===== Exportação contábil =====
+class OrderExportFilterForm(forms.Form):
+    """Parâmetros da query string da exportação e do histórico (data/UUID inválido vira 400, não 500)."""
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    shop = forms.UUIDField(required=False)
+    after = forms.UUIDField(required=False)
+    format = forms.ChoiceField(choices=[("csv", "CSV"), ("xlsx", "XLSX")], required=False)
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import sharding
+from servicos import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move comandas concluídas/canceladas antigas (e seus itens) para as "
+        "tabelas de arquivo, em lotes. Pode ser interrompido e reexecutado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Idade mínima (dias desde a conclusão).")
+        parser.add_argument("--owner", help="E-mail do owner (padrão: todos).")
+        parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **opts):
+        owner = None
+        if opts["owner"]:
+            owner = get_user_model().objects.filter(email=opts["owner"]).first()
+            if owner is None:
+                raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        cutoff = timezone.now() - timedelta(days=opts["days"])
+        aliases = [sharding.shard_for(owner.pk)] if owner else sharding.shard_aliases()
+        total = 0
+        for alias in aliases:
+            with sharding.shard(alias):
+                total += archive.archive(
+                    cutoff, owner=owner, batch_size=opts["batch_size"],
+                    progress=lambda n, alias=alias: self.stderr.write(f"{alias}: arquivadas={n}"),
+                )
+        self.stdout.write(f"{total} comanda(s) arquivada(s).")
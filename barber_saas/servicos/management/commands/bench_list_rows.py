@@ -0,0 +1,71 @@
+import math
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastros.models import Client, Product, StaffMembership
+from cadastros.rows import ClientRow, MembershipRow, ProductRow
+from core import sharding
+from servicos.models import ServiceOrder
+from servicos.rows import OrderRow
+
+# tabela -> (modelo, select_related de antes, linha projetada)
+TABLES = {
+    "produtos": (Product, (), ProductRow),
+    "clientes": (Client, (), ClientRow),
+    "equipe": (StaffMembership, ("staff__user", "shop"), MembershipRow),
+    "comandas": (ServiceOrder, ("shop", "client", "staff__user"), OrderRow),
+}
+
+
+def columns(qs):
+    compiler = qs.query.get_compiler(using=qs.db)
+    compiler.setup_query()
+    return len(compiler.select)
+
+
+def measure(qs, repeat):
+    """(melhor tempo, pico de memória) de carregar a lista inteira."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(qs.all())
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    rows = list(qs.all())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, len(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara, só com leituras, as listas carregadas como modelo inteiro e como "
+        "linhas projetadas (core.rows): colunas no SELECT, tempo e pico de memória."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="E-mail do owner (tenant).")
+        parser.add_argument("--repeat", type=int, default=5, help="Repetições (vale a melhor).")
+
+    def handle(self, *args, **opts):
+        owner = get_user_model().objects.filter(email=opts["owner"]).first()
+        if owner is None:
+            raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        repeat = max(opts["repeat"], 1)
+
+        self.stdout.write(f"{'tabela':<10} {'linhas':>7} {'colunas':>9} {'tempo (ms)':>17} {'memória (KiB)':>19}")
+        with sharding.tenant(owner):
+            for label, (model, related, row) in TABLES.items():
+                base = model.objects.filter(owner=owner)
+                full = base.select_related(*related)
+                projected = base.rows(row)
+                full_time, full_peak, count = measure(full, repeat)
+                rows_time, rows_peak, _ = measure(projected, repeat)
+                self.stdout.write(
+                    f"{label:<10} {count:>7} {columns(full):>4} → {columns(projected):<2} "
+                    f"{full_time * 1000:>7.1f} → {rows_time * 1000:<7.1f} "
+                    f"{full_peak / 1024:>8.1f} → {rows_peak / 1024:<8.1f}"
+                )
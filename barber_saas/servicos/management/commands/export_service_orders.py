@@ -0,0 +1,85 @@
+import csv
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import sharding
+from servicos import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta comandas + itens de um tenant em CSV/XLSX com memória constante. "
+        "No CSV o cursor (última comanda completa) é reportado a cada bloco; "
+        "use --after <cursor> para retomar anexando ao mesmo arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="E-mail do owner (tenant).")
+        parser.add_argument("--start", help="Data inicial (AAAA-MM-DD), inclusiva.")
+        parser.add_argument("--end", help="Data final (AAAA-MM-DD), inclusiva.")
+        parser.add_argument("--shop", help="UUID da loja.")
+        parser.add_argument("--after", help="Retoma após esta comanda (cursor).")
+        parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+        parser.add_argument("--output", help="Arquivo de saída (padrão: stdout, só CSV).")
+        parser.add_argument("--chunk-size", type=int, default=exports.DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--archived", action="store_true", help="Exporta as comandas arquivadas.")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        owner = User.objects.filter(email=opts["owner"]).first()
+        if owner is None:
+            raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        sharding.activate(owner)
+
+        filters = {"shop_id": opts["shop"], "after": opts["after"], "archived": opts["archived"]}
+        for key in ("start", "end"):
+            if opts[key]:
+                filters[key] = parse_date(opts[key])
+                if filters[key] is None:
+                    raise CommandError(f"Data inválida em --{key}: {opts[key]}")
+
+        rows = exports.iter_export_rows(owner, chunk_size=opts["chunk_size"], **filters)
+
+        if opts["format"] == "xlsx":
+            if not opts["output"]:
+                raise CommandError("XLSX exige --output.")
+            with open(opts["output"], "wb") as fh:
+                exports.write_xlsx(rows, fileobj=fh)
+            return
+
+        resuming = bool(opts["after"])
+        if opts["output"]:
+            fh = open(opts["output"], "a" if resuming else "w", encoding="utf-8", newline="")
+        else:
+            fh = sys.stdout
+        try:
+            self._write_csv(fh, rows, opts["chunk_size"], header=not resuming)
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
+
+    def _write_csv(self, fh, rows, chunk_size, header=True):
+        writer = csv.writer(fh, delimiter=";")
+        if header:
+            writer.writerow(exports.HEADER)
+        # Escreve comandas inteiras: as linhas de uma comanda ficam em buffer
+        # até a próxima começar, então o cursor sempre aponta para uma comanda completa.
+        pending, current, written = [], None, 0
+        for row in rows:
+            if row[0] != current and pending:
+                writer.writerows(pending)
+                written += len(pending)
+                pending = []
+                if written >= chunk_size:
+                    fh.flush()
+                    self.stderr.write(f"cursor={current} linhas={written}")
+                    written = 0
+            current = row[0]
+            pending.append(row)
+        if pending:
+            writer.writerows(pending)
+            fh.flush()
+            self.stderr.write(f"cursor={current} concluído")
@@ -0,0 +1,41 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import sharding
+from servicos import archive
+
+
+class Command(BaseCommand):
+    help = "Devolve comandas arquivadas de um owner às tabelas quentes (por id ou período de criação)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="E-mail do owner (tenant).")
+        parser.add_argument("--id", action="append", dest="ids", help="UUID da comanda (repetível).")
+        parser.add_argument("--start", help="Data inicial (AAAA-MM-DD), inclusiva.")
+        parser.add_argument("--end", help="Data final (AAAA-MM-DD), inclusiva.")
+        parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **opts):
+        owner = get_user_model().objects.filter(email=opts["owner"]).first()
+        if owner is None:
+            raise CommandError(f"Owner não encontrado: {opts['owner']}")
+        sharding.activate(owner)
+        if not (opts["ids"] or opts["start"] or opts["end"]):
+            raise CommandError("Informe --id ou --start/--end.")
+        bounds = {}
+        for key, shift in (("start", 0), ("end", 1)):
+            if opts[key]:
+                d = parse_date(opts[key])
+                if d is None:
+                    raise CommandError(f"Data inválida em --{key}: {opts[key]}")
+                bounds[key] = timezone.make_aware(datetime.combine(d + timedelta(days=shift), time.min))
+        total = archive.restore(
+            owner, ids=opts["ids"], batch_size=opts["batch_size"],
+            progress=lambda n: self.stderr.write(f"restauradas={n}"), **bounds,
+        )
+        self.stdout.write(f"{total} comanda(s) restaurada(s).")
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_client'),
+        ('servicos', '0002_remove_serviceorder_customer_name_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='servicos_se_owner_i_fdc587_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_client'),
+        ('servicos', '0003_serviceorder_owner_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['shop', 'status', 'finished_at'], name='servicos_se_shop_id_23a384_idx'),
+        ),
+    ]
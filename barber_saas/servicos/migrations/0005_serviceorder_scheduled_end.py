@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_client'),
+        ('servicos', '0004_serviceorder_shop_status_finished_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceorder',
+            name='scheduled_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['staff', 'scheduled_for'], name='servicos_se_staff_i_5af8e5_idx'),
+        ),
+    ]
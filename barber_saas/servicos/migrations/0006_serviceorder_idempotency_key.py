@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0004_product_duration_minutes'),
+        ('servicos', '0005_serviceorder_scheduled_end'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceorder',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='serviceorder',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('owner', 'idempotency_key'), name='serviceorder_owner_idempotency_uniq'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0005_sync_indexes'),
+        ('servicos', '0006_serviceorder_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceitem',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='servicos_se_owner_i_0ca362_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='servicos_se_owner_i_18466f_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0005_sync_indexes'),
+        ('servicos', '0007_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedServiceOrder',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('scheduled_for', models.DateTimeField(blank=True, null=True)),
+                ('scheduled_end', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Agendado'), ('in_progress', 'Em andamento'), ('done', 'Concluído'), ('canceled', 'Cancelado')], max_length=16)),
+                ('payment_method', models.CharField(blank=True, choices=[('cash', 'Dinheiro'), ('card', 'Cartão'), ('pix', 'PIX'), ('transfer', 'Transferência'), ('other', 'Outro')], max_length=16)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('notes', models.TextField(blank=True)),
+                ('idempotency_key', models.CharField(blank=True, max_length=64)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cadastros.client')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='cadastros.shop')),
+                ('staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cadastros.staff')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedServiceItem',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('qty', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_items', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cadastros.product')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='servicos.archivedserviceorder')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedserviceorder',
+            index=models.Index(fields=['owner', 'finished_at'], name='servicos_ar_owner_i_a4d8c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedserviceorder',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='servicos_ar_owner_i_7a1586_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedserviceorder',
+            index=models.Index(fields=['owner', 'idempotency_key'], name='servicos_ar_owner_i_63c336_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedserviceitem',
+            index=models.Index(fields=['order'], name='servicos_ar_order_i_1abb79_idx'),
+        ),
+    ]
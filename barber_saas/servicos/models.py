@@ -1,8 +1,12 @@
+from datetime import timedelta
 from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from cadastros.models import Shop, Product, ProductPrice, Staff, Client
+from core import identity, sharding
 from core.models import TenantOwnedModel, UUIDModel, TimeStampedModel, TenantQuerySet
 
 
@@ -39,6 +43,7 @@ class ServiceOrder(TenantOwnedModel):
     staff = models.ForeignKey(Staff, null=True, blank=True, on_delete=models.SET_NULL, related_name="orders")
 
     scheduled_for = models.DateTimeField(null=True, blank=True)
+    scheduled_end = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
 
@@ -51,19 +56,134 @@ class ServiceOrder(TenantOwnedModel):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
 
     notes = models.TextField(blank=True)
+    # chave enviada por integrações (PDV) para que reenvios não dupliquem a comanda
+    idempotency_key = models.CharField(max_length=64, blank=True)
 
     class Meta:
         ordering = ("-created_at",)
-        indexes = [models.Index(fields=["shop", "status", "scheduled_for"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "idempotency_key"],
+                condition=~Q(idempotency_key=""),
+                name="serviceorder_owner_idempotency_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["shop", "status", "scheduled_for"]),
+            # varredura por período (exportação contábil): owner + created_at + id
+            models.Index(fields=["owner", "created_at", "id"]),
+            # fechamento de caixa: comandas concluídas da loja por faixa de horário
+            models.Index(fields=["shop", "status", "finished_at"]),
+            # agenda: conflitos por profissional em faixa de horário
+            models.Index(fields=["staff", "scheduled_for"]),
+            # sync incremental (cursor updated_at + id)
+            models.Index(fields=["owner", "updated_at", "id"]),
+        ]
+
+    # campos cujo valor "antes da gravação" interessa aos receivers (fatos, disponibilidade)
+    TRACKED_FIELDS = ("owner_id", "shop_id", "staff_id", "status", "scheduled_for", "scheduled_end",
+                      "finished_at", "created_at")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # guarda os valores carregados para comparar no save sem nova query
+        instance._loaded_values = {f: getattr(instance, f) for f in cls.TRACKED_FIELDS if f in field_names}
+        return instance
+
+    def get_previous_values(self):
+        """Valores persistidos antes desta gravação (None se for criação)."""
+        if self._state.adding:
+            return None
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is not None and len(loaded) == len(self.TRACKED_FIELDS):
+            return loaded
+        return type(self).objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
 
     def clean(self):
         super().clean()
-        if self.shop_id and self.owner_id and self.shop.owner_id != self.owner_id:
+        if self.shop_id and self.owner_id and identity.related(self, "shop").owner_id != self.owner_id:
             raise ValidationError("A ordem deve pertencer ao mesmo owner da loja.")
         if self.discount_amount and self.discount_amount < 0:
             raise ValidationError("Desconto inválido.")
         if self.amount_paid and self.amount_paid < 0:
             raise ValidationError("Valor pago inválido.")
+        self.clean_schedule()
+
+    def clean_schedule(self):
+        """Valida o intervalo agendado e impede dois atendimentos sobrepostos do mesmo profissional."""
+        if not self.scheduled_for:
+            return
+        self.shift_scheduled_end()
+        end = self.get_scheduled_end()
+        if end <= self.scheduled_for:
+            raise ValidationError({"scheduled_end": "O término deve ser depois do início."})
+        if end - self.scheduled_for > timedelta(minutes=settings.AGENDA_MAX_DURATION_MINUTES):
+            raise ValidationError({"scheduled_end": "Atendimento mais longo que o permitido."})
+        if self.staff_id and self.status != self.STATUS_CANCELED:
+            other = self.overlapping(self.owner_id, self.staff_id, self.scheduled_for, end, exclude_pk=self.pk).first()
+            if other is not None:
+                start_other = timezone.localtime(other.scheduled_for)
+                end_other = timezone.localtime(other.get_scheduled_end())
+                raise ValidationError({"scheduled_for": (
+                    f"Conflito de horário: o profissional já tem atendimento "
+                    f"das {start_other:%H:%M} às {end_other:%H:%M}."
+                )})
+
+    def shift_scheduled_end(self):
+        """
+        Remarcação: se o início mudou e o término ficou o carregado do banco, o
+        término anda junto (mesma duração). Devolve True quando ajustou.
+        """
+        loaded = getattr(self, "_loaded_values", None) or {}
+        before, before_end = loaded.get("scheduled_for"), loaded.get("scheduled_end")
+        if not (before and before_end and self.scheduled_for) or self.scheduled_for == before:
+            return False
+        if self.scheduled_end != before_end:
+            return False  # término informado junto com o novo início
+        self.scheduled_end = before_end + (self.scheduled_for - before)
+        return True
+
+    def get_scheduled_end(self):
+        if not self.scheduled_for:
+            return None
+        return self.scheduled_end or self.scheduled_for + timedelta(minutes=settings.AGENDA_DEFAULT_DURATION_MINUTES)
+
+    @classmethod
+    def overlapping(cls, owner_id, staff_id, start, end, exclude_pk=None):
+        """
+        Agendamentos do profissional que cruzam [start, end).
+        A faixa em scheduled_for é limitada por baixo pela duração máxima, então
+        a busca é um range scan no índice (staff, scheduled_for) — não varre o histórico.
+        """
+        max_len = timedelta(minutes=settings.AGENDA_MAX_DURATION_MINUTES)
+        default_len = timedelta(minutes=settings.AGENDA_DEFAULT_DURATION_MINUTES)
+        qs = cls.objects.filter(
+            owner_id=owner_id, staff_id=staff_id,
+            scheduled_for__lt=end, scheduled_for__gt=start - max_len,
+        ).filter(
+            Q(scheduled_end__gt=start) | Q(scheduled_end__isnull=True, scheduled_for__gt=start - default_len)
+        ).exclude(status=cls.STATUS_CANCELED)
+        if exclude_pk:
+            qs = qs.exclude(pk=exclude_pk)
+        return qs.order_by("scheduled_for")
+
+    def save(self, *args, **kwargs):
+        touched = set()
+        # comanda concluída sem horário de término: carimba agora (dia de caixa)
+        if self.status == self.STATUS_DONE and not self.finished_at:
+            self.finished_at = timezone.now()
+            touched.add("finished_at")
+        if self.shift_scheduled_end():
+            touched.add("scheduled_end")
+        # agendamento sem término explícito ocupa a duração padrão
+        if self.scheduled_for and not self.scheduled_end:
+            self.scheduled_end = self.get_scheduled_end()
+            touched.add("scheduled_end")
+        if touched and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], *touched}
+        super().save(*args, **kwargs)
+        self._loaded_values = {f: getattr(self, f) for f in self.TRACKED_FIELDS}
 
     def recalc_totals(self):
         items = self.items.all()
@@ -81,14 +201,17 @@ class ServiceItem(TenantOwnedModel):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
 
     class Meta:
-        indexes = [models.Index(fields=["order"])]
+        indexes = [
+            models.Index(fields=["order"]),
+            models.Index(fields=["owner", "updated_at", "id"]),
+        ]
 
     def clean(self):
         super().clean()
         # valida tenant chain
         if self.order_id and self.owner_id and self.order.owner_id != self.owner_id:
             raise ValidationError("Item e Ordem devem pertencer ao mesmo owner.")
-        if self.product_id and self.owner_id and self.product.owner_id != self.owner_id:
+        if self.product_id and self.owner_id and identity.related(self, "product").owner_id != self.owner_id:
             raise ValidationError("Produto deve pertencer ao mesmo owner.")
         if self.qty <= 0:
             raise ValidationError("Quantidade deve ser positiva.")
@@ -97,19 +220,84 @@ class ServiceItem(TenantOwnedModel):
         """Se unit_price for 0, tenta precificar a partir do ProductPrice da loja, senão default."""
         if self.unit_price and self.unit_price > 0:
             return
-        shop = self.order.shop
+        shop = identity.related(self.order, "shop")
         # tenta override
         pp = ProductPrice.objects.filter(owner=self.owner, product=self.product, shop=shop).first()
-        self.unit_price = (pp.price if pp else self.product.default_price) or Decimal("0.00")
+        self.unit_price = (pp.price if pp else identity.related(self, "product").default_price) or Decimal("0.00")
 
     def save(self, *args, **kwargs):
         creating = self._state.adding
         self.autofill_price_if_needed()
-        super().save(*args, **kwargs)
-        # Recalcula totais da ordem
-        if self.order_id:
-            self.order.recalc_totals()
-            ServiceOrder.objects.filter(pk=self.order_id).update(
-                subtotal=self.order.subtotal,
-                total_amount=self.order.total_amount
-            )
+        # item + totais da ordem num bloco só: quem escuta o commit (relatorios.facts)
+        # vê a comanda já com os totais novos
+        with sharding.tenant_atomic():
+            super().save(*args, **kwargs)
+            # Recalcula totais da ordem
+            if self.order_id:
+                self.order.recalc_totals()
+                ServiceOrder.objects.filter(pk=self.order_id).update(
+                    subtotal=self.order.subtotal,
+                    total_amount=self.order.total_amount,
+                    updated_at=timezone.now(),  # update() não aplica auto_now; o sync depende dele
+                )
+
+
+# ===== Arquivo (comandas antigas fechadas) =====
+class ArchivedServiceOrder(models.Model):
+    """
+    Comanda concluída/cancelada movida para fora da tabela quente
+    (ver servicos.archive). Mesmas colunas de ServiceOrder; somente leitura.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_orders")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, related_name="archived_orders")
+    client = models.ForeignKey(Client, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    staff = models.ForeignKey(Staff, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    scheduled_end = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=16, choices=ServiceOrder.STATUS_CHOICES)
+    payment_method = models.CharField(max_length=16, choices=ServiceOrder.PAYMENT_CHOICES, blank=True)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    notes = models.TextField(blank=True)
+    idempotency_key = models.CharField(max_length=64, blank=True)
+
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["owner", "finished_at"]),
+            models.Index(fields=["owner", "created_at", "id"]),
+            models.Index(fields=["owner", "idempotency_key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} - {self.created_at:%d/%m/%Y}"
+
+
+class ArchivedServiceItem(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_items")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    order = models.ForeignKey(ArchivedServiceOrder, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="+")
+    qty = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["order"])]
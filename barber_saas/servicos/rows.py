@@ -0,0 +1,13 @@
+"""Linhas leves (core.rows) das tabelas de comandas."""
+from cadastros.rows import ClientRow, ShopRef, StaffRef
+from core.rows import Row
+from .models import ServiceOrder
+
+
+class OrderRow(Row):
+    model = ServiceOrder
+    related = {"client": ClientRow, "shop": ShopRef, "staff": StaffRef}
+    __slots__ = ("pk", "updated_at", "status", "total_amount", "client_id", "client", "shop", "staff")
+
+    def get_status_display(self):
+        return self.display("status")
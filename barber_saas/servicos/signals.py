@@ -0,0 +1,79 @@
+"""
+Invalidação do cache de disponibilidade: qualquer mudança de agendamento
+incrementa a versão dos dias afetados (antes e depois da edição); mudanças
+de equipe incrementam a versão da lista de profissionais do tenant.
+Mudanças de loja/serviço/preço/equipe invalidam o catálogo do agendamento online.
+Tudo no commit: invalidar antes deixaria outro request recalcular (e guardar)
+o cache com os dados antigos enquanto a transação ainda não terminou.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from core import sharding
+from cadastros.models import Shop, Staff, StaffMembership, Product, ProductPrice
+from cadastros.signals import catalog_bulk_changed, staff_bulk_changed
+from .models import ServiceOrder
+from . import availability, booking
+
+# enviado após bulk_create de comandas (api.ingest_orders), que não dispara post_save;
+# kwargs: owner_id, orders
+orders_bulk_created = Signal()
+
+
+@receiver(post_save, sender=ServiceOrder)
+@receiver(post_delete, sender=ServiceOrder)
+def order_schedule_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    days = set()
+    if instance.scheduled_for:
+        days.add(timezone.localdate(instance.scheduled_for))
+    previous = getattr(instance, "_loaded_values", None)
+    if previous and previous.get("scheduled_for"):
+        days.add(timezone.localdate(previous["scheduled_for"]))
+    owner_id = instance.owner_id
+
+    def invalidate():
+        for day in days:
+            availability.invalidate_day(owner_id, day)
+    sharding.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+@receiver(post_save, sender=StaffMembership)
+@receiver(post_delete, sender=StaffMembership)
+def staff_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        owner_id = instance.owner_id
+        sharding.on_commit(lambda: availability.invalidate_staff(owner_id))
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+@receiver(post_save, sender=StaffMembership)
+@receiver(post_delete, sender=StaffMembership)
+def catalog_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        owner_id = instance.owner_id
+        sharding.on_commit(lambda: booking.invalidate_catalog(owner_id))
+
+
+@receiver(catalog_bulk_changed)
+def catalog_bulk_changed_receiver(sender, owner_id, **kwargs):
+    sharding.on_commit(lambda: booking.invalidate_catalog(owner_id))
+
+
+@receiver(staff_bulk_changed)
+def staff_bulk_changed_receiver(sender, owner_id, **kwargs):
+    def invalidate():
+        availability.invalidate_staff(owner_id)
+        booking.invalidate_catalog(owner_id)
+    sharding.on_commit(invalidate)
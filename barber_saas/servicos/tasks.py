@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage
+from django.utils.dateparse import parse_date
+
+from core import sharding
+from core.queue import task
+from . import exports
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@task(priority=-5)
+def export_orders_xlsx(owner_id, start=None, end=None, shop_id=None):
+    """Gera o XLSX fora do request e envia para o e-mail do owner."""
+    owner = get_user_model().objects.get(pk=owner_id)
+    start, end = parse_date(start) if start else None, parse_date(end) if end else None
+    with sharding.tenant(owner_id):
+        fh = exports.write_xlsx(exports.iter_export_rows(owner, start=start, end=end, shop_id=shop_id))
+    stamp = "_".join(str(d) for d in (start, end) if d) or "completo"
+    with fh:
+        message = EmailMessage(
+            "Exportação de comandas",
+            "Segue em anexo a exportação de comandas solicitada.",
+            settings.DEFAULT_FROM_EMAIL, [owner.email],
+        )
+        message.attach(f"comandas_{stamp}.xlsx", fh.read(), XLSX_MIME)
+        message.send()
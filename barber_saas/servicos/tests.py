@@ -1,14 +1,34 @@
+from datetime import datetime, timedelta
 from decimal import Decimal
+from io import StringIO
 import json
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from django.test import TestCase
+from accounts.models import ApiToken
+from cadastros.forms import ClientForm
+from cadastros.models import Shop, Staff, StaffMembership, Client, Product, ProductPrice
+from core import fragments, identity, localcache, queue
+from core.models import Tombstone
+from relatorios import facts
+from relatorios.models import DailyOrderFact
+from servicos.models import ServiceOrder, ServiceItem, ArchivedServiceOrder, ArchivedServiceItem
 
-from cadastros.models import Shop, Staff, Client, Product
-from servicos.models import ServiceOrder, ServiceItem
-
-from .forms import ServiceOrderForm, ServiceItemForm
+from . import archive
+from .availability import free_slots, sweep_free
+from .exports import iter_export_rows
+from .forms import ServiceOrderForm, ServiceItemForm, ServiceItemFormSet
+from .rows import OrderRow
 
 
 class CommaDecimalFieldFormTests(TestCase):
@@ -81,3 +101,472 @@ class CommaDecimalFieldFormTests(TestCase):
         self.assertEqual(prices[str(self.product.pk)], str(self.product.default_price))
 
 
+
+class IdentityMapValidationTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Shop")
+        self.products = [Product.objects.create(owner=self.owner, name=f"P{i}") for i in range(3)]
+
+    def _validate(self, rows):
+        localcache.clear()
+        data = {"shop": self.shop.pk, "status": ServiceOrder.STATUS_IN_PROGRESS,
+                "items-TOTAL_FORMS": rows, "items-INITIAL_FORMS": 0, "items-MIN_NUM_FORMS": 1, "items-MAX_NUM_FORMS": 1000}
+        for i in range(rows):
+            data.update({f"items-{i}-product": self.products[i % 3].pk, f"items-{i}-qty": 1, f"items-{i}-unit_price": "10,00"})
+        with identity.scope(), CaptureQueriesContext(connection) as ctx:
+            form = ServiceOrderForm(data=data, instance=ServiceOrder(owner=self.owner))
+            formset = ServiceItemFormSet(data, instance=form.instance, owner=self.owner)
+            self.assertTrue(form.is_valid(), form.errors)
+            self.assertTrue(formset.is_valid(), formset.errors)
+        return len(ctx.captured_queries)
+
+    def test_validation_cost_does_not_grow_with_rows(self):
+        self.assertEqual(self._validate(2), self._validate(10))
+
+    def test_unknown_product_is_rejected(self):
+        other = get_user_model().objects.create_user("other@example.com", "pass")
+        foreign = Product.objects.create(owner=other, name="Alheio")
+        with identity.scope():
+            form = ServiceItemForm(data={"product": foreign.pk, "qty": 1, "unit_price": "1"}, owner=self.owner)
+            self.assertIn("product", form.errors)
+
+
+class ServiceOrderExportTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.client_obj = Client.objects.create(owner=self.owner, name="Ana", phone="119")
+        self.product = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.orders = []
+        for _ in range(3):
+            order = ServiceOrder.objects.create(owner=self.owner, shop=self.shop, client=self.client_obj)
+            ServiceItem.objects.create(owner=self.owner, order=order, product=self.product, qty=2)
+            self.orders.append(order)
+
+    def test_rows_come_from_a_single_query(self):
+        with self.assertNumQueries(1):
+            rows = list(iter_export_rows(self.owner))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][4], "Centro")
+        self.assertEqual(rows[0][-1], "80.00")
+
+    def test_after_cursor_resumes_export(self):
+        ordered = sorted(self.orders, key=lambda o: (o.created_at, o.id.hex))
+        rows = list(iter_export_rows(self.owner, after=str(ordered[0].pk)))
+        self.assertEqual([r[0] for r in rows], [str(o.pk) for o in ordered[1:]])
+
+    def test_csv_view_streams(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/orders/export/")
+        self.assertTrue(resp.streaming)
+        body = b"".join(resp.streaming_content).decode("utf-8")
+        self.assertEqual(len(body.strip().splitlines()), 4)  # cabeçalho + 3 itens
+
+    def test_invalid_params_are_a_bad_request(self):
+        self.client.force_login(self.owner)
+        for params in ({"start": "2024-02-30"}, {"shop": "nao-e-uuid"}, {"after": "123"}, {"format": "pdf"}):
+            resp = self.client.get("/servicos/orders/export/", params)
+            self.assertEqual(resp.status_code, 400, params)
+
+    def test_xlsx_by_email_goes_through_the_queue(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/orders/export/", {"format": "xlsx", "deliver": "email"}, HTTP_HX_REQUEST="true")
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(queue.work(), 1)
+        self.assertEqual(mail.outbox[0].to, ["owner@example.com"])
+        self.assertTrue(mail.outbox[0].attachments[0][0].endswith(".xlsx"))
+
+
+class AgendaTestCase(TestCase):
+    """Owner com a loja "Centro"; cada classe cria a equipe e a agenda de que precisa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user("owner@example.com", "pass")
+        cls.shop = Shop.objects.create(owner=cls.owner, name="Centro")
+
+    @classmethod
+    def create_staff(cls, email, full_name):
+        user = get_user_model().objects.create_user(email, "pass")
+        staff = Staff.objects.create(owner=cls.owner, user=user, full_name=full_name)
+        StaffMembership.objects.create(owner=cls.owner, staff=staff, shop=cls.shop)
+        return staff
+
+    def setUp(self):
+        cache.clear()  # disponibilidade e catálogo ficam em cache entre os testes
+
+
+class ScheduleConflictTests(AgendaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = cls.create_staff("barber@example.com", "João")
+        cls.at = timezone.make_aware(datetime(2025, 3, 10, 14, 0))
+        cls.booked = ServiceOrder.objects.create(
+            owner=cls.owner, shop=cls.shop, staff=cls.staff,
+            status=ServiceOrder.STATUS_SCHEDULED, scheduled_for=cls.at,
+        )
+
+    def _new(self, minutes, **kwargs):
+        return ServiceOrder(owner=self.owner, shop=self.shop, staff=self.staff,
+                            status=ServiceOrder.STATUS_SCHEDULED,
+                            scheduled_for=self.at + timedelta(minutes=minutes), **kwargs)
+
+    def test_default_duration_is_filled_on_save(self):
+        self.assertEqual(self.booked.scheduled_end, self.at + timedelta(minutes=30))
+
+    def test_overlap_is_rejected(self):
+        with self.assertRaises(ValidationError) as cm:
+            self._new(15).full_clean()
+        self.assertIn("scheduled_for", cm.exception.message_dict)
+
+    def test_adjacent_and_canceled_do_not_conflict(self):
+        self._new(30).full_clean()
+        self.booked.status = ServiceOrder.STATUS_CANCELED
+        self.booked.save()
+        self._new(0).full_clean()
+
+    def test_editing_itself_is_not_a_conflict(self):
+        self.booked.notes = "ok"
+        self.booked.full_clean()
+
+    def test_rescheduling_moves_the_end_with_the_start(self):
+        self.booked.scheduled_for = self.at + timedelta(hours=2)
+        self.booked.save()
+        self.booked.refresh_from_db()
+        self.assertEqual(self.booked.scheduled_end, self.at + timedelta(hours=2, minutes=30))
+        self.assertFalse(ServiceOrder.overlapping(self.owner.pk, self.staff.pk, self.at, self.at + timedelta(minutes=30)).exists())
+
+    def test_form_edit_of_start_only_is_valid(self):
+        form = ServiceOrderForm(data={
+            "shop": self.shop.pk, "staff": self.staff.pk, "status": ServiceOrder.STATUS_SCHEDULED,
+            "scheduled_for": timezone.localtime(self.at + timedelta(hours=3)).strftime("%Y-%m-%dT%H:%M"),
+            "scheduled_end": timezone.localtime(self.booked.scheduled_end).strftime("%Y-%m-%dT%H:%M"),
+            "discount_amount": "0", "amount_paid": "0",
+        }, instance=self.booked, owner=self.owner)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.instance.scheduled_end, self.at + timedelta(hours=3, minutes=30))
+
+    def test_calendar_week_view(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/agenda/", {"date": "2025-03-12"})
+        self.assertContains(resp, "14:00")
+        resp = self.client.get("/servicos/agenda/", {"date": "2025-03-12", "view": "day"})
+        self.assertNotContains(resp, "14:00")
+
+
+class AvailabilityTests(AgendaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = [cls.create_staff(f"barber{i}@example.com", f"Barbeiro {i}") for i in range(2)]
+        cls.cut = Product.objects.create(owner=cls.owner, name="Corte", duration_minutes=60)
+        cls.day = datetime(2025, 3, 10).date()
+        cls.past = timezone.make_aware(datetime(2025, 1, 1))
+        ServiceOrder.objects.create(
+            owner=cls.owner, shop=cls.shop, staff=cls.staff[0], status=ServiceOrder.STATUS_SCHEDULED,
+            scheduled_for=timezone.make_aware(datetime(2025, 3, 10, 9, 0)),
+            scheduled_end=timezone.make_aware(datetime(2025, 3, 10, 10, 0)),
+        )
+
+    def _slots(self, staff):
+        rows = free_slots(self.owner, self.shop.pk, self.day, 1, [self.cut.pk], not_before=self.past)
+        return next(r["slots"] for r in rows if r["staff_id"] == staff.pk)
+
+    def test_sweep_merges_overlapping_intervals(self):
+        t = lambda h, m=0: datetime(2025, 3, 10, h, m)
+        free = sweep_free(t(8), t(20), [(t(9), t(10)), (t(9, 30), t(11)), (t(15), t(16))])
+        self.assertEqual(free, [(t(8), t(9)), (t(11), t(15)), (t(16), t(20))])
+
+    def test_slots_respect_duration_and_existing_bookings(self):
+        busy = [s.strftime("%H:%M") for s in self._slots(self.staff[0])]
+        self.assertIn("08:00", busy)
+        self.assertNotIn("08:15", busy)  # 60 min a partir de 08:15 invadiria 09:00
+        self.assertNotIn("09:30", busy)
+        self.assertIn("10:00", busy)
+        self.assertEqual(len(self._slots(self.staff[1])), 45)  # 08:00..19:00 de 15 em 15
+
+    def test_cached_per_day_and_invalidated_on_order_change(self):
+        self._slots(self.staff[1])
+        with self.assertNumQueries(1):  # só a soma das durações; lacunas e equipe vêm do cache
+            self._slots(self.staff[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceOrder.objects.create(
+                owner=self.owner, shop=self.shop, staff=self.staff[1], status=ServiceOrder.STATUS_SCHEDULED,
+                scheduled_for=timezone.make_aware(datetime(2025, 3, 10, 8, 0)),
+            )
+            # a invalidação espera o commit
+            self.assertIn("08:00", [s.strftime("%H:%M") for s in self._slots(self.staff[1])])
+        self.assertNotIn("08:00", [s.strftime("%H:%M") for s in self._slots(self.staff[1])])
+
+    def test_availability_view(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/agenda/livres/", {"shop": self.shop.pk, "date": "2030-03-11", "products": [self.cut.pk]})
+        self.assertContains(resp, "Barbeiro 1")
+
+    def test_invalid_product_ids_are_ignored(self):
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/agenda/livres/", {"shop": self.shop.pk, "products": ["x", "1; drop"]})
+        self.assertEqual(resp.status_code, 200)
+
+
+class OnlineBookingTests(AgendaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = cls.create_staff("barber@example.com", "Barbeiro")
+        cls.cut = Product.objects.create(owner=cls.owner, name="Corte", default_price=Decimal("40.00"), duration_minutes=30)
+        cls.beard = Product.objects.create(owner=cls.owner, name="Barba", default_price=Decimal("25.00"), duration_minutes=30)
+        ProductPrice.objects.create(owner=cls.owner, product=cls.beard, shop=cls.shop, price=Decimal("30.00"))
+        Product.objects.create(owner=cls.owner, name="Pomada", type=Product.TYPE_RETAIL)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        cls.start = timezone.make_aware(datetime.combine(tomorrow, datetime.min.time()).replace(hour=10))
+        cls.url = f"/servicos/agendar/{cls.shop.pk}/"
+
+    def _book(self, phone="(11) 98888-7777", start=None):
+        start = start or self.start
+        return self.client.post(self.url + "confirmar/", {
+            "services": [str(self.cut.pk), str(self.beard.pk)],
+            "slot": f"{self.staff.pk}|{start.isoformat()}",
+            "name": "João", "phone": phone,
+        })
+
+    def test_page_is_public_cached_and_conditional(self):
+        resp = self.client.get(self.url)
+        self.assertContains(resp, "Corte")
+        self.assertContains(resp, "R$ 30.00")  # override da loja
+        self.assertNotContains(resp, "Pomada")
+        self.assertIn("public", resp["Cache-Control"])
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_page_changes_with_the_day(self):
+        etag = self.client.get(self.url)["ETag"]
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch("django.utils.timezone.localdate", return_value=tomorrow):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, f'min="{tomorrow.isoformat()}"')
+
+    def test_catalog_invalidated_by_price_change(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.cut.default_price = Decimal("45.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cut.save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "R$ 45.00")
+
+    def test_booking_creates_client_order_and_items(self):
+        resp = self._book()
+        self.assertContains(resp, "Agendamento confirmado")
+        order = ServiceOrder.objects.get()
+        self.assertEqual(order.status, ServiceOrder.STATUS_SCHEDULED)
+        self.assertEqual(order.total_amount, Decimal("70.00"))
+        self.assertEqual(order.get_scheduled_end() - order.scheduled_for, timedelta(minutes=60))
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.client.phone, "11988887777")
+
+        # mesmo telefone reaproveita o cliente; horário ocupado é recusado
+        resp = self._book(phone="+55 11 98888-7777")
+        self.assertContains(resp, "acabou de ser ocupado")
+        self._book(phone="11 98888 7777", start=self.start + timedelta(minutes=60))
+        self.assertEqual(Client.objects.filter(owner=self.owner).count(), 1)
+        self.assertEqual(ServiceOrder.objects.count(), 2)
+
+    def test_inactive_shop_is_404(self):
+        self.shop.is_active = False
+        self.shop.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_start_must_be_an_offered_slot(self):
+        night = self.start.replace(hour=3, minute=17)
+        self.assertContains(self._book(start=night), "Horário inválido")
+        self.assertContains(self._book(start=self.start + timedelta(minutes=7)), "Horário inválido")
+        late = self.start.replace(hour=19, minute=30)  # 60 min passariam do fim do expediente
+        self.assertContains(self._book(start=late), "Horário inválido")
+        self.assertFalse(ServiceOrder.objects.exists())
+
+    def test_confirmations_are_rate_limited_per_ip(self):
+        with override_settings(BOOKING_RATE_LIMIT=2):
+            self._book()
+            self._book(start=self.start + timedelta(minutes=60))
+            resp = self._book(start=self.start + timedelta(minutes=120))
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(ServiceOrder.objects.count(), 2)
+
+    def test_staff_without_name_does_not_expose_email(self):
+        self.staff.full_name = ""
+        self.staff.save()
+        resp = self.client.get(self.url)
+        self.assertContains(resp, "Profissional")
+        self.assertNotContains(resp, "barber")
+        slots = self.client.get(self.url + "horarios/", {"services": [str(self.cut.pk)], "date": self.start.date().isoformat()})
+        self.assertNotContains(slots, "barber@")
+
+    def test_client_form_phone_matches_booking_lookup(self):
+        form = ClientForm(data={"name": "João", "phone": "+55 (11) 98888-7777", "is_active": "on"}, owner=self.owner)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self._book()
+        self.assertEqual(Client.objects.filter(owner=self.owner).count(), 1)
+
+
+class OrderBulkIngestApiTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.pomade = Product.objects.create(owner=self.owner, name="Pomada", default_price=Decimal("20.00"))
+        ProductPrice.objects.create(owner=self.owner, product=self.cut, shop=self.shop, price=Decimal("45.00"))
+        _, self.key = ApiToken.issue(self.owner, "PDV")
+        self.url = "/servicos/api/orders/bulk/"
+
+    def _post(self, orders, key=None):
+        return self.client.post(
+            self.url, json.dumps({"orders": orders}), content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {key or self.key}",
+        )
+
+    def _order(self, key, **extra):
+        order = {
+            "idempotency_key": key, "shop": str(self.shop.pk), "payment_method": "pix",
+            "client_phone": "11 98888-7777", "client_name": "João",
+            "items": [{"product": str(self.cut.pk)}, {"product": str(self.pomade.pk), "qty": 2, "unit_price": "18,50"}],
+        }
+        order.update(extra)
+        return order
+
+    def test_requires_token(self):
+        self.assertEqual(self._post([self._order("a")], key="errado").status_code, 401)
+
+    def test_batch_insert_with_per_record_results(self):
+        orders = [self._order(f"pdv-{i}") for i in range(50)]
+        orders.append(self._order("bad", shop=str(self.owner.pk), items=[{"product": "x"}]))
+        resp = self._post(orders)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data["created"], data["errors"]), (50, 1))
+        self.assertIn("shop: loja inexistente.", data["results"][-1]["errors"])
+
+        order = ServiceOrder.objects.get(idempotency_key="pdv-0")
+        self.assertEqual(order.status, ServiceOrder.STATUS_DONE)
+        self.assertIsNotNone(order.finished_at)
+        self.assertEqual(order.total_amount, Decimal("82.00"))  # 45 (override da loja) + 2 x 18,50
+        self.assertEqual(ServiceItem.objects.count(), 100)
+        self.assertEqual(Client.objects.filter(owner=self.owner).count(), 1)
+
+    def test_retry_with_same_keys_does_not_duplicate(self):
+        self._post([self._order("k1"), self._order("k2")])
+        data = self._post([self._order("k1"), self._order("k2"), self._order("k3")]).json()
+        self.assertEqual([r["status"] for r in data["results"]], ["duplicate", "duplicate", "created"])
+        self.assertEqual(ServiceOrder.objects.count(), 3)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        self._post([self._order("warm")])
+        # token + 6 lookups IN (chaves: quentes e arquivadas) + savepoint + 2 INSERTs + release
+        with self.assertNumQueries(11):
+            self._post([self._order("a0")])
+        with self.assertNumQueries(11):
+            self._post([self._order(f"b{i}") for i in range(20)])
+
+    def test_feeds_sales_facts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post([self._order("f1")])
+        self.assertFalse(DailyOrderFact.objects.exists())  # recálculo vai para a fila
+        self.assertEqual(queue.work(), 1)
+        self.assertEqual(DailyOrderFact.objects.get(owner=self.owner).revenue, Decimal("82.00"))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        self.cut = Product.objects.create(owner=self.owner, name="Corte", default_price=Decimal("40.00"))
+        self.old = timezone.make_aware(datetime(2020, 5, 4, 10, 0))
+        self.orders = []
+        for status in (ServiceOrder.STATUS_DONE, ServiceOrder.STATUS_DONE, ServiceOrder.STATUS_CANCELED):
+            o = ServiceOrder.objects.create(owner=self.owner, shop=self.shop, status=status, finished_at=self.old)
+            ServiceItem.objects.create(owner=self.owner, order=o, product=self.cut, qty=1)
+            self.orders.append(o)
+        self.recent = ServiceOrder.objects.create(owner=self.owner, shop=self.shop, status=ServiceOrder.STATUS_DONE)
+        self.open = ServiceOrder.objects.create(
+            owner=self.owner, shop=self.shop, status=ServiceOrder.STATUS_SCHEDULED,
+            scheduled_for=self.old, created_at=self.old,
+        )
+
+    def test_archive_columns_match_hot_tables(self):
+        hot = {f.attname for f in ServiceOrder._meta.concrete_fields}
+        self.assertLessEqual(hot, {f.attname for f in ArchivedServiceOrder._meta.concrete_fields})
+        self.assertEqual(
+            {f.attname for f in ServiceItem._meta.concrete_fields},
+            {f.attname for f in ArchivedServiceItem._meta.concrete_fields},
+        )
+
+    def test_archive_in_batches_and_restore(self):
+        facts.rebuild(self.owner)
+        progress = []
+        self.assertEqual(archive.archive(owner=self.owner, batch_size=2, progress=progress.append), 3)
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(set(ServiceOrder.objects.values_list("pk", flat=True)), {self.recent.pk, self.open.pk})
+        self.assertEqual(ArchivedServiceItem.objects.count(), 3)
+        self.assertFalse(Tombstone.objects.exists())  # arquivar não é excluir para o sync
+
+        # relatórios continuam enxergando as comandas arquivadas
+        facts.rebuild(self.owner)
+        self.assertEqual(DailyOrderFact.objects.get(owner=self.owner, day=self.old.date()).revenue, Decimal("80.00"))
+
+        self.client.force_login(self.owner)
+        resp = self.client.get("/servicos/historico/")
+        self.assertContains(resp, "Restaurar</button>", count=3)
+
+        pk = self.orders[0].pk
+        self.client.post(f"/servicos/historico/{pk}/restaurar/")
+        restored = ServiceOrder.objects.get(pk=pk)
+        self.assertEqual(restored.items.get().unit_price, Decimal("40.00"))
+        self.assertEqual(ArchivedServiceOrder.objects.count(), 2)
+
+    def test_history_rejects_malformed_filters(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get("/servicos/historico/", {"shop": "xyz"}).status_code, 400)
+        self.assertEqual(self.client.get("/servicos/historico/", {"start": "ontem"}).status_code, 400)
+        self.assertEqual(self.client.get("/servicos/historico/", {"shop": str(self.shop.pk)}).status_code, 200)
+
+
+class ProjectedRowsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("owner@example.com", "pass")
+        self.shop = Shop.objects.create(owner=self.owner, name="Centro")
+        staff_user = User.objects.create_user("barbeiro@example.com", "pass")
+        self.staff = Staff.objects.create(owner=self.owner, user=staff_user)  # sem nome: exibe o e-mail
+        client = Client.objects.create(owner=self.owner, name="Ana", phone="1199", notes="x" * 5000)
+        ServiceOrder.objects.create(owner=self.owner, shop=self.shop, staff=self.staff, client=client, notes="y" * 5000)
+        ServiceOrder.objects.create(owner=self.owner, shop=self.shop, status=ServiceOrder.STATUS_SCHEDULED)
+
+    def test_order_rows_match_model_rendering_in_one_query(self):
+        qs = ServiceOrder.objects.filter(owner=self.owner).order_by("created_at")
+        models = list(qs.select_related("shop", "client", "staff__user"))
+        with self.assertNumQueries(1):
+            rows = list(qs.rows(OrderRow))
+        self.assertNotIn("notes", str(qs.rows(OrderRow).query))
+        self.assertIsNone(rows[1].client)
+        self.assertIsNone(rows[1].staff)
+        for obj, row in zip(models, rows):
+            self.assertEqual(render_to_string("servicos/_order_row.html", {"o": row}),
+                             render_to_string("servicos/_order_row.html", {"o": obj}))
+            deps = ("client", "shop", "staff")
+            self.assertEqual(fragments.row_key("order", row, deps), fragments.row_key("order", obj, deps))
+
+    def test_bench_command_reports_every_table(self):
+        out = StringIO()
+        call_command("bench_list_rows", owner="owner@example.com", repeat=1, stdout=out)
+        report = out.getvalue()
+        for label in ("produtos", "clientes", "equipe", "comandas"):
+            self.assertIn(label, report)
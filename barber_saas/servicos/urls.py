@@ -1,5 +1,9 @@
 from django.urls import path
-from .views import HomeView, ServiceOrderCreateView, ServiceOrderUpdateView
+from .views import (
+    HomeView, ServiceOrderCreateView, ServiceOrderUpdateView, ServiceOrderExportView, CalendarView, AvailabilityView,
+    BookingPageView, BookingSlotsView, BookingCreateView, OrderBulkIngestView,
+    OrderHistoryView, OrderRestoreView,
+)
 
 app_name = "servicos"
 
@@ -7,4 +11,15 @@ urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     path("orders/new/", ServiceOrderCreateView.as_view(), name="order_create"),
     path("orders/<uuid:pk>/edit/", ServiceOrderUpdateView.as_view(), name="order_update"),
+    path("orders/export/", ServiceOrderExportView.as_view(), name="order_export"),
+    path("agenda/", CalendarView.as_view(), name="calendar"),
+    path("agenda/livres/", AvailabilityView.as_view(), name="availability"),
+    path("historico/", OrderHistoryView.as_view(), name="history"),
+    path("historico/<uuid:pk>/restaurar/", OrderRestoreView.as_view(), name="history_restore"),
+    # agendamento online (público)
+    path("agendar/<uuid:shop_id>/", BookingPageView.as_view(), name="booking"),
+    path("agendar/<uuid:shop_id>/horarios/", BookingSlotsView.as_view(), name="booking_slots"),
+    path("agendar/<uuid:shop_id>/confirmar/", BookingCreateView.as_view(), name="booking_create"),
+    # API para integrações (token)
+    path("api/orders/bulk/", OrderBulkIngestView.as_view(), name="api_orders_bulk"),
 ]
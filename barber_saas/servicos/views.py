@@ -1,13 +1,30 @@
-from datetime import date
+import json
+from collections import Counter
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.db.models import Sum, Count, Q
 from django.shortcuts import render, redirect
+from django.views import View
 from django.views.generic import TemplateView, CreateView, UpdateView, ListView
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, FileResponse, Http404, JsonResponse
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, add_never_cache_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 
-from cadastros.mixins import OwnerCreateMixin, OwnerUpdateMixin, OwnerQuerysetMixin, HtmxCrudMixin
-from .models import ServiceOrder
-from .forms import ServiceOrderForm, ServiceItemFormSet
+from accounts.tokens import TokenRequiredMixin
+from core import sharding
+from core.queue import enqueue
+from cadastros.mixins import OwnerCreateMixin, OwnerUpdateMixin, OwnerQuerysetMixin, HtmxCrudMixin, CurrentShopMixin, is_htmx
+from .models import ServiceOrder, ArchivedServiceOrder
+from .forms import ServiceOrderForm, ServiceItemFormSet, OrderExportFilterForm
+from cadastros.models import Product
+from . import agenda, api, archive, availability, booking, exports
+from .rows import OrderRow
+from .tasks import export_orders_xlsx
 
 # ---- DASHBOARD HOME ----
 class HomeView(OwnerQuerysetMixin, TemplateView):
@@ -16,11 +33,11 @@ class HomeView(OwnerQuerysetMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        user = self.request.user
+        access = self.request.access
         current_shop_id = self.request.session.get("current_shop_id")
 
         today = date.today()
-        base = ServiceOrder.objects.filter(owner=user, created_at__date=today)
+        base = access.scope(ServiceOrder.objects.filter(created_at__date=today))
         if current_shop_id:
             base = base.filter(shop_id=current_shop_id)
 
@@ -38,14 +55,15 @@ class HomeView(OwnerQuerysetMixin, TemplateView):
         }
 
         # Listas
-        qs_sched = ServiceOrder.objects.filter(owner=user, status=ServiceOrder.STATUS_SCHEDULED)
-        qs_prog = ServiceOrder.objects.filter(owner=user, status=ServiceOrder.STATUS_IN_PROGRESS)
+        qs_sched = access.scope(ServiceOrder.objects.filter(status=ServiceOrder.STATUS_SCHEDULED))
+        qs_prog = access.scope(ServiceOrder.objects.filter(status=ServiceOrder.STATUS_IN_PROGRESS))
         if current_shop_id:
             qs_sched = qs_sched.filter(shop_id=current_shop_id)
             qs_prog = qs_prog.filter(shop_id=current_shop_id)
 
-        ctx["scheduled"] = qs_sched.select_related("shop", "staff")
-        ctx["in_progress"] = qs_prog.select_related("shop", "staff")
+        # só as colunas da linha, com loja/cliente/profissional no mesmo SELECT
+        ctx["scheduled"] = qs_sched.rows(OrderRow)
+        ctx["in_progress"] = qs_prog.rows(OrderRow)
         return ctx
 
     def get(self, request, *args, **kwargs):
@@ -69,16 +87,26 @@ class ServiceOrderCreateView(OwnerCreateMixin, OwnerQuerysetMixin, CreateView):
     template_name = "servicos/_order_modal.html"
     modal_title = "Nova comanda"
 
+    def get_initial(self):
+        # pré-preenchimento vindo da agenda / horários livres
+        initial = super().get_initial()
+        for key in ("shop", "staff", "scheduled_for"):
+            if self.request.GET.get(key):
+                initial[key] = self.request.GET[key]
+        if initial.get("scheduled_for"):
+            initial["status"] = ServiceOrder.STATUS_SCHEDULED
+        return initial
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         form = ctx["form"]  # use a instância do form
         if self.request.method == "POST":
             ctx["formset"] = ServiceItemFormSet(
-                self.request.POST, instance=form.instance, owner=self.request.user
+                self.request.POST, instance=form.instance, owner=self.request.tenant
             )
         else:
             ctx["formset"] = ServiceItemFormSet(
-                instance=form.instance, owner=self.request.user
+                instance=form.instance, owner=self.request.tenant
             )
         ctx["title"] = self.modal_title
         return ctx
@@ -89,10 +117,12 @@ class ServiceOrderCreateView(OwnerCreateMixin, OwnerQuerysetMixin, CreateView):
         if not formset.is_valid():
             return render(self.request, self.template_name,
                           {"form": form, "formset": formset, "title": self.modal_title}, status=200)
-        self.object = form.save()
-        formset.instance = self.object
-        formset.save()
-        self.object.recalc_totals(); self.object.save(update_fields=["subtotal", "total_amount"])
+        # comanda + itens numa transação: os fatos de relatório recalculam uma vez, no commit
+        with sharding.tenant_atomic():
+            self.object = form.save()
+            formset.instance = self.object
+            formset.save()
+            self.object.recalc_totals(); self.object.save(update_fields=["subtotal", "total_amount"])
 
         resp = HttpResponse("")
         resp["HX-Trigger"] = '{"closeModal": true, "refreshOrdersScheduled": true, "refreshOrdersInProgress": true, "refreshKpis": true, "toast": "Comanda criada."}'
@@ -110,11 +140,11 @@ class ServiceOrderUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, UpdateView):
         form = ctx["form"]
         if self.request.method == "POST":
             ctx["formset"] = ServiceItemFormSet(
-                self.request.POST, instance=form.instance, owner=self.request.user
+                self.request.POST, instance=form.instance, owner=self.request.tenant
             )
         else:
             ctx["formset"] = ServiceItemFormSet(
-                instance=form.instance, owner=self.request.user
+                instance=form.instance, owner=self.request.tenant
             )
         ctx["title"] = self.modal_title
         return ctx
@@ -125,10 +155,305 @@ class ServiceOrderUpdateView(OwnerUpdateMixin, OwnerQuerysetMixin, UpdateView):
         if not formset.is_valid():
             return render(self.request, self.template_name,
                           {"form": form, "formset": formset, "title": self.modal_title}, status=200)
-        self.object = form.save()
-        formset.save()
-        self.object.recalc_totals(); self.object.save(update_fields=["subtotal", "total_amount"])
+        with sharding.tenant_atomic():
+            self.object = form.save()
+            formset.save()
+            self.object.recalc_totals(); self.object.save(update_fields=["subtotal", "total_amount"])
 
         resp = HttpResponse("")
         resp["HX-Trigger"] = '{"closeModal": true, "refreshOrdersScheduled": true, "refreshOrdersInProgress": true, "refreshKpis": true, "toast": "Comanda atualizada."}'
         return resp
+
+
+# ---- EXPORTAÇÃO CONTÁBIL ----
+class ServiceOrderExportView(OwnerQuerysetMixin, View):
+    """
+    GET ?start=AAAA-MM-DD&end=AAAA-MM-DD&shop=<uuid>&format=csv|xlsx&after=<uuid>
+    CSV sai em streaming; XLSX é montado em arquivo temporário (write_only).
+    ``deliver=email`` enfileira o XLSX e manda por e-mail.
+    ``after`` retoma a partir da última comanda recebida.
+    """
+    permission_action = "manage"
+
+    def get(self, request, *args, **kwargs):
+        params = OrderExportFilterForm(request.GET)
+        if not params.is_valid():
+            return HttpResponseBadRequest("Parâmetros inválidos: " + ", ".join(params.errors))
+        data = params.cleaned_data
+        filters = {
+            "start": data["start"],
+            "end": data["end"],
+            "shop_id": data["shop"],
+            "after": data["after"],
+        }
+        fmt = data["format"] or "csv"
+        if request.GET.get("deliver") == "email":
+            # período grande: a planilha é montada pelo worker e chega por e-mail
+            enqueue(export_orders_xlsx, request.access.owner_id, filters["start"], filters["end"], filters["shop_id"])
+            resp = HttpResponse("", status=202)
+            resp["HX-Trigger"] = json.dumps({"toast": f"A exportação será enviada para {request.tenant.email}."})
+            return resp
+        rows = exports.iter_export_rows(request.tenant, **filters)
+        stamp = "_".join(str(filters[k]) for k in ("start", "end") if filters[k]) or "completo"
+
+        if fmt == "xlsx":
+            try:
+                fh = exports.write_xlsx(rows)
+            except ImproperlyConfigured as exc:
+                return HttpResponseBadRequest(str(exc))
+            return FileResponse(fh, as_attachment=True, filename=f"comandas_{stamp}.xlsx")
+
+        # o corpo é consumido depois que a view (e a middleware) já retornaram
+        rows = sharding.bind(rows, request.tenant)
+        resp = StreamingHttpResponse(exports.stream_csv(rows), content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="comandas_{stamp}.csv"'
+        return resp
+
+
+# ---- AGENDA ----
+class CalendarView(OwnerQuerysetMixin, CurrentShopMixin, TemplateView):
+    """
+    Agenda da loja atual: ?view=week|day&date=AAAA-MM-DD&staff=<uuid>.
+    Uma query por janela (índice shop+status+scheduled_for / staff+scheduled_for).
+    """
+    template_name = "servicos/calendar.html"
+    fragment_template = "servicos/_calendar_grid.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        view = "day" if self.request.GET.get("view") == "day" else "week"
+        day = agenda.parse_day(self.request.GET.get("date"))
+        staff_id = self.request.GET.get("staff") or None
+        first_day, days = agenda.window(view, day)
+
+        user = self.request.tenant
+        staff_list = agenda.active_staff(user, self.current_shop_id)
+        orders = agenda.appointments(user, first_day, days, self.current_shop_id, staff_id)
+        columns_staff = [s for s in staff_list if not staff_id or str(s.pk) == staff_id]
+
+        step = timedelta(days=days)
+        ctx.update({
+            "view": view,
+            "day": day,
+            "first_day": first_day,
+            "prev_day": day - step,
+            "next_day": day + step,
+            "staff_id": staff_id,
+            "staff_list": staff_list,
+            "columns": agenda.build_columns(view, first_day, days, orders, columns_staff),
+        })
+        return ctx
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.get_context_data(**kwargs)
+        if is_htmx(request) and request.GET.get("fragment") == "grid":
+            return render(request, self.fragment_template, ctx)
+        return render(request, self.template_name, ctx)
+
+
+class AvailabilityView(OwnerQuerysetMixin, CurrentShopMixin, TemplateView):
+    """Próximos horários livres na loja atual para os serviços escolhidos (?products=...)."""
+    template_name = "servicos/_availability.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        user = self.request.tenant
+        day = agenda.parse_day(self.request.GET.get("date"))
+        try:
+            days = min(max(int(self.request.GET.get("days", 7)), 1), 31)
+        except ValueError:
+            days = 7
+        product_ids = self.request.GET.getlist("products")
+        ctx.update({
+            "day": day,
+            "days": days,
+            "selected_products": product_ids,
+            "products": Product.objects.filter(owner=user, is_active=True, type=Product.TYPE_SERVICE).order_by("name"),
+            "results": availability.free_slots(user, self.current_shop_id, day, days, product_ids) if self.current_shop_id else [],
+            "shop_id": self.current_shop_id,
+        })
+        return ctx
+
+
+# ---- HISTÓRICO (comandas arquivadas, somente leitura) ----
+class OrderHistoryView(OwnerQuerysetMixin, ListView):
+    """Comandas arquivadas: ?start=&end= (datas de criação) e ?shop=."""
+    model = ArchivedServiceOrder
+    template_name = "servicos/history.html"
+    fragment_template = "servicos/_history_table.html"
+    context_object_name = "orders"
+    paginate_by = 25
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related("shop", "client", "staff", "staff__user").prefetch_related("items__product")
+        params = self.params.cleaned_data
+        if params["start"]:
+            qs = qs.filter(created_at__date__gte=params["start"])
+        if params["end"]:
+            qs = qs.filter(created_at__date__lte=params["end"])
+        if params["shop"]:
+            qs = qs.filter(shop_id=params["shop"])
+        return qs.order_by("-created_at", "-id")
+
+    def get(self, request, *args, **kwargs):
+        self.params = OrderExportFilterForm(request.GET)
+        if not self.params.is_valid():
+            return HttpResponseBadRequest("Parâmetros inválidos: " + ", ".join(self.params.errors))
+        resp = super().get(request, *args, **kwargs)
+        if is_htmx(request) and request.GET.get("fragment") == "table":
+            return render(request, self.fragment_template, resp.context_data)
+        return resp
+
+
+class OrderRestoreView(OwnerQuerysetMixin, View):
+    """Devolve uma comanda arquivada às tabelas quentes (POST)."""
+    permission_action = "manage"
+
+    def post(self, request, pk):
+        restored = archive.restore(request.tenant, ids=[pk])
+        if not restored:
+            raise Http404
+        resp = HttpResponse("")
+        resp["HX-Trigger"] = json.dumps({"toast": "Comanda restaurada.", "refreshHistoryTable": True})
+        return resp
+
+
+# ---- AGENDAMENTO ONLINE (público, sem login) ----
+BOOKING_PAGE_MAX_AGE = 300
+BOOKING_SLOTS_MAX_AGE = 30
+
+
+class BookingMixin:
+    """Carrega o catálogo em cache da loja; 404 se a loja não existir/estiver inativa."""
+
+    def dispatch(self, request, *args, **kwargs):
+        self.shop_id = kwargs["shop_id"]
+        self.catalog, self.catalog_version = booking.get_catalog(self.shop_id)
+        if self.catalog is None:
+            raise Http404("Loja não encontrada.")
+        return super().dispatch(request, *args, **kwargs)
+
+    def selected_services(self, data):
+        services = {s["id"]: s for s in self.catalog["services"]}
+        return [services[pid] for pid in data.getlist("services") if pid in services]
+
+
+class BookingPageView(BookingMixin, View):
+    """
+    Página pública da loja. Sem sessão/CSRF no HTML, então a resposta é
+    pública: ETag pela versão do catálogo e pelo dia (a data mínima do campo
+    muda à meia-noite; 304 sem renderizar) e o HTML renderizado fica em cache
+    sob a mesma chave.
+    """
+
+    def get(self, request, shop_id):
+        today = timezone.localdate()
+        etag = booking.catalog_etag(shop_id, self.catalog_version, today)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_cache_control(not_modified, public=True, max_age=BOOKING_PAGE_MAX_AGE)
+            return not_modified
+        key = f"booking:page:{shop_id}:{self.catalog_version}:{today.isoformat()}"
+        html = cache.get(key)
+        if html is None:
+            html = render_to_string("servicos/booking/page.html", {
+                "catalog": self.catalog,
+                "shop_id": shop_id,
+                "today": today,
+            })
+            cache.set(key, html, booking.CATALOG_TIMEOUT)
+        response = HttpResponse(html)
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=BOOKING_PAGE_MAX_AGE)
+        return response
+
+
+class BookingSlotsView(BookingMixin, View):
+    """Horários livres (fragmento HTMX) para os serviços/profissional escolhidos."""
+
+    def get(self, request, shop_id):
+        services = self.selected_services(request.GET)
+        staff_id = request.GET.get("staff") or ""
+        day = max(agenda.parse_day(request.GET.get("date")), timezone.localdate())
+        results = []
+        if services:
+            minutes = sum(s["duration_minutes"] for s in services)
+            results = availability.free_slots(
+                self.catalog["owner_id"], shop_id, day, days=3, minutes=minutes,
+            )
+            if staff_id:
+                results = [r for r in results if str(r["staff_id"]) == staff_id]
+        response = render(request, "servicos/booking/_slots.html", {
+            "results": results,
+            "has_services": bool(services),
+        })
+        patch_cache_control(response, public=True, max_age=BOOKING_SLOTS_MAX_AGE)
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class BookingCreateView(BookingMixin, View):
+    """
+    Confirmação do agendamento. Sem ServiceOrderForm/formset: validação
+    mínima e gravação em booking.create_booking.
+    (csrf_exempt: endpoint anônimo, sem sessão a proteger; a página é cacheável.
+    Por isso as tentativas são limitadas por IP.)
+    """
+
+    def post(self, request, shop_id):
+        if not booking.allow_attempt(request.META.get("REMOTE_ADDR", "")):
+            response = render(request, "servicos/booking/_result.html", {
+                "error": "Muitas tentativas. Aguarde alguns minutos e tente de novo.",
+            }, status=429)
+            add_never_cache_headers(response)
+            return response
+        staff_id, _, start_raw = request.POST.get("slot", "").partition("|")
+        start = parse_datetime(start_raw)
+        if start is not None and timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        ctx = {}
+        if start is None:
+            ctx["error"] = "Escolha um horário."
+        else:
+            try:
+                ctx["order"] = booking.create_booking(
+                    self.catalog, shop_id,
+                    product_ids=request.POST.getlist("services"),
+                    staff_id=staff_id, start=start,
+                    name=request.POST.get("name", ""),
+                    phone=request.POST.get("phone", ""),
+                    notes=request.POST.get("notes", "").strip()[:500],
+                )
+                ctx["services"] = self.selected_services(request.POST)
+                ctx["staff_name"] = next((s["name"] for s in self.catalog["staff"] if s["id"] == staff_id), "")
+            except ValidationError as e:
+                ctx["error"] = " ".join(e.messages)
+        response = render(request, "servicos/booking/_result.html", ctx)
+        add_never_cache_headers(response)
+        return response
+
+
+# ---- API (PDV) ----
+class OrderBulkIngestView(TokenRequiredMixin, View):
+    """
+    POST JSON {"orders": [...]} com até api.MAX_BATCH comandas.
+    Resposta: {"created", "duplicates", "errors", "results": [...]} — 200
+    mesmo com erros por registro (o cliente reenvia só os que falharam;
+    os já gravados voltam como "duplicate" pela idempotency_key).
+    """
+
+    def post(self, request):
+        try:
+            records = api.parse_batch(json.loads(request.body or b"null"))
+        except ValueError:
+            return JsonResponse({"detail": "JSON inválido."}, status=400)
+        except api.PayloadError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        results = api.ingest_orders(request.user, records)
+        counts = Counter(r["status"] for r in results)
+        return JsonResponse({
+            "created": counts["created"],
+            "duplicates": counts["duplicate"],
+            "errors": counts["error"],
+            "results": results,
+        })
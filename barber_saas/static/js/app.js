@@ -0,0 +1,61 @@
+// Comportamento global do layout (base.html): modal de formulários, toasts e
+// destaque do sidebar. Carregado no fim do <body>, depois do bootstrap e do htmx.
+(function () {
+  // Abre o modal quando algo é injetado no #appModalContent
+  document.body.addEventListener('htmx:afterSwap', (e) => {
+    if (e.detail.target && e.detail.target.id === 'appModalContent') {
+      const modalEl = document.getElementById('appModal');
+      const modal = bootstrap.Modal.getOrCreateInstance(modalEl);
+      modal.show();
+    }
+  });
+
+  // Fecha quando receber o evento custom "closeModal" (via HX-Trigger)
+  document.body.addEventListener('closeModal', () => {
+    const modalEl = document.getElementById('appModal');
+    const modal = bootstrap.Modal.getInstance(modalEl) || bootstrap.Modal.getOrCreateInstance(modalEl);
+    modal.hide();
+    const content = document.getElementById('appModalContent');
+    if (content) content.innerHTML = '';
+  });
+
+  // Toast simples quando vier "toast" no HX-Trigger JSON
+  document.body.addEventListener('toast', (e) => {
+    const msg = (e.detail && (e.detail.value || e.detail)) || 'Operação concluída';
+    let el = document.getElementById('appToast');
+    if (!el) {
+      el = document.createElement('div');
+      el.id = 'appToast';
+      el.className = 'toast position-fixed bottom-0 end-0 m-3';
+      el.innerHTML = '<div class="toast-body"></div>';
+      document.body.appendChild(el);
+    }
+    el.querySelector('.toast-body').textContent = msg;
+    bootstrap.Toast.getOrCreateInstance(el, { delay: 2000 }).show();
+  });
+
+  // Mantém o destaque do sidebar após navegações
+  function refreshSidebarActive() {
+    const path = location.pathname;
+    document.querySelectorAll('#sidebarNav .nav-link').forEach(a => {
+      const href = a.getAttribute('href') || '';
+      if (path.startsWith(href)) {
+        a.classList.add('active');
+        a.setAttribute('aria-current', 'page');
+      } else {
+        a.classList.remove('active');
+        a.removeAttribute('aria-current');
+      }
+    });
+  }
+
+  // 1) na primeira carga (SSR); no fim do <body> o sidebar já está no DOM
+  refreshSidebarActive();
+
+  // 2) após navegações HTMX que trocam o frame
+  document.body.addEventListener('htmx:afterSwap', (e) => {
+    if (e.detail && e.detail.target && (e.detail.target.id === 'pageFrame' || e.detail.target.id === 'mainContent')) {
+      refreshSidebarActive();
+    }
+  });
+})();